@@ -0,0 +1,258 @@
+import datetime
+import json
+import math
+import os
+import random
+import tempfile
+import threading
+
+from backends import INTERNAL_TABLE_PREFIX
+from db_connection import get_backend_for
+from rollups import parse_aggregate
+from schema_catalog import catalog
+
+# Rows kept in each table's sample; tables with fewer rows are always queried exactly
+SAMPLE_ROWS = int(os.environ.get("CHATDB_SAMPLE_ROWS", "100000"))
+# Directory holding one file per database with the sampling fraction of each sampled table
+SAMPLE_DIR = os.environ.get(
+    "CHATDB_SAMPLE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".chatdb_samples")
+)
+# Normal quantile of the reported confidence intervals (1.96 -> 95%)
+Z = float(os.environ.get("CHATDB_SAMPLE_Z", "1.96"))
+
+# database -> {table: {'fraction', 'table_rows', 'sample_rows', 'created_at'}}
+_samples = {}
+_lock = threading.Lock()
+
+
+class Estimate(float):
+    """
+    An approximate aggregate. It behaves as its point estimate in arithmetic
+    and comparisons, and carries the half-width of its confidence interval in
+    `margin` (None when the sample gives no interval, e.g. for MIN/MAX).
+    """
+
+    def __new__(cls, value, margin=None):
+        estimate = super().__new__(cls, value)
+        estimate.margin = margin
+        return estimate
+
+    def __repr__(self):
+        if self.margin is None:
+            return f"~{float(self):.2f}"
+        return f"{float(self):.2f} ± {self.margin:.2f}"
+
+    __str__ = __repr__
+
+
+def sample_table_name(table):
+    return f"{INTERNAL_TABLE_PREFIX}sample_{table}"
+
+
+def _metadata_path(database):
+    return os.path.join(SAMPLE_DIR, f"{database}.json")
+
+
+def _load_metadata(database):
+    with _lock:
+        if database in _samples:
+            return _samples[database]
+    samples = {}
+    path = _metadata_path(database)
+    if os.path.exists(path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                samples = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error reading sample metadata for {database}, rebuilding samples: {e}")
+    with _lock:
+        return _samples.setdefault(database, samples)
+
+
+def _save_metadata(database):
+    with _lock:
+        data = json.dumps(_samples.get(database, {}))
+    os.makedirs(SAMPLE_DIR, exist_ok=True)
+    path = _metadata_path(database)
+    # A temporary file of its own, so writers in other threads never replace each other's
+    fd, tmp_path = tempfile.mkstemp(dir=SAMPLE_DIR, prefix=f"{database}.", suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def build_sample(cursor, database, table):
+    """
+    (Re)create the random sample of a table.
+
+    Every row is kept independently with probability SAMPLE_ROWS / table rows
+    (Bernoulli sampling), decided by the database while it scans the table
+    once, so the sample is built without moving the table to the client.
+
+    Args:
+        cursor: Cursor already using `database`.
+        database (str): The database name.
+        table (str): The table name.
+
+    Returns:
+        dict: The sample's 'fraction', 'table_rows', 'sample_rows' and
+        'created_at', or None if the table is small enough to query exactly.
+    """
+    backend = get_backend_for(cursor)
+    sample = sample_table_name(table)
+    table_rows = backend.estimate_rows(cursor, database, table)
+    if table_rows <= SAMPLE_ROWS:
+        if has_sample(database, table):
+            drop_sample(cursor, database, table)
+        return None
+    cursor.execute(f"DROP TABLE IF EXISTS `{sample}`")
+
+    # Rounded to millionths so every backend samples with exactly the recorded fraction
+    fraction = max(1e-6, round(SAMPLE_ROWS / table_rows, 6))
+    cursor.execute(f"CREATE TABLE `{sample}` AS SELECT * FROM `{table}` WHERE {backend.sample_predicate(fraction)}")
+    cursor.execute(f"SELECT COUNT(*) FROM `{sample}`")
+    sample_rows = cursor.fetchone()[0]
+
+    info = {
+        "fraction": fraction,
+        "table_rows": table_rows,
+        "sample_rows": sample_rows,
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds")
+    }
+    _load_metadata(database)
+    with _lock:
+        _samples[database][table] = info
+    _save_metadata(database)
+    return info
+
+
+def load_sample(cursor, database, table):
+    """Return the sample metadata of a table, building the sample on first use (None for small tables)."""
+    info = _load_metadata(database).get(table)
+    if info is not None:
+        return info
+    return build_sample(cursor, database, table)
+
+
+def _estimate(function, fraction, count, total, squares, extreme):
+    """
+    Scale one group's sample aggregates to the whole table.
+
+    COUNT and SUM use the Horvitz-Thompson estimator (sample value / fraction)
+    with variance (1 - f) / f^2 * sum(y^2); AVG is the sample mean with the
+    finite-population-corrected standard error. MIN/MAX are the sample's
+    extremes, which can only under-reach the true ones, so they get no interval.
+    """
+    spread = (1 - fraction) / fraction ** 2
+    if function == "count":
+        return Estimate(count / fraction, Z * math.sqrt(spread * count))
+    if count == 0:
+        return None
+    if function == "sum":
+        return Estimate(total / fraction, Z * math.sqrt(spread * squares))
+    if function == "avg":
+        mean = total / count
+        if count < 2:
+            return Estimate(mean)
+        variance = max(0.0, (squares - total * total / count) / (count - 1))
+        return Estimate(mean, Z * math.sqrt(variance / count * (1 - fraction)))
+    return Estimate(extreme)
+
+
+def answer(cursor, sql, database):
+    """
+    Answer a generated aggregate query approximately from the table's sample.
+
+    Supports SUM, AVG, COUNT, MIN and MAX over one column (or COUNT(*)),
+    optionally grouped by one column and filtered with `HAVING COUNT(*) > n`,
+    the shapes produced by query_generator and the sample query menus. Groups
+    with no sampled rows are missing from the result.
+
+    Returns:
+        list: Result rows with Estimate values, or None if the query must run exactly
+        (another shape, a non-numeric MIN/MAX, or a table below SAMPLE_ROWS).
+    """
+    query = parse_aggregate(cursor, sql, database)
+    if query is None:
+        return None
+    function, column, table, group = query["function"], query["column"], query["table"], query["group"]
+    if function in ("min", "max") and column not in query["entry"]["numerical"]:
+        return None
+    info = load_sample(cursor, database, table)
+    if info is None:
+        return None
+
+    counted = "*" if column == "*" else f"`{column}`"
+    value = "NULL" if column == "*" else f"`{column}`"
+    extreme = f"{function.upper()}({value})" if function in ("min", "max") else "NULL"
+    sums = f"SUM({value}), SUM({value} * {value})" if function in ("sum", "avg") else "NULL, NULL"
+    rewritten = (f"SELECT {f'`{group}`' if group else 'NULL'}, COUNT(*), COUNT({counted}), {sums}, {extreme} "
+                 f"FROM `{sample_table_name(table)}`")
+    if group:
+        rewritten += f" GROUP BY `{group}`"
+    cursor.execute(rewritten)
+
+    fraction, having = info["fraction"], query["having"]
+    rows = []
+    for group_key, sampled, count, total, squares, extreme_value in cursor.fetchall():
+        if having is not None and sampled / fraction <= having:
+            continue
+        estimate = _estimate(function, fraction, count, float(total or 0), float(squares or 0),
+                             float(extreme_value) if extreme_value is not None else None)
+        rows.append((group_key, estimate) if group else (estimate,))
+    return rows
+
+
+def has_sample(database, table):
+    return table in _load_metadata(database)
+
+
+def sample_insert(cursor, database, table, values):
+    """Keep a sample current after a row is inserted: the new row joins it with the sampling probability."""
+    info = _load_metadata(database).get(table)
+    if info is None or random.random() >= info["fraction"]:
+        return
+    cursor.execute(f"INSERT INTO `{sample_table_name(table)}` VALUES ({', '.join(['%s'] * len(values))})", tuple(values))
+
+
+def sample_apply(cursor, database, table, where, where_params=(), column=None, value=None):
+    """
+    Repeat an UPDATE (with `column`) or a DELETE (without) on a table's sample so it keeps matching the table.
+
+    Args:
+        where (str): The statement's WHERE condition, with %s placeholders.
+        where_params (tuple): The condition's parameters.
+        column (str, optional): The column set to `value`.
+        value: The new value of `column`.
+    """
+    if not has_sample(database, table):
+        return
+    sample = sample_table_name(table)
+    if column is None:
+        cursor.execute(f"DELETE FROM `{sample}` WHERE {where}", tuple(where_params) or None)
+    else:
+        cursor.execute(f"UPDATE `{sample}` SET `{column}` = %s WHERE {where}", (value,) + tuple(where_params))
+
+
+def forget_sample(database, table=None):
+    """Drop the metadata of a table's sample (or all samples of a database) so it is rebuilt on next use."""
+    samples = _load_metadata(database)
+    if table is None and not samples or table is not None and table not in samples:
+        return
+    with _lock:
+        if table is None:
+            samples.clear()
+        else:
+            samples.pop(table, None)
+    _save_metadata(database)
+
+
+def drop_sample(cursor, database, table):
+    """Remove a table's sample from the database (after the table was dropped or reloaded)."""
+    forget_sample(database, table)
+    cursor.execute(f"DROP TABLE IF EXISTS `{sample_table_name(table)}`")
+
+
+# A schema change leaves the sample with the old columns; it is recreated on next use
+catalog.add_listener(forget_sample)
@@ -0,0 +1,624 @@
+import csv
+import datetime
+import os
+import re
+import sqlite3
+from decimal import Decimal
+
+# Errors meaning LOAD DATA LOCAL INFILE is disabled on the client or the server
+LOCAL_INFILE_DISABLED_ERRORS = (1148, 2068, 3948)
+
+# Directory holding the embedded SQLite databases, one <name>.sqlite file per database
+SQLITE_DIR = os.environ.get(
+    "CHATDB_SQLITE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "chatdb_data")
+)
+SQLITE_SUFFIX = ".sqlite"
+# Rows per executemany batch when bulk loading into SQLite
+SQLITE_LOAD_BATCH_SIZE = 10000
+# Server schemas that hold no user data; never listed as databases
+SYSTEM_DATABASES = ("information_schema", "mysql", "performance_schema", "sys")
+# Tables ChatDB maintains for itself (e.g. approximate-query samples); hidden from table listings
+INTERNAL_TABLE_PREFIX = "_chatdb_"
+
+# sqlite3 cannot bind Decimal, which ingest (DECIMAL columns) and parameterized conditions pass as
+# parameters. Registered once, at import, for the whole process: Decimals are bound as their exact
+# text, never rounded to a float.
+sqlite3.register_adapter(Decimal, str)
+
+
+class DatabaseConnectionError(Exception):
+    """Raised when no usable database connection can be obtained."""
+
+
+def as_text(value):
+    """information_schema values can come back as bytes depending on the connector version."""
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode("utf-8")
+    return value
+
+
+def _user_tables(tables):
+    return [table for table in tables if not table.startswith(INTERNAL_TABLE_PREFIX)]
+
+
+def _csv_header(file_path):
+    with open(file_path, newline="", encoding="utf-8") as f:
+        return next(csv.reader(f), [])
+
+
+class DatabaseBackend:
+    """
+    Everything ChatDB needs from a database engine: connections, catalog
+    listing, schema introspection, bulk loading and query cancellation.
+
+    Statements are written with `%s` placeholders; backends with another
+    parameter style translate them in their cursors.
+    """
+
+    name = None
+    # Number of connections that can usefully write to one table at the same time
+    max_writers = None
+    # Cursor options for statements kept in a session's prepared-statement cache
+    prepared_cursor_options = {}
+
+    def connect(self, config):
+        """Open a new connection with no database selected."""
+        raise NotImplementedError
+
+    def cursor(self, conn, **kwargs):
+        return conn.cursor(**kwargs)
+
+    def is_healthy(self, conn):
+        return True
+
+    def use(self, session, database, cursor=None):
+        """Make `database` the session's current database."""
+        raise NotImplementedError
+
+    def current_database(self, cursor):
+        """Ask the server for the cursor's current database."""
+        raise NotImplementedError
+
+    def create_database(self, cursor, database):
+        """Create `database` if it does not exist yet."""
+        raise NotImplementedError
+
+    def list_databases(self, cursor):
+        raise NotImplementedError
+
+    def list_tables(self, cursor, database):
+        """List the tables of `database` (which must be the current database)."""
+        raise NotImplementedError
+
+    def directory_fingerprints(self, cursor):
+        """
+        Return database -> a cheap fingerprint that changes when tables are
+        created, dropped or (as far as the engine tracks it) modified.
+        """
+        raise NotImplementedError
+
+    def fetch_table_directory(self, cursor, databases=None):
+        """
+        Return every table of the server (or of `databases`) as rows of
+        (database, table, rows estimate, size in bytes, created, updated), with
+        one row of table None for a database without tables. Values the engine
+        does not track are None.
+        """
+        raise NotImplementedError
+
+    def fetch_columns(self, cursor, database, table=None):
+        """
+        Return column metadata for a database (or one table) as rows of
+        (table, column, type, nullable, key, default, extra), ordered by table
+        and column position.
+        """
+        raise NotImplementedError
+
+    def bulk_load(self, cursor, conn, table_name, file_path, columns):
+        """
+        Load a CSV file (with a header row) positionally into `columns`, empty fields as NULL.
+
+        Returns:
+            int: Rows loaded, or None if the engine has no fast path so the caller should insert in chunks.
+        """
+        return None
+
+    def cancel(self, session, connection):
+        """
+        Abort the statement running on `connection`, a connection of `session`.
+        Returns True if the cancel was sent.
+        """
+        return False
+
+    def estimate_rows(self, cursor, database, table):
+        """Return the number of rows of a table; engines with table statistics may answer approximately."""
+        cursor.execute(f"SELECT COUNT(*) FROM `{table}`")
+        return cursor.fetchone()[0]
+
+    def sample_predicate(self, fraction):
+        """Return a WHERE condition that is true for a random `fraction` of rows (to millionths)."""
+        raise NotImplementedError
+
+    def table_fingerprint(self, cursor, database, table):
+        """
+        Return a cheap JSON-friendly value that changes when a table's rows change,
+        including changes made outside ChatDB, or None if the engine cannot tell.
+        """
+        return None
+
+    def explain(self, cursor, sql, params=None):
+        """
+        Return the plan of a query, one dict per table access with 'table',
+        'full_scan' (reads every row), 'sort' (sorts or groups outside an index),
+        'rows' (estimated rows read, or None) and the engine's own 'detail'.
+        """
+        raise NotImplementedError
+
+    def list_indexes(self, cursor, database, table):
+        """Return the column lists of a table's indexes (including the primary key), leading column first."""
+        raise NotImplementedError
+
+    def foreign_keys(self, cursor, database):
+        """Return the declared single-column foreign keys of a database as (table, column, referenced table, referenced column)."""
+        return []
+
+    def create_index(self, cursor, table, name, columns, types):
+        """Create a secondary index; `types` maps column -> catalog column type."""
+        column_sql = ", ".join(f"`{column}`" for column in columns)
+        cursor.execute(f"CREATE INDEX `{name}` ON `{table}` ({column_sql})")
+
+
+class MySQLBackend(DatabaseBackend):
+    name = "mysql"
+    max_writers = None
+    # Server-side prepared statements (binary protocol)
+    prepared_cursor_options = {"prepared": True}
+
+    def connect(self, config):
+        import mysql.connector
+
+        try:
+            return mysql.connector.connect(
+                database="",                # Leave empty; database will be selected dynamically
+                allow_local_infile=True,
+                **config
+            )
+        except mysql.connector.Error as err:
+            raise DatabaseConnectionError(f"Could not connect to MySQL at {config['host']}:{config['port']}: {err}") from err
+
+    def is_healthy(self, conn):
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def use(self, session, database, cursor=None):
+        if cursor is not None:
+            cursor.execute(f"USE {database}")
+            return
+        with session.cursor() as temporary:
+            temporary.execute(f"USE {database}")
+
+    def current_database(self, cursor):
+        cursor.execute("SELECT DATABASE()")
+        return cursor.fetchone()[0]
+
+    def create_database(self, cursor, database):
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{database}`")
+
+    def list_databases(self, cursor):
+        cursor.execute("SHOW DATABASES;")
+        return [db[0] for db in cursor.fetchall() if db[0] not in SYSTEM_DATABASES]
+
+    def list_tables(self, cursor, database):
+        cursor.execute("SHOW TABLES")
+        return _user_tables([table[0] for table in cursor.fetchall()])
+
+    def directory_fingerprints(self, cursor):
+        cursor.execute(f"""
+            SELECT s.SCHEMA_NAME, COUNT(t.TABLE_NAME), MAX(t.CREATE_TIME), MAX(t.UPDATE_TIME)
+            FROM information_schema.SCHEMATA s
+            LEFT JOIN information_schema.TABLES t ON t.TABLE_SCHEMA = s.SCHEMA_NAME
+            WHERE s.SCHEMA_NAME NOT IN ({', '.join(['%s'] * len(SYSTEM_DATABASES))})
+            GROUP BY s.SCHEMA_NAME
+        """, SYSTEM_DATABASES)
+        return {as_text(name): (count, str(created), str(updated)) for name, count, created, updated in cursor.fetchall()}
+
+    def fetch_table_directory(self, cursor, databases=None):
+        # TABLE_ROWS is InnoDB's estimate, refreshed with the table statistics
+        query = f"""
+            SELECT s.SCHEMA_NAME, t.TABLE_NAME, t.TABLE_ROWS, t.DATA_LENGTH + t.INDEX_LENGTH, t.CREATE_TIME, t.UPDATE_TIME
+            FROM information_schema.SCHEMATA s
+            LEFT JOIN information_schema.TABLES t ON t.TABLE_SCHEMA = s.SCHEMA_NAME
+            WHERE s.SCHEMA_NAME NOT IN ({', '.join(['%s'] * len(SYSTEM_DATABASES))})
+        """
+        params = list(SYSTEM_DATABASES)
+        if databases is not None:
+            if not databases:
+                return []
+            query += f" AND s.SCHEMA_NAME IN ({', '.join(['%s'] * len(databases))})"
+            params.extend(databases)
+        cursor.execute(query + " ORDER BY s.SCHEMA_NAME, t.TABLE_NAME", tuple(params))
+        return [(as_text(database), as_text(table), rows, size, created, updated)
+                for database, table, rows, size, created, updated in cursor.fetchall()]
+
+    def fetch_columns(self, cursor, database, table=None):
+        query = """
+            SELECT TABLE_NAME, COLUMN_NAME, COLUMN_TYPE, IS_NULLABLE, COLUMN_KEY, COLUMN_DEFAULT, EXTRA
+            FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = %s
+        """
+        params = [database]
+        if table is not None:
+            query += " AND TABLE_NAME = %s"
+            params.append(table)
+        else:
+            query += " AND TABLE_NAME NOT LIKE %s"
+            params.append(INTERNAL_TABLE_PREFIX.replace("_", "\\_") + "%")
+        query += " ORDER BY TABLE_NAME, ORDINAL_POSITION"
+        cursor.execute(query, tuple(params))
+        return cursor.fetchall()
+
+    def bulk_load(self, cursor, conn, table_name, file_path, columns):
+        """Fast path: LOAD DATA LOCAL INFILE, mapping empty fields to NULL."""
+        columns = columns[:len(_csv_header(file_path))]
+        variables = ", ".join(f"@v{i}" for i in range(len(columns)))
+        assignments = ", ".join(f"`{column}` = NULLIF(@v{i}, '')" for i, column in enumerate(columns))
+        file_path = file_path.replace("\\", "/")
+        query = f"""
+        LOAD DATA LOCAL INFILE '{file_path}'
+        INTO TABLE {table_name}
+        FIELDS TERMINATED BY ','
+        ENCLOSED BY '"'
+        LINES TERMINATED BY '\\n'
+        IGNORE 1 ROWS
+        ({variables})
+        SET {assignments};
+        """
+        try:
+            cursor.execute(query)
+        except Exception as e:
+            if getattr(e, "errno", None) in LOCAL_INFILE_DISABLED_ERRORS:
+                print("LOAD DATA LOCAL INFILE is disabled; falling back to chunked inserts.")
+                return None
+            raise
+        rows = cursor.rowcount
+        conn.commit()
+        return rows
+
+    def cancel(self, session, connection, timeout=5):
+        """Send `KILL QUERY` for the connection from another pooled connection."""
+        connection_id = connection.connection_id
+        if connection_id is None:
+            return False
+        try:
+            with session.pool.session(timeout=timeout) as other:
+                with other.cursor() as cursor:
+                    cursor.execute(f"KILL QUERY {connection_id}")
+            return True
+        except Exception as e:
+            print(f"Error cancelling query: {e}")
+            return False
+
+    def estimate_rows(self, cursor, database, table):
+        """Use the table statistics in information_schema instead of a full COUNT(*) scan."""
+        cursor.execute(
+            "SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s",
+            (database, table)
+        )
+        row = cursor.fetchone()
+        if row is None or row[0] is None:
+            return super().estimate_rows(cursor, database, table)
+        return int(row[0])
+
+    def sample_predicate(self, fraction):
+        return f"RAND() < {fraction:.6f}"
+
+    def table_fingerprint(self, cursor, database, table):
+        cursor.execute(
+            "SELECT TABLE_ROWS, CREATE_TIME, UPDATE_TIME FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s",
+            (database, table)
+        )
+        row = cursor.fetchone()
+        return None if row is None else [str(value) for value in row]
+
+    def explain(self, cursor, sql, params=None):
+        cursor.execute(f"EXPLAIN {sql}", params)
+        names = [desc[0].lower() for desc in cursor.description]
+        plan = []
+        for row in cursor.fetchall():
+            step = dict(zip(names, row))
+            extra = step.get("extra") or ""
+            plan.append({
+                "table": step.get("table"),
+                "full_scan": step.get("type") == "ALL",
+                "sort": "Using filesort" in extra or "Using temporary" in extra,
+                "rows": step.get("rows"),
+                "detail": f"type={step.get('type')} key={step.get('key')} rows={step.get('rows')} {extra}".strip()
+            })
+        return plan
+
+    def list_indexes(self, cursor, database, table):
+        cursor.execute("""
+            SELECT INDEX_NAME, COLUMN_NAME
+            FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s
+            ORDER BY INDEX_NAME, SEQ_IN_INDEX
+        """, (database, table))
+        indexes = {}
+        for name, column in cursor.fetchall():
+            indexes.setdefault(name, []).append(column)
+        return list(indexes.values())
+
+    def foreign_keys(self, cursor, database):
+        cursor.execute("""
+            SELECT CONSTRAINT_NAME, TABLE_NAME, COLUMN_NAME, REFERENCED_TABLE_NAME, REFERENCED_COLUMN_NAME
+            FROM information_schema.KEY_COLUMN_USAGE
+            WHERE TABLE_SCHEMA = %s AND REFERENCED_TABLE_NAME IS NOT NULL
+            ORDER BY TABLE_NAME, CONSTRAINT_NAME, ORDINAL_POSITION
+        """, (database,))
+        constraints = {}
+        for name, table, column, parent, parent_column in cursor.fetchall():
+            constraints.setdefault((table, name), []).append((table, column, parent, parent_column))
+        return [keys[0] for keys in constraints.values() if len(keys) == 1]
+
+    def create_index(self, cursor, table, name, columns, types):
+        # TEXT/BLOB columns can only be indexed on a prefix
+        column_sql = ", ".join(
+            f"`{column}`(255)" if any(marker in types.get(column, "").lower() for marker in ("text", "blob"))
+            else f"`{column}`"
+            for column in columns
+        )
+        cursor.execute(f"CREATE INDEX `{name}` ON `{table}` ({column_sql})")
+
+
+_PLACEHOLDER = re.compile(r"%s|'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"")
+
+
+def _qmark(operation):
+    """Translate `%s` placeholders to SQLite's `?`, leaving quoted literals alone."""
+    return _PLACEHOLDER.sub(lambda m: "?" if m.group(0) == "%s" else m.group(0), operation)
+
+
+class SQLiteCursor:
+    """sqlite3 cursor accepting the `%s` placeholders used throughout ChatDB."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, operation, params=None):
+        self._cursor.execute(_qmark(operation), params or ())
+
+    def executemany(self, operation, seq_of_params):
+        self._cursor.executemany(_qmark(operation), seq_of_params)
+
+    def nextset(self):
+        return None
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+
+class SQLiteBackend(DatabaseBackend):
+    """
+    Embedded engine: each database is a `<name>.sqlite` file in `directory`.
+    Nothing runs outside the ChatDB process, so the NL pipeline can be
+    benchmarked and tested without a server.
+    """
+
+    name = "sqlite"
+    # SQLite serializes writers, so parallel chunk loading does not help
+    max_writers = 1
+    # No options needed: sqlite3 already caches compiled statements per connection by SQL text
+    prepared_cursor_options = {}
+
+    def __init__(self, directory=SQLITE_DIR):
+        self.directory = directory
+
+    def _path(self, database):
+        return os.path.join(self.directory, f"{database}{SQLITE_SUFFIX}")
+
+    def _open(self, path):
+        return sqlite3.connect(path, check_same_thread=False, timeout=30)
+
+    def connect(self, config=None):
+        os.makedirs(self.directory, exist_ok=True)
+        return self._open(":memory:")
+
+    def cursor(self, conn, **kwargs):
+        return SQLiteCursor(conn.cursor())
+
+    def use(self, session, database, cursor=None):
+        if not os.path.exists(self._path(database)):
+            raise sqlite3.OperationalError(f"Unknown database '{database}'")
+        session.replace_connection(self._open(self._path(database)))
+        session.current_database = database
+
+    def current_database(self, cursor):
+        return None
+
+    def create_database(self, cursor, database):
+        os.makedirs(self.directory, exist_ok=True)
+        self._open(self._path(database)).close()
+
+    def list_databases(self, cursor):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            name[:-len(SQLITE_SUFFIX)] for name in os.listdir(self.directory) if name.endswith(SQLITE_SUFFIX)
+        )
+
+    def list_tables(self, cursor, database):
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view') AND name NOT LIKE 'sqlite_%' ORDER BY name")
+        return _user_tables([table[0] for table in cursor.fetchall()])
+
+    def table_fingerprint(self, cursor, database, table):
+        # SQLite keeps no per-table change time; any write to the file counts
+        info = os.stat(self._path(database))
+        return [info.st_mtime_ns, info.st_size]
+
+    def directory_fingerprints(self, cursor):
+        fingerprints = {}
+        for database in self.list_databases(cursor):
+            info = os.stat(self._path(database))
+            fingerprints[database] = (info.st_mtime_ns, info.st_size)
+        return fingerprints
+
+    def fetch_table_directory(self, cursor, databases=None):
+        rows = []
+        for database in self.list_databases(cursor) if databases is None else databases:
+            path = self._path(database)
+            if not os.path.exists(path):
+                continue
+            updated = datetime.datetime.fromtimestamp(os.path.getmtime(path))
+            conn = self._open(path)
+            try:
+                tables = [row[0] for row in conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type IN ('table', 'view') AND name NOT LIKE 'sqlite_%' ORDER BY name"
+                )]
+                try:
+                    # dbstat is only there when SQLite was compiled with it
+                    sizes = dict(conn.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name"))
+                except sqlite3.OperationalError:
+                    sizes = {}
+                counts = self._analyzed_row_counts(conn)
+                for table in tables:
+                    rows.append((database, table, counts.get(table), sizes.get(table), None, updated))
+            finally:
+                conn.close()
+            if not tables:
+                rows.append((database, None, None, None, None, None))
+        return rows
+
+    @staticmethod
+    def _analyzed_row_counts(conn):
+        """
+        Row counts recorded by the last ANALYZE (the first number of each sqlite_stat1 entry).
+        Counting every table would scan them all, so tables never analyzed are left out.
+        """
+        try:
+            stats = conn.execute("SELECT tbl, stat FROM sqlite_stat1").fetchall()
+        except sqlite3.OperationalError:
+            return {}  # Never analyzed
+        counts = {}
+        for table, stat in stats:
+            first = (stat or "").split(" ", 1)[0]
+            if first.isdigit():
+                counts[table] = max(counts.get(table, 0), int(first))
+        return counts
+
+    def fetch_columns(self, cursor, database, table=None):
+        # Introspect through a private connection so `database` need not be the current one
+        conn = self._open(self._path(database))
+        try:
+            if table is None:
+                tables = _user_tables([row[0] for row in conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type IN ('table', 'view') AND name NOT LIKE 'sqlite_%' ORDER BY name"
+                )])
+            else:
+                tables = [table]
+            rows = []
+            for table_name in tables:
+                for _, column, column_type, not_null, default, pk in conn.execute(f'PRAGMA table_info("{table_name}")'):
+                    rows.append((table_name, column, column_type.lower() or "text", "NO" if not_null or pk else "YES",
+                                 "PRI" if pk else "", default, ""))
+            return rows
+        finally:
+            conn.close()
+
+    def bulk_load(self, cursor, conn, table_name, file_path, columns):
+        """Insert the whole file in one transaction with large executemany batches."""
+        with open(file_path, newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            width = len(next(reader, []))
+            columns = columns[:width]
+            column_sql = ", ".join(f"`{column}`" for column in columns)
+            query = f"INSERT INTO `{table_name}` ({column_sql}) VALUES ({', '.join(['%s'] * len(columns))})"
+            batch = []
+            rows = 0
+            for row in reader:
+                batch.append([None if field in ("", "\\N") else field for field in row[:len(columns)]])
+                rows += 1
+                if len(batch) == SQLITE_LOAD_BATCH_SIZE:
+                    cursor.executemany(query, batch)
+                    batch = []
+            if batch:
+                cursor.executemany(query, batch)
+        conn.commit()
+        return rows
+
+    def cancel(self, session, connection):
+        try:
+            connection.interrupt()
+        except sqlite3.ProgrammingError:
+            return False  # Already closed
+        return True
+
+    def sample_predicate(self, fraction):
+        # random() is a signed 64-bit integer; fold it into [0, 1000000)
+        return f"(random() % 1000000 + 1000000) % 1000000 < {round(fraction * 1000000)}"
+
+    def explain(self, cursor, sql, params=None):
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        plan = []
+        for row in cursor.fetchall():
+            detail = row[-1]
+            words = detail.split()
+            plan.append({
+                "table": words[1] if words[0] in ("SCAN", "SEARCH") and len(words) > 1 else None,
+                # "SCAN t" reads the whole table; "SCAN t USING INDEX i" walks an index in order
+                "full_scan": words[0] == "SCAN" and "INDEX" not in detail,
+                "sort": "TEMP B-TREE" in detail,
+                "rows": None,
+                "detail": detail
+            })
+        return plan
+
+    def list_indexes(self, cursor, database, table):
+        cursor.execute(f'PRAGMA index_list("{table}")')
+        names = [row[1] for row in cursor.fetchall()]
+        indexes = []
+        for name in names:
+            cursor.execute(f'PRAGMA index_info("{name}")')
+            indexes.append([row[2] for row in sorted(cursor.fetchall())])
+        cursor.execute(f'PRAGMA table_info("{table}")')
+        primary_key = [row[1] for row in sorted(cursor.fetchall(), key=lambda row: row[5]) if row[5]]
+        if primary_key:
+            indexes.append(primary_key)
+        return indexes
+
+    def foreign_keys(self, cursor, database):
+        keys = []
+        for table in self.list_tables(cursor, database):
+            cursor.execute(f'PRAGMA foreign_key_list("{table}")')
+            constraints = {}
+            for row in cursor.fetchall():
+                constraints.setdefault(row[0], []).append(row)
+            for rows in constraints.values():
+                if len(rows) != 1:
+                    continue
+                _, _, parent, column, parent_column = rows[0][:5]
+                if parent_column is None:
+                    # REFERENCES parent without a column list means the parent's primary key
+                    cursor.execute(f'PRAGMA table_info("{parent}")')
+                    primary_key = [row[1] for row in cursor.fetchall() if row[5]]
+                    if len(primary_key) != 1:
+                        continue
+                    parent_column = primary_key[0]
+                keys.append((table, column, parent, parent_column))
+        return keys
+
+
+def get_backend(name):
+    """Return a backend by name ('mysql' or 'sqlite')."""
+    if name == "mysql":
+        return MySQLBackend()
+    if name == "sqlite":
+        return SQLiteBackend()
+    raise ValueError(f"Unknown database backend '{name}'. Use 'mysql' or 'sqlite'.")
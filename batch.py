@@ -0,0 +1,243 @@
+import csv
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from db_connection import POOL_SIZE
+
+# Questions preprocessed and classified per task sent to a worker process
+BATCH_CHUNK_SIZE = int(os.environ.get("CHATDB_BATCH_CHUNK_SIZE", "64"))
+# Questions executed concurrently; each execution holds one pooled connection
+BATCH_CONCURRENCY = int(os.environ.get("CHATDB_BATCH_CONCURRENCY", str(max(1, POOL_SIZE - 1))))
+# Result rows written per question
+BATCH_MAX_ROWS = int(os.environ.get("CHATDB_BATCH_MAX_ROWS", "100"))
+# Print progress every this many questions
+PROGRESS_EVERY = 100
+
+
+def read_questions(path, default_database=None):
+    """
+    Read questions from a JSONL or CSV file.
+
+    JSONL lines are either a JSON string or an object with a `question` field
+    and optional `id` and `database` fields. CSV files need a `question` column
+    and may have `id` and `database` columns.
+
+    Yields:
+        dict: 'id', 'question' and 'database' of each question.
+    """
+    def record(number, data):
+        return {
+            "id": data.get("id") or number,
+            "question": (data.get("question") or "").strip(),
+            "database": data.get("database") or default_database
+        }
+
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            for number, row in enumerate(csv.DictReader(f), 1):
+                yield record(number, row)
+            return
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            data = json.loads(line)
+            yield record(number, {"question": data} if isinstance(data, str) else data)
+
+
+def _chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _analyzed_chunks(workers, chunks, ahead):
+    """
+    Yield (chunk, analyses) in input order, keeping at most `ahead` chunks submitted to `workers`.
+
+    Chunks are pulled from the iterator only as earlier ones finish, so the
+    questions file is streamed instead of being read into memory up front.
+    """
+    pending = deque()
+
+    def submit_next():
+        chunk = next(chunks, None)
+        if chunk is not None:
+            pending.append((chunk, workers.submit(analyze_questions, [item["question"] for item in chunk])))
+
+    for _ in range(ahead):
+        submit_next()
+    while pending:
+        chunk, future = pending.popleft()
+        submit_next()
+        yield chunk, future.result()
+
+
+def _init_worker():
+    import nlp_usage
+    nlp_usage.load_nlp_resources()
+
+
+def analyze_questions(questions):
+    """
+    Preprocess and classify a list of questions (runs in a worker process).
+
+    Returns:
+        list: (tokens, pattern) per question; pattern is None when no pattern is confident.
+    """
+    from intent_classifier import classify_batch
+    from nlp_usage import preprocess_query
+
+    token_lists = [preprocess_query(question) for question in questions]
+    return list(zip(token_lists, classify_batch(token_lists)))
+
+
+class _SessionPerThread:
+    """Give each execution thread its own pooled session, reused across questions."""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self._local = threading.local()
+        self._sessions = []
+        self._lock = threading.Lock()
+
+    def get(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = self.pool.session()
+            with self._lock:
+                self._sessions.append(session)
+        return session
+
+    def close(self):
+        for session in self._sessions:
+            session.close()
+
+
+def answer_question(sessions, item, tokens, pattern, max_rows):
+    """Translate one preprocessed question on a pooled session and run it."""
+    from db_connection import use_database
+    from nlp_usage import translate_tokens
+    from query_executor import fetch_preview
+
+    result = {"id": item["id"], "question": item["question"], "database": item["database"],
+              "sql": None, "params": None, "rows": None, "error": None}
+    if not item["database"]:
+        result["error"] = "No database given."
+        return result
+
+    session = sessions.get()
+    cursor = session.cursor()
+    try:
+        start = time.perf_counter()
+        use_database(cursor, item["database"])
+        entry, error = translate_tokens(cursor, tokens, item["database"], pattern=pattern,
+                                        interactive=False, save_cache=False)
+        result["translate_ms"] = (time.perf_counter() - start) * 1000
+        if entry is None:
+            result["error"] = error
+            return result
+        result["sql"] = entry["sql"]
+        result["params"] = entry.get("params") or []
+
+        start = time.perf_counter()
+        result["rows"] = [list(row) for row in fetch_preview(cursor, entry["sql"], max_rows, result["params"])]
+        result["execute_ms"] = (time.perf_counter() - start) * 1000
+    except Exception as e:
+        result["error"] = str(e)
+    finally:
+        cursor.close()
+    return result
+
+
+def run_batch(pool, input_path, output_path, database=None, processes=None,
+              concurrency=BATCH_CONCURRENCY, max_rows=BATCH_MAX_ROWS, chunk_size=BATCH_CHUNK_SIZE):
+    """
+    Translate and answer every question of a JSONL/CSV file without prompting.
+
+    Preprocessing and pattern classification are CPU-bound and run in a
+    process pool, `chunk_size` questions per task. Entity resolution needs the
+    database, so it runs with execution on `concurrency` threads, each holding
+    one pooled session; at most `pool.size - 1` threads, so one connection stays
+    free. The input is streamed, a few chunks ahead of execution. Results are appended to `output_path` (JSONL) as soon as
+    each question finishes, so they arrive in completion order; use the `id`
+    field to match them to the input.
+
+    Args:
+        pool: ConnectionPool used for execution.
+        input_path (str): JSONL or CSV file of questions (see read_questions).
+        output_path (str): JSONL file the results are written to.
+        database (str, optional): Database for questions that do not name one.
+        processes (int, optional): Worker processes for preprocessing (default: CPU count).
+        concurrency (int): Questions executed at the same time.
+        max_rows (int): Result rows kept per question.
+        chunk_size (int): Questions per preprocessing task.
+
+    Returns:
+        dict: 'questions', 'answered', 'failed', 'seconds' and 'questions_per_sec'.
+    """
+    import index_advisor
+    from nl_cache import translation_cache
+    from nlp_usage import load_nlp_resources
+
+    # Fail before starting any workers if NLTK data is missing
+    load_nlp_resources()
+
+    # One connection stays free, so a running query can still be cancelled (KILL QUERY needs its own)
+    concurrency = max(1, min(concurrency, pool.size - 1))
+    processes = processes or os.cpu_count() or 1
+    stats = {"questions": 0, "answered": 0, "failed": 0}
+    start = time.perf_counter()
+    sessions = _SessionPerThread(pool)
+
+    def write(result, out):
+        out.write(json.dumps(result, default=str) + "\n")
+        stats["questions"] += 1
+        stats["answered" if result["error"] is None else "failed"] += 1
+        if stats["questions"] % PROGRESS_EVERY == 0:
+            out.flush()
+            elapsed = time.perf_counter() - start
+            print(f"\r{stats['questions']:,} questions ({stats['questions'] / elapsed:,.1f} questions/sec)",
+                  end="", flush=True)
+
+    chunks = _chunks(read_questions(input_path, database), chunk_size)
+    with ProcessPoolExecutor(processes, initializer=_init_worker) as workers, \
+            ThreadPoolExecutor(concurrency) as executors, \
+            open(output_path, "w", encoding="utf-8") as out:
+        in_flight = set()
+        try:
+            for chunk, analyses in _analyzed_chunks(workers, chunks, 2 * processes):
+                for item, (tokens, pattern) in zip(chunk, analyses):
+                    # Bound the queue so finished results are written while later chunks are preprocessed
+                    while len(in_flight) >= concurrency * 4:
+                        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            write(future.result(), out)
+                    in_flight.add(executors.submit(answer_question, sessions, item, tokens, pattern, max_rows))
+            for future in wait(in_flight).done:
+                write(future.result(), out)
+        finally:
+            executors.shutdown(wait=True)
+            sessions.close()
+            translation_cache.save()
+            index_advisor.save()
+
+    stats["seconds"] = time.perf_counter() - start
+    stats["questions_per_sec"] = stats["questions"] / stats["seconds"] if stats["seconds"] else 0.0
+    print(f"\r{stats['questions']:,} questions in {stats['seconds']:.1f}s "
+          f"({stats['questions_per_sec']:,.1f} questions/sec): {stats['answered']:,} answered, {stats['failed']:,} failed.")
+    return stats
+
+
+def default_output_path(input_path):
+    """Results file next to the input: questions.jsonl -> questions.results.jsonl."""
+    return f"{os.path.splitext(input_path)[0]}.results.jsonl"
@@ -0,0 +1,123 @@
+"""
+Deterministic synthetic data shaped like the Olist `customers`, `orders` and
+`payments` tables of query_generator.DATABASE_SCHEMA.
+
+The same scale and seed always produce byte-identical files, so benchmark
+results can be compared across commits. Rows are streamed to disk, so any
+scale fits in memory. Run from the project root:
+
+    python -m benchmarks.olist_data --scale 100000 --output bench_data
+"""
+import argparse
+import csv
+import datetime
+import os
+import random
+
+# Table -> CSV header, in the column order of the real Olist files
+COLUMNS = {
+    "customers": ["customer_id", "customer_unique_id", "customer_zip_code_prefix", "customer_city", "customer_state"],
+    "orders": ["order_id", "customer_id", "order_status", "order_purchase_timestamp", "order_approved_at",
+               "order_delivered_carrier_date", "order_delivered_customer_date", "order_estimated_delivery_date"],
+    "payments": ["order_id", "payment_sequential", "payment_type", "payment_installments", "payment_value"]
+}
+
+# (city, state) pairs weighted roughly like the real dataset
+CITIES = [
+    ("sao paulo", "SP"), ("rio de janeiro", "RJ"), ("belo horizonte", "MG"), ("brasilia", "DF"),
+    ("curitiba", "PR"), ("campinas", "SP"), ("porto alegre", "RS"), ("salvador", "BA"),
+    ("guarulhos", "SP"), ("niteroi", "RJ"), ("fortaleza", "CE"), ("recife", "PE")
+]
+CITY_WEIGHTS = [16, 7, 3, 2, 2, 2, 2, 1, 1, 1, 1, 1]
+ORDER_STATUSES = ["delivered", "shipped", "canceled", "unavailable", "invoiced", "processing", "created", "approved"]
+ORDER_STATUS_WEIGHTS = [970, 11, 6, 6, 3, 3, 1, 1]
+PAYMENT_TYPES = ["credit_card", "boleto", "voucher", "debit_card"]
+PAYMENT_TYPE_WEIGHTS = [74, 19, 5, 2]
+
+START = datetime.datetime(2016, 9, 4)
+SPAN_SECONDS = 2 * 365 * 24 * 3600
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _hex_id(rng):
+    return f"{rng.getrandbits(128):032x}"
+
+
+def _timestamp(moment):
+    return moment.strftime(TIMESTAMP_FORMAT) if moment else ""
+
+
+def generate(directory, scale, seed=0):
+    """
+    Write customers.csv, orders.csv and payments.csv into `directory`.
+
+    Args:
+        directory (str): Output directory, created if needed.
+        scale (int): Number of orders. There is one customer per order, and
+            about 4% of orders are split over several payment rows.
+        seed (int): Random seed; the same seed and scale give identical files.
+
+    Returns:
+        dict: Table name -> (file path, row count).
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    paths = {table: os.path.join(directory, f"{table}.csv") for table in COLUMNS}
+    counts = dict.fromkeys(COLUMNS, 0)
+
+    files = {table: open(path, "w", newline="", encoding="utf-8") for table, path in paths.items()}
+    try:
+        writers = {table: csv.writer(f, lineterminator="\n") for table, f in files.items()}
+        for table, writer in writers.items():
+            writer.writerow(COLUMNS[table])
+
+        for _ in range(scale):
+            customer_id = _hex_id(rng)
+            city, state = rng.choices(CITIES, CITY_WEIGHTS)[0]
+            writers["customers"].writerow([
+                customer_id, _hex_id(rng), f"{rng.randint(1000, 99999):05d}", city, state
+            ])
+
+            order_id = _hex_id(rng)
+            status = rng.choices(ORDER_STATUSES, ORDER_STATUS_WEIGHTS)[0]
+            purchased = START + datetime.timedelta(seconds=rng.randrange(SPAN_SECONDS))
+            approved = purchased + datetime.timedelta(minutes=rng.randint(5, 2880)) if status != "created" else None
+            carrier = approved + datetime.timedelta(days=rng.randint(1, 5)) if approved and status in ("delivered", "shipped") else None
+            delivered = carrier + datetime.timedelta(days=rng.randint(2, 20)) if carrier and status == "delivered" else None
+            estimated = purchased + datetime.timedelta(days=rng.randint(15, 40))
+            writers["orders"].writerow([
+                order_id, customer_id, status, _timestamp(purchased), _timestamp(approved),
+                _timestamp(carrier), _timestamp(delivered), _timestamp(estimated.replace(hour=0, minute=0, second=0))
+            ])
+
+            payment_type = rng.choices(PAYMENT_TYPES, PAYMENT_TYPE_WEIGHTS)[0]
+            installments = rng.randint(1, 10) if payment_type == "credit_card" else 1
+            total = round(rng.lognormvariate(4.7, 0.8), 2)
+            parts = rng.randint(2, 3) if rng.random() < 0.04 else 1
+            for sequential in range(1, parts + 1):
+                writers["payments"].writerow([
+                    order_id, sequential, payment_type, installments, f"{total / parts:.2f}"
+                ])
+                counts["payments"] += 1
+            counts["customers"] += 1
+            counts["orders"] += 1
+    finally:
+        for f in files.values():
+            f.close()
+
+    return {table: (paths[table], counts[table]) for table in COLUMNS}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate deterministic Olist-shaped CSV files.")
+    parser.add_argument("--scale", type=int, default=10000, help="number of orders (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed (default: %(default)s)")
+    parser.add_argument("--output", default="bench_data", help="output directory (default: %(default)s)")
+    args = parser.parse_args()
+
+    for table, (path, rows) in generate(args.output, args.scale, args.seed).items():
+        print(f"{table:<10}{rows:>12,} rows  {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""
+Pipeline benchmark: time every stage of ChatDB on deterministic synthetic data.
+
+The Olist-shaped tables from benchmarks/olist_data.py are loaded through the
+same path as upload_dataset (profile, CREATE TABLE, ingest), then a fixed set
+of natural language questions is run stage by stage: preprocess_query,
+match_query_pattern, identify_entities, SQL generation, execution and fetch.
+Latency percentiles per stage, peak RSS and the run settings are written as
+JSON so runs can be compared across commits. Run from the project root:
+
+    python -m benchmarks.pipeline --scale 10000 --output before.json
+    python -m benchmarks.pipeline --scale 10000 --output after.json --baseline before.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+from benchmarks.olist_data import generate  # noqa: E402
+
+# Environment variables naming ChatDB's on-disk caches and stores -> their name inside the benchmark's workdir
+CACHE_LOCATIONS = {
+    "CHATDB_INDEX_DIR": "index",
+    "CHATDB_STATS_DIR": "stats",
+    "CHATDB_JOIN_GRAPH_DIR": "joins",
+    "CHATDB_NL_CACHE_PATH": "nl_cache.json",
+    "CHATDB_ROLLUP_DIR": "rollups",
+    "CHATDB_SAMPLE_DIR": "samples",
+    "CHATDB_WORKLOAD_PATH": "workload.json",
+    "CHATDB_INGEST_DIR": "ingest",
+    "CHATDB_BULK_DIR": "bulk"
+}
+
+STAGES = ["preprocess_query", "match_query_pattern", "identify_entities", "generate_sql", "execute", "fetch"]
+
+# Questions about the benchmark tables, with the tokens preprocess_query gives
+# for them; the tokens are used directly when the NLTK data is not installed.
+QUESTIONS = [
+    ("Find orders where order status is delivered", ["find", "order", "order", "status", "delivered"]),
+    ("Show total payment value in payments", ["show", "total", "payment", "value", "payment"]),
+    ("Show average payment installments by payment type", ["show", "average", "payment", "installment", "payment", "type"]),
+    ("List all customers ordered by customer zip code prefix", ["list", "customer", "ordered", "customer", "zip", "code", "prefix"]),
+    ("How many customers by customer state", ["many", "customer", "customer", "state"]),
+    ("Find the maximum payment value", ["find", "maximum", "payment", "value"]),
+    ("Find customers where customer city is curitiba", ["find", "customer", "customer", "city", "curitiba"]),
+    ("Combine orders and payments data", ["combine", "order", "payment", "data"])
+]
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(samples):
+    """Return count, mean and p50/p95/p99 (milliseconds) of a list of durations in seconds."""
+    values = sorted(sample * 1000 for sample in samples)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean_ms": sum(values) / len(values),
+        "p50_ms": percentile(values, 0.50),
+        "p95_ms": percentile(values, 0.95),
+        "p99_ms": percentile(values, 0.99),
+        "max_ms": values[-1]
+    }
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process, or None where the resource module is unavailable."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def git_commit():
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_DIR, capture_output=True, text=True)
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+
+def load_tables(pool, database, files):
+    """
+    Load the generated CSV files the way upload_dataset does and time each one.
+
+    Returns:
+        dict: Table name -> ingest stats from ingest_csv.
+    """
+    from csv_profiler import profile_csv
+    from db_connection import use_database
+    from db_operation import create_table_from_csv
+    from ingest import ingest_csv
+    from schema_catalog import catalog
+
+    results = {}
+    with pool.session() as session:
+        cursor = session.cursor()
+        pool.backend.create_database(cursor, database)
+        use_database(cursor, database)
+        for table, (path, _) in files.items():
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+            catalog.invalidate(database, table)
+            start = time.perf_counter()
+            profile = profile_csv(path)
+            candidates = profile["primary_key_candidates"]
+            create_table_from_csv(cursor, table, profile, candidates[0] if candidates else None)
+            session.commit()
+            profile_seconds = time.perf_counter() - start
+            stats = ingest_csv(pool, database, table, path)
+            print()
+            stats["profile_seconds"] = profile_seconds
+            stats.pop("quarantined", None)
+            results[table] = stats
+    return results
+
+
+def _run_question(cursor, database, question, recorded_tokens, use_nltk):
+    """Translate and run one question, returning (stage -> seconds, detail dict)."""
+    import nlp_usage
+
+    timings = {}
+    detail = {"question": question, "pattern": None, "sql": None, "params": None, "rows": None}
+    start = time.perf_counter()
+    tokens = nlp_usage.preprocess_query(question) if use_nltk else list(recorded_tokens)
+    if use_nltk:
+        timings["preprocess_query"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pattern = nlp_usage.match_query_pattern(tokens)
+    timings["match_query_pattern"] = time.perf_counter() - start
+    if not pattern:
+        return timings, detail
+    detail["pattern"] = pattern
+
+    start = time.perf_counter()
+    table1, table2, attribute1, attribute2, value, joins = nlp_usage.identify_entities(pattern, list(tokens), cursor, database)
+    timings["identify_entities"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sql, params = nlp_usage.generate_sql_query_from_nl(pattern, table1, table2, attribute1, attribute2, value, joins)
+    timings["generate_sql"] = time.perf_counter() - start
+    if not (table1 and attribute1 and sql):
+        return timings, detail
+    detail["sql"] = sql
+    detail["params"] = list(params)
+
+    start = time.perf_counter()
+    if params:
+        # Same path as fetch_preview: the session's prepared-statement cache
+        cursor = cursor.session.execute_prepared(sql, params)
+    else:
+        cursor.execute(sql)
+    timings["execute"] = time.perf_counter() - start
+    start = time.perf_counter()
+    detail["rows"] = len(cursor.fetchall())
+    timings["fetch"] = time.perf_counter() - start
+    return timings, detail
+
+
+def run_questions(cursor, database, repeat):
+    """
+    Run every question `repeat` times, timing each stage separately.
+
+    Returns:
+        tuple: (stage -> list of durations in seconds, per-question details).
+    """
+    import nlp_usage
+
+    try:
+        nlp_usage.load_nlp_resources()
+        use_nltk = True
+    except LookupError as e:
+        print(f"{e}\nUsing the recorded tokens instead; preprocess_query is not timed.")
+        use_nltk = False
+
+    samples = {stage: [] for stage in STAGES}
+    details = []
+    for question, recorded_tokens in QUESTIONS:
+        for iteration in range(repeat):
+            timings, detail = _run_question(cursor, database, question, recorded_tokens, use_nltk)
+            for stage, seconds in timings.items():
+                samples[stage].append(seconds)
+            if iteration == 0:
+                details.append(detail)
+    return samples, details
+
+
+def compare(result, baseline):
+    """Print the p50/p95 change of every stage against a baseline result."""
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'}:")
+    print(f"{'stage':<22}{'p50 ms':>10}{'was':>10}{'p95 ms':>10}{'was':>10}")
+    for stage, stats in result["stages"].items():
+        old = baseline.get("stages", {}).get(stage, {})
+        if not stats.get("count") or not old.get("count"):
+            continue
+        print(f"{stage:<22}{stats['p50_ms']:>10.3f}{old['p50_ms']:>10.3f}{stats['p95_ms']:>10.3f}{old['p95_ms']:>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark each ChatDB pipeline stage on synthetic Olist data.")
+    parser.add_argument("--scale", type=int, default=10000, help="number of orders to generate (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0, help="data generator seed (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=20, help="runs per question (default: %(default)s)")
+    parser.add_argument("--backend", choices=["mysql", "sqlite"], default="sqlite")
+    parser.add_argument("--database", default="chatdb_bench",
+                        help="database the benchmark tables are (re)created in (default: %(default)s)")
+    parser.add_argument("--data-dir", help="write the generated CSV files here and keep them (default: a temporary directory)")
+    parser.add_argument("--output", default="bench_results.json", help="JSON result file (default: %(default)s)")
+    parser.add_argument("--baseline", help="earlier JSON result to compare against")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="chatdb_bench_")
+    # Every run starts cold: caches left by an earlier run (another --seed or --scale) would
+    # answer for the previous dataset. The modules read these paths when first imported.
+    for variable, name in CACHE_LOCATIONS.items():
+        os.environ[variable] = os.path.join(workdir, name)
+
+    from backends import MySQLBackend, SQLiteBackend
+    from db_connection import ConnectionPool
+
+    data_dir = args.data_dir or os.path.join(workdir, "data")
+    backend = SQLiteBackend(os.path.join(workdir, "sqlite")) if args.backend == "sqlite" else MySQLBackend()
+    pool = ConnectionPool(backend=backend)
+    try:
+        start = time.perf_counter()
+        files = generate(data_dir, args.scale, args.seed)
+        generate_seconds = time.perf_counter() - start
+
+        ingest = load_tables(pool, args.database, files)
+        with pool.session(args.database) as session:
+            samples, details = run_questions(session.cursor(), args.database, args.repeat)
+    finally:
+        pool.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    result = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "backend": args.backend,
+        "scale": args.scale,
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "rows": {table: rows for table, (_, rows) in files.items()},
+        "generate_seconds": generate_seconds,
+        "ingest": ingest,
+        "stages": {stage: summarize(values) for stage, values in samples.items()},
+        "peak_rss_bytes": peak_rss_bytes(),
+        "questions": details
+    }
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+        f.write("\n")
+
+    print(f"\n{'stage':<22}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for stage, stats in result["stages"].items():
+        if stats["count"]:
+            print(f"{stage:<22}{stats['count']:>7}{stats['p50_ms']:>10.3f}{stats['p95_ms']:>10.3f}{stats['p99_ms']:>10.3f}")
+    if result["peak_rss_bytes"]:
+        print(f"peak RSS: {result['peak_rss_bytes'] / 2 ** 20:.1f} MiB")
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            compare(result, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Startup benchmark: report the cold import time of each ChatDB module.
+
+Every import runs in a fresh interpreter so module caches from earlier runs
+do not hide the cost. Run from the project root:
+
+    python -m benchmarks.startup [--repeat N]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ["db_connection", "schema_catalog", "value_index", "db_operation", "query_generator", "nlp_usage", "main"]
+
+_TIMER = (
+    "import time; start = time.perf_counter(); import {module}; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def time_import(module, repeat):
+    """Return the import times (in seconds) of `module` over `repeat` fresh interpreters."""
+    timings = []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-c", _TIMER.format(module=module)],
+            cwd=PROJECT_DIR, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            error = result.stderr.strip().splitlines()
+            raise RuntimeError(error[-1] if error else f"import {module} failed")
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report cold import time per ChatDB module.")
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per module")
+    args = parser.parse_args()
+
+    print(f"{'module':<18}{'median ms':>12}{'min ms':>10}{'max ms':>10}")
+    for module in MODULES:
+        try:
+            timings = time_import(module, args.repeat)
+        except RuntimeError as e:
+            print(f"{module:<18}  error: {e}")
+            continue
+        print(f"{module:<18}{statistics.median(timings) * 1000:>12.1f}"
+              f"{min(timings) * 1000:>10.1f}{max(timings) * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
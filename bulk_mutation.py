@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+from query_executor import iter_rows
+from rollups import apply_changes, has_rollups, select_rows
+from schema_catalog import catalog
+
+# Rows changed per batch; a batch is the unit of commit and checkpointing
+BULK_BATCH_SIZE = int(os.environ.get("CHATDB_BULK_BATCH_SIZE", "1000"))
+# Seconds to pause after each batch so other sessions get the rows and the server catches up
+BULK_THROTTLE = float(os.environ.get("CHATDB_BULK_THROTTLE", "0.05"))
+# Checkpoints of interrupted bulk updates/deletes are written here
+BULK_DIR = os.environ.get(
+    "CHATDB_BULK_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".chatdb_bulk")
+)
+# Seconds between progress lines
+PROGRESS_INTERVAL = 2.0
+
+
+def _checkpoint_path(database, table_name, statement, params):
+    """Checkpoints are keyed by table and by the statement with its parameters."""
+    key = json.dumps([statement, list(params)], default=str)
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(BULK_DIR, f"{database}.{table_name}.{digest}.json")
+
+
+def _statement(table_name, column, where):
+    if column is None:
+        return f"DELETE FROM `{table_name}` WHERE ({where})"
+    return f"UPDATE `{table_name}` SET `{column}` = %s WHERE ({where})"
+
+
+def _params(column, value, where_params):
+    return ((value,) if column is not None else ()) + tuple(where_params)
+
+
+def has_bulk_checkpoint(database, table_name, where, where_params=(), column=None, value=None):
+    """Return True if an interrupted bulk update (or delete, without `column`) can be resumed."""
+    return os.path.exists(_checkpoint_path(database, table_name, _statement(table_name, column, where),
+                                           _params(column, value, where_params)))
+
+
+def discard_bulk_checkpoint(database, table_name, where, where_params=(), column=None, value=None):
+    """Forget an interrupted bulk update/delete so the next run resolves its rows again."""
+    path = _checkpoint_path(database, table_name, _statement(table_name, column, where),
+                            _params(column, value, where_params))
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def _save_checkpoint(path, checkpoint):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # A temporary file of its own, so writers in other threads never replace each other's
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f"{os.path.basename(path)}.", suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, default=str)
+    os.replace(tmp_path, path)
+
+
+def _key_sql(primary_key):
+    columns = ", ".join(f"`{column}`" for column in primary_key)
+    return columns if len(primary_key) == 1 else f"({columns})"
+
+
+def key_ranges(cursor, table_name, primary_key, where, where_params=(), batch_size=BULK_BATCH_SIZE):
+    """
+    Resolve the primary keys of the rows a condition matches, in key order, and
+    cut them into ranges of `batch_size` keys. The keys are streamed; only the
+    first and last key of each range are kept.
+
+    Returns:
+        list: [first key, last key, rows] per range; keys are lists of primary key values.
+    """
+    key_sql = ", ".join(f"`{column}`" for column in primary_key)
+    cursor.execute(f"SELECT {key_sql} FROM `{table_name}` WHERE ({where}) ORDER BY {key_sql}", tuple(where_params) or None)
+    ranges = []
+    first = last = None
+    count = 0
+    for row in iter_rows(cursor):
+        if count == 0:
+            first = list(row)
+        last = list(row)
+        count += 1
+        if count == batch_size:
+            ranges.append([first, last, count])
+            count = 0
+    if count:
+        ranges.append([first, last, count])
+    return ranges
+
+
+def bulk_mutate(cursor, conn, database, table_name, where, where_params=(), column=None, value=None,
+                batch_size=BULK_BATCH_SIZE, throttle=BULK_THROTTLE, dry_run=False):
+    """
+    Apply an UPDATE (`column` = `value`) or a DELETE (no `column`) in primary-key-ranged batches.
+
+    The primary keys of the matching rows are resolved first, with a plain
+    SELECT that takes no locks. Each range of `batch_size` keys is then
+    changed with `WHERE (condition) AND key BETWEEN first AND last` and
+    committed on its own, followed by a `throttle` pause. Row locks and the
+    undo log therefore never cover more than one batch. Completed batches are
+    recorded in a checkpoint file, and running the same statement again after an
+    interruption resumes with the next batch. Rollups are kept current batch by batch.
+
+    Args:
+        cursor: Cursor already using `database`.
+        conn: The connection or session to commit on.
+        database (str): The database name.
+        table_name (str): The table to change; it must have a primary key.
+        where (str): The condition, with %s placeholders for `where_params`.
+        where_params (tuple): Parameters of the condition.
+        column (str, optional): The column to set; omit for a DELETE.
+        value: The new value of `column`.
+        batch_size (int): Rows per batch.
+        throttle (float): Seconds to pause between batches.
+        dry_run (bool): Only count the matching rows and batches; change nothing.
+
+    Returns:
+        dict: 'rows' (rows matched), 'batches', 'changed' (rows the database reported changed),
+        'seconds', 'rows_per_sec' and 'resumed' (batches skipped from an earlier run).
+
+    Raises:
+        ValueError: If the table has no primary key.
+    """
+    entry = catalog.get_table(cursor, table_name, database)
+    primary_key = entry["primary_key"] if entry else []
+    if not primary_key:
+        raise ValueError(f"Table '{table_name}' has no primary key to split the change into batches.")
+
+    statement = _statement(table_name, column, where)
+    params = _params(column, value, where_params)
+    checkpoint_path = _checkpoint_path(database, table_name, statement, params)
+    start = time.perf_counter()
+
+    if os.path.exists(checkpoint_path) and not dry_run:
+        with open(checkpoint_path, encoding="utf-8") as f:
+            checkpoint = json.load(f)
+    else:
+        checkpoint = {"ranges": key_ranges(cursor, table_name, primary_key, where, where_params, batch_size),
+                      "completed": 0, "changed": 0}
+    ranges = checkpoint["ranges"]
+    rows = sum(count for _, _, count in ranges)
+    if dry_run:
+        return {"rows": rows, "batches": len(ranges), "changed": 0,
+                "seconds": time.perf_counter() - start, "rows_per_sec": 0.0, "resumed": 0}
+    resumed = checkpoint["completed"]
+    _save_checkpoint(checkpoint_path, checkpoint)
+
+    key_sql = _key_sql(primary_key)
+    bound = "%s" if len(primary_key) == 1 else f"({', '.join(['%s'] * len(primary_key))})"
+    range_condition = f"({where}) AND {key_sql} >= {bound} AND {key_sql} <= {bound}"
+    track_rollups = has_rollups(database, table_name)
+    reported_at = time.monotonic()
+
+    for index in range(resumed, len(ranges)):
+        first, last, _ = ranges[index]
+        range_params = tuple(where_params) + tuple(first) + tuple(last)
+        try:
+            old_rows = select_rows(cursor, f"`{table_name}`", range_condition, range_params) if track_rollups else []
+            cursor.execute(f"{statement} AND {key_sql} >= {bound} AND {key_sql} <= {bound}",
+                           params + tuple(first) + tuple(last))
+            changed = max(cursor.rowcount, 0)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        if track_rollups:
+            added = [dict(row, **{column: value}) for row in old_rows] if column is not None else []
+            apply_changes(cursor, database, table_name, removed=old_rows, added=added)
+        checkpoint["completed"] = index + 1
+        checkpoint["changed"] += changed
+        _save_checkpoint(checkpoint_path, checkpoint)
+
+        if time.monotonic() - reported_at >= PROGRESS_INTERVAL or index + 1 == len(ranges):
+            done = sum(count for _, _, count in ranges[:index + 1])
+            print(f"  {index + 1}/{len(ranges)} batches, {done:,}/{rows:,} rows")
+            reported_at = time.monotonic()
+        if throttle and index + 1 < len(ranges):
+            time.sleep(throttle)
+
+    os.remove(checkpoint_path)
+    seconds = time.perf_counter() - start
+    processed = sum(count for _, _, count in ranges[resumed:])
+    return {
+        "rows": rows,
+        "batches": len(ranges),
+        "changed": checkpoint["changed"],
+        "seconds": seconds,
+        "rows_per_sec": processed / seconds if seconds > 0 else 0.0,
+        "resumed": resumed
+    }
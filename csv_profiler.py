@@ -0,0 +1,192 @@
+import csv
+import os
+import re
+from datetime import datetime
+
+# Rows scanned to infer column types; 0 scans the whole file
+PROFILE_SAMPLE_ROWS = int(os.environ.get("CHATDB_PROFILE_SAMPLE_ROWS", "100000"))
+# Rows read per chunk while profiling
+PROFILE_CHUNK_SIZE = 10000
+# Stop tracking uniqueness of a column after this many distinct values
+UNIQUE_TRACK_LIMIT = 500000
+
+# Values treated as NULL, matching how the CSV is loaded
+NULL_VALUES = ("", "\\N")
+
+INT_RANGE = (-2147483648, 2147483647)
+BIGINT_RANGE = (-9223372036854775808, 9223372036854775807)
+MAX_DECIMAL_PRECISION = 65
+MAX_CHAR_LENGTH = 64
+MAX_VARCHAR_LENGTH = 255
+
+_INT_PATTERN = re.compile(r"^[+-]?(0|[1-9]\d*)$")
+_DECIMAL_PATTERN = re.compile(r"^[+-]?(\d+)(?:\.(\d+))?$")
+# Plain decimals too (a column of "1e5" and "1.5" is all floats), but not leading zeros
+_FLOAT_PATTERN = re.compile(r"^[+-]?((0|[1-9]\d*)(\.\d*)?|\.\d+)([eE][+-]?\d+)?$")
+_DATETIME_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}(:\d{2}(\.\d{1,6})?)?)?$")
+
+
+class ColumnProfile:
+    """Running statistics for one CSV column, used to pick the tightest MySQL type."""
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.nulls = 0
+        self.is_int = True
+        self.is_decimal = True
+        self.is_float = True
+        self.is_datetime = True
+        self.has_time = False
+        self.min_int = None
+        self.max_int = None
+        self.integer_digits = 0
+        self.scale = 0
+        self.min_length = None
+        self.max_length = 0
+        self.unique = True
+        self._seen = set()
+
+    def add(self, value):
+        self.count += 1
+        if value in NULL_VALUES:
+            self.nulls += 1
+            self.unique = False
+            self._seen = None
+            return
+
+        length = len(value)
+        self.max_length = max(self.max_length, length)
+        self.min_length = length if self.min_length is None else min(self.min_length, length)
+
+        if self.unique:
+            if value in self._seen:
+                self.unique = False
+                self._seen = None
+            elif len(self._seen) >= UNIQUE_TRACK_LIMIT:
+                # Too many values to prove uniqueness; do not propose this column as a key
+                self.unique = False
+                self._seen = None
+            else:
+                self._seen.add(value)
+
+        if self.is_int:
+            if _INT_PATTERN.match(value):
+                number = int(value)
+                self.min_int = number if self.min_int is None else min(self.min_int, number)
+                self.max_int = number if self.max_int is None else max(self.max_int, number)
+            else:
+                # Leading zeros (e.g. zip code prefixes) must survive, so they stay strings
+                self.is_int = False
+
+        if self.is_decimal:
+            match = _DECIMAL_PATTERN.match(value)
+            if match and not (len(match.group(1)) > 1 and match.group(1).startswith("0")):
+                self.integer_digits = max(self.integer_digits, len(match.group(1).lstrip("0")) or 1)
+                self.scale = max(self.scale, len(match.group(2) or ""))
+            else:
+                self.is_decimal = False
+
+        if self.is_float and not self.is_decimal and not _FLOAT_PATTERN.match(value):
+            self.is_float = False
+
+        if self.is_datetime:
+            if _DATETIME_PATTERN.match(value):
+                try:
+                    datetime.fromisoformat(value)
+                    self.has_time = self.has_time or length > 10
+                except ValueError:
+                    self.is_datetime = False
+            else:
+                self.is_datetime = False
+
+    def sql_type(self, exact=True):
+        """
+        Return the tightest MySQL column type for the values seen.
+
+        Args:
+            exact (bool): True if every row was scanned. Sampled profiles get
+            headroom on lengths and precision so unseen rows still fit.
+        """
+        if self.count == self.nulls:
+            return f"VARCHAR({MAX_VARCHAR_LENGTH})"
+        if self.is_int:
+            low, high = INT_RANGE
+            if exact and low <= self.min_int and self.max_int <= high:
+                return "INT"
+            if not exact and low // 2 <= self.min_int and self.max_int <= high // 2:
+                return "INT"
+            if BIGINT_RANGE[0] <= self.min_int and self.max_int <= BIGINT_RANGE[1]:
+                return "BIGINT"
+            return f"DECIMAL({min(MAX_DECIMAL_PRECISION, len(str(max(abs(self.min_int), abs(self.max_int)))))},0)"
+        if self.is_decimal:
+            integer_digits = self.integer_digits if exact else self.integer_digits + 2
+            precision = integer_digits + self.scale
+            if precision <= MAX_DECIMAL_PRECISION:
+                return f"DECIMAL({precision},{self.scale})"
+            return "DOUBLE"
+        if self.is_float:
+            return "DOUBLE"
+        if self.is_datetime:
+            return "DATETIME" if self.has_time else "DATE"
+        # A sample that only saw one width does not prove the column is fixed-width
+        if exact and self.min_length == self.max_length and self.max_length <= MAX_CHAR_LENGTH:
+            return f"CHAR({self.max_length})"
+        length = self.max_length if exact else self.max_length * 2
+        if length <= MAX_VARCHAR_LENGTH:
+            return f"VARCHAR({max(length, 1)})"
+        return "TEXT"
+
+    @property
+    def is_key_candidate(self):
+        """True if the column had no NULLs and no repeated values."""
+        return self.unique and self.nulls == 0 and self.count > 0
+
+
+def profile_csv(file_path, sample_rows=PROFILE_SAMPLE_ROWS, chunk_size=PROFILE_CHUNK_SIZE):
+    """
+    Scan a CSV file in chunks and infer a MySQL type for every column.
+
+    Args:
+        file_path (str): Path to the CSV file (with a header row).
+        sample_rows (int): Number of data rows to scan; 0 scans the whole file.
+        chunk_size (int): Rows read per chunk.
+
+    Returns:
+        dict: 'columns' (list of (name, sql_type) pairs), 'primary_key_candidates'
+        (unique, never-empty columns), 'rows' scanned and whether the scan was 'exact'.
+    """
+    with open(file_path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if not header:
+            raise ValueError(f"CSV file '{file_path}' has no header row.")
+        profiles = [ColumnProfile(name) for name in header]
+
+        rows = 0
+        exhausted = False
+        while not exhausted:
+            limit = min(chunk_size, sample_rows - rows) if sample_rows else chunk_size
+            if limit <= 0:
+                # Sample is full; the scan is exact only if nothing is left to read
+                exhausted = next(reader, None) is None
+                break
+            chunk = []
+            for row in reader:
+                chunk.append(row)
+                if len(chunk) == limit:
+                    break
+            else:
+                exhausted = True
+            for row in chunk:
+                for profile, value in zip(profiles, row):
+                    profile.add(value)
+            rows += len(chunk)
+
+    exact = exhausted
+    return {
+        "columns": [(profile.name, profile.sql_type(exact)) for profile in profiles],
+        "primary_key_candidates": [profile.name for profile in profiles if profile.is_key_candidate],
+        "rows": rows,
+        "exact": exact
+    }
@@ -1,22 +1,419 @@
-import mysql.connector
+import configparser
+import os
+import queue
+import re
+import threading
+import time
+import weakref
+from collections import OrderedDict
 # import csv
 
-def connect_to_db():
-    """Establish a connection to the MySQL database."""
-    try:
-        conn = mysql.connector.connect(
-            host="localhost",          # Update with your MySQL host
-            user="root",      # Update with your MySQL username
-            password="",  # Update with your MySQL password
-            database="",                # Leave empty; database will be selected dynamically
-            allow_local_infile=True
-        )
-        print("Connected to MySQL database!")
-        return conn
-    except mysql.connector.Error as err:
-        print(f"Error: {err}")
-        exit(1)
-    # return conn
+import tracing
+from backends import DatabaseConnectionError, MySQLBackend, get_backend
+
+# Optional INI file with a [mysql] section; CHATDB_DB_* environment variables take precedence
+CONFIG_FILE = os.environ.get(
+    "CHATDB_CONFIG",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "chatdb.ini")
+)
+DEFAULT_DB_CONFIG = {"host": "localhost", "port": "3306", "user": "root", "password": ""}
+
+# Maximum number of open connections per pool
+POOL_SIZE = int(os.environ.get("CHATDB_POOL_SIZE", "5"))
+# Idle connections older than this (seconds) are pinged before being handed out
+HEALTH_CHECK_INTERVAL = float(os.environ.get("CHATDB_HEALTH_CHECK_INTERVAL", "30"))
+# Prepared statements kept open per session (least recently used are closed first)
+PREPARED_CACHE_SIZE = int(os.environ.get("CHATDB_PREPARED_CACHE_SIZE", "32"))
+
+# MySQL client error codes meaning the server connection is gone
+CONNECTION_LOST_ERRORS = (2006, 2013, 2055)
+# Statements that are safe to retry after reconnecting
+RETRYABLE_STATEMENTS = ("select", "show", "describe", "explain", "use")
+_USE_PATTERN = re.compile(r"^\s*use\s+`?(\w+)`?\s*;?\s*$", re.IGNORECASE)
+
+
+def load_db_config(config_file=CONFIG_FILE):
+    """
+    Read MySQL connection settings.
+
+    Values come from the defaults, then the [mysql] section of `config_file` if it
+    exists, then the CHATDB_DB_HOST/PORT/USER/PASSWORD environment variables.
+
+    Returns:
+        dict: Keyword arguments for mysql.connector.connect.
+    """
+    config = dict(DEFAULT_DB_CONFIG)
+    parser = configparser.ConfigParser()
+    if parser.read(config_file) and parser.has_section("mysql"):
+        for key in config:
+            if parser.has_option("mysql", key):
+                config[key] = parser.get("mysql", key)
+    for key in config:
+        value = os.environ.get(f"CHATDB_DB_{key.upper()}")
+        if value is not None:
+            config[key] = value
+    config["port"] = int(config["port"])
+    return config
+
+
+# Database engine used by default: "mysql" or the embedded "sqlite"
+BACKEND = os.environ.get("CHATDB_BACKEND", "mysql")
+
+
+def connect_to_db(config=None):
+    """
+    Establish a single, unpooled connection to the MySQL database.
+
+    Raises:
+        DatabaseConnectionError: If the server cannot be reached.
+    """
+    conn = MySQLBackend().connect(config or load_db_config())
+    print("Connected to MySQL database!")
+    return conn
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of database connections.
+
+    Connections are opened lazily up to `size` through `backend` (see
+    backends.py; defaults to BACKEND). Idle connections are pinged before
+    reuse once they have been idle for `health_check_interval` seconds, and
+    dead ones are replaced transparently.
+    """
+
+    def __init__(self, config=None, size=POOL_SIZE, health_check_interval=HEALTH_CHECK_INTERVAL, backend=None):
+        self.backend = backend or get_backend(BACKEND)
+        if config is None and self.backend.name == "mysql":
+            config = load_db_config()
+        self.config = config
+        self.size = size
+        self.health_check_interval = health_check_interval
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def acquire(self, timeout=None):
+        """
+        Take a healthy connection from the pool, opening a new one if the pool is not full.
+
+        Args:
+            timeout (float, optional): Seconds to wait when every connection is in use.
+
+        Raises:
+            DatabaseConnectionError: If the pool is closed, exhausted or the server is unreachable.
+        """
+        while True:
+            if self._closed:
+                raise DatabaseConnectionError("Connection pool is closed.")
+            try:
+                conn, released_at = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_open = self._created < self.size
+                    if can_open:
+                        self._created += 1
+                if can_open:
+                    try:
+                        return self.backend.connect(self.config)
+                    except DatabaseConnectionError:
+                        with self._lock:
+                            self._created -= 1
+                        raise
+                try:
+                    conn, released_at = self._idle.get(timeout=timeout)
+                except queue.Empty:
+                    raise DatabaseConnectionError(f"No connection available after {timeout}s (pool size {self.size}).")
+
+            if time.monotonic() - released_at < self.health_check_interval or self.backend.is_healthy(conn):
+                return conn
+            self.discard(conn)
+
+    def release(self, conn):
+        """Return a connection to the pool, rolling back any open transaction."""
+        if self._closed:
+            self.discard(conn)
+            return
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except Exception:
+            self.discard(conn)
+            return
+        self._idle.put((conn, time.monotonic()))
+
+    def discard(self, conn):
+        """Close a connection and free its slot in the pool."""
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._created -= 1
+
+    def session(self, database=None, timeout=None):
+        """Open a Session on a pooled connection, optionally selecting `database`."""
+        return Session(self, database, timeout)
+
+    def close(self):
+        """Close every idle connection; connections in use are closed when released."""
+        self._closed = True
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self.discard(conn)
+
+
+class Session:
+    """
+    One user's view of the database: a pooled connection plus the currently selected database.
+
+    `USE` is only sent when the database actually changes, and a lost connection
+    is replaced with a fresh one that is switched back to the same database.
+    Sessions can be passed wherever a connection is expected (commit/rollback/close).
+    """
+
+    def __init__(self, pool, database=None, timeout=None):
+        self.pool = pool
+        self.connection = pool.acquire(timeout)
+        self.current_database = None
+        # Answer generated aggregates from table samples (see approximate.py)
+        self.approximate = False
+        self._cursors = weakref.WeakSet()
+        # statement text -> (that exact str object, cursor holding it prepared)
+        self._prepared = OrderedDict()
+        if database:
+            self.use(database)
+
+    def cursor(self, **kwargs):
+        """Return a cursor that survives reconnects and keeps the session's database in sync."""
+        cursor = SessionCursor(self, **kwargs)
+        self._cursors.add(cursor)
+        return cursor
+
+    @property
+    def backend(self):
+        return self.pool.backend
+
+    def execute_prepared(self, operation, params):
+        """
+        Execute a parameterized statement through this session's prepared-statement cache.
+
+        Each distinct statement text gets its own prepared cursor, so a repeated
+        template is parsed and planned once and later runs only send the new
+        parameters. The least recently used statements beyond
+        PREPARED_CACHE_SIZE are closed.
+
+        Returns:
+            The cursor holding the result.
+        """
+        cached = self._prepared.get(operation)
+        if cached is not None:
+            self._prepared.move_to_end(operation)
+            # The MySQL prepared cursor re-prepares unless it gets the identical str object
+            operation, cursor = cached
+        else:
+            cursor = self.cursor(**self.backend.prepared_cursor_options)
+            self._prepared[operation] = (operation, cursor)
+            while len(self._prepared) > PREPARED_CACHE_SIZE:
+                _, (_, evicted) = self._prepared.popitem(last=False)
+                evicted.close()
+        cursor.execute(operation, params)
+        return cursor
+
+    def use(self, database, cursor=None):
+        """Select `database` unless it is already the session's current database."""
+        if database == self.current_database:
+            return
+        self.backend.use(self, database, cursor)
+
+    def replace_connection(self, conn):
+        """Swap in a new connection (used by backends that select a database by reopening)."""
+        try:
+            self.connection.close()
+        except Exception:
+            pass
+        self.connection = conn
+        for cursor in list(self._cursors):
+            cursor.reset()
+
+    def reconnect(self):
+        """Replace the session's connection and restore the current database."""
+        self.pool.discard(self.connection)
+        self.connection = self.pool.acquire()
+        database, self.current_database = self.current_database, None
+        for cursor in list(self._cursors):
+            cursor.reset()
+        if database:
+            self.use(database)
+
+    def cancel(self, connection=None):
+        """
+        Abort the statement currently running on this session (`KILL QUERY` from
+        another pooled connection on MySQL). The session's connection stays open.
+
+        Args:
+            connection (optional): The connection to cancel, read while it was known to be
+                running the statement, for callers cancelling from another thread
+                (default: the session's current connection).
+
+        Returns:
+            bool: True if the cancel was sent.
+        """
+        connection = connection or self.connection
+        if connection is None:
+            return False
+        return self.backend.cancel(self, connection)
+
+    def commit(self):
+        self.connection.commit()
+
+    def rollback(self):
+        self.connection.rollback()
+
+    def close(self, discard=False):
+        """
+        Close the session's cursors and return its connection to the pool.
+
+        Args:
+            discard (bool): Close the connection instead, e.g. after a cancelled
+                statement left it in an unknown state.
+        """
+        if self.connection is None:
+            return
+        for cursor in list(self._cursors):
+            cursor.close()
+        self._prepared.clear()
+        if discard:
+            self.pool.discard(self.connection)
+        else:
+            self.pool.release(self.connection)
+        self.connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class SessionCursor:
+    """
+    Wrapper around a backend cursor owned by a Session.
+
+    Statements that fail because the connection was lost trigger a reconnect;
+    read-only statements are then retried once. While tracing is enabled every
+    statement and fetch is recorded as a span with its SQL, rows and bytes.
+    """
+
+    def __init__(self, session, **kwargs):
+        self.session = session
+        self._kwargs = kwargs
+        self._cursor = session.backend.cursor(session.connection, **kwargs)
+
+    def reset(self):
+        """Recreate the underlying cursor on the session's current connection."""
+        self._cursor = self.session.backend.cursor(self.session.connection, **self._kwargs)
+
+    def _execute(self, operation, params):
+        self._cursor.execute(operation, params)
+        match = _USE_PATTERN.match(operation)
+        if match:
+            self.session.current_database = match.group(1)
+
+    def execute(self, operation, params=None):
+        if tracing.enabled:
+            with tracing.span("execute", sql=operation) as span:
+                self._execute_with_retry(operation, params)
+                if self._cursor.rowcount >= 0:
+                    span.set(rows=self._cursor.rowcount)
+            return
+        self._execute_with_retry(operation, params)
+
+    def _execute_with_retry(self, operation, params):
+        try:
+            self._execute(operation, params)
+        except Exception as err:
+            if getattr(err, "errno", None) not in CONNECTION_LOST_ERRORS:
+                raise
+            print("Connection to the database lost. Reconnecting...")
+            self.session.reconnect()
+            if not operation.lstrip().lower().startswith(RETRYABLE_STATEMENTS):
+                raise
+            self._execute(operation, params)
+
+    def _traced_fetch(self, name, fetch, *args):
+        with tracing.span(name) as span:
+            result = fetch(*args)
+            rows = [result] if name == "fetchone" else result
+            span.set(rows=sum(1 for row in rows if row is not None), bytes=tracing.payload_bytes(rows))
+        return result
+
+    def fetchone(self):
+        if tracing.enabled:
+            return self._traced_fetch("fetchone", self._cursor.fetchone)
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=None):
+        args = () if size is None else (size,)
+        if tracing.enabled:
+            return self._traced_fetch("fetchmany", self._cursor.fetchmany, *args)
+        return self._cursor.fetchmany(*args)
+
+    def fetchall(self):
+        if tracing.enabled:
+            return self._traced_fetch("fetchall", self._cursor.fetchall)
+        return self._cursor.fetchall()
+
+    def close(self):
+        try:
+            self._cursor.close()
+        except Exception:
+            pass
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def use_database(cursor, database):
+    """Select `database`, skipping the round trip if the cursor's session already uses it."""
+    session = getattr(cursor, "session", None)
+    if session is not None:
+        session.use(database, cursor)
+    else:
+        cursor.execute(f"USE {database}")
+
+
+def current_database(cursor):
+    """Return the name of the database the cursor is currently using."""
+    session = getattr(cursor, "session", None)
+    if session is not None and session.current_database is not None:
+        return session.current_database
+    database = get_backend_for(cursor).current_database(cursor)
+    if session is not None:
+        session.current_database = database
+    return database
+
+
+def get_backend_for(cursor):
+    """Return the backend a cursor runs on (plain cursors are assumed to be MySQL)."""
+    session = getattr(cursor, "session", None)
+    if session is not None:
+        return session.backend
+    return MySQLBackend()
+
 # cursor = conn.cursor()
 
 # # data = pd.read_csv("database/olist_customers_dataset.csv")
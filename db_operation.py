@@ -1,33 +1,102 @@
-import pandas as pd
+import os
+import re
+from decimal import Decimal
 
-def list_databases(cursor):
-    """List all databases in MySQL."""
-    cursor.execute("SHOW DATABASES;")
-    databases = [db[0] for db in cursor.fetchall()]
+from approximate import drop_sample, sample_apply, sample_insert
+from bulk_mutation import BULK_BATCH_SIZE, bulk_mutate, discard_bulk_checkpoint, has_bulk_checkpoint
+from column_stats import invalidate_stats, note_changes, split_columns
+from csv_profiler import profile_csv
+from db_connection import current_database, use_database
+from ingest import discard_checkpoint, has_checkpoint, ingest_csv
+from join_graph import forget_graph
+from rollups import apply_changes, has_rollups, invalidate_rollups, select_rows
+from schema_catalog import catalog, directory
+from value_index import invalidate_value_index
+
+# One `column <op> literal` comparison of a typed WHERE condition
+_CONDITION_TERM = re.compile(
+    r"\s*`?(?P<column>\w+)`?\s*(?P<op><=|>=|<>|!=|=|<|>)\s*"
+    r"(?:'(?P<single>(?:[^']|'')*)'|\"(?P<double>(?:[^\"]|\"\")*)\"|(?P<number>-?\d+(?:\.\d+)?))\s*"
+)
+_AND = re.compile(r"and\b", re.IGNORECASE)
+
+def parameterize_condition(condition, columns):
+    """
+    Split a typed WHERE condition into SQL with placeholders and bound values.
 
-    # Stop at 'information_schema' if it exists
-    if "information_schema" in databases:
-        databases = databases[:databases.index("information_schema")]
+    `id=1 AND city = 'curitiba'` becomes ("`id` = %s AND `city` = %s", (1, 'curitiba')),
+    so values are never spliced into the statement and repeated shapes reuse
+    one prepared statement. Only ANDed comparisons of a table column with a
+    literal are accepted: anything else would have to be spliced into the
+    statement as typed, so it is refused.
 
-    return databases
+    Args:
+        condition (str): The condition as typed by the user.
+        columns (list): The table's column names.
+
+    Returns:
+        tuple: (condition SQL, parameters).
+
+    Raises:
+        ValueError: If the condition is not ANDed `column <op> literal` comparisons of known columns.
+    """
+    known = {column.lower(): column for column in columns}
+    terms, params, position = [], [], 0
+    while True:
+        match = _CONDITION_TERM.match(condition, position)
+        if not match:
+            rest = condition[position:].strip()
+            raise ValueError(f"expected a comparison of a column with a value at '{rest}'" if rest
+                             else "expected a comparison of a column with a value")
+        if match.group("column").lower() not in known:
+            raise ValueError(f"unknown column '{match.group('column')}'")
+        if match.group("single") is not None:
+            value = match.group("single").replace("''", "'")
+        elif match.group("double") is not None:
+            value = match.group("double").replace('""', '"')
+        else:
+            number = match.group("number")
+            value = Decimal(number) if "." in number else int(number)
+        terms.append(f"`{known[match.group('column').lower()]}` {match.group('op')} %s")
+        params.append(value)
+        position = match.end()
+        if position == len(condition):
+            return " AND ".join(terms), tuple(params)
+        conjunction = _AND.match(condition, position)
+        if not conjunction:
+            raise ValueError(f"expected AND at '{condition[position:].strip()}'")
+        position = conjunction.end()
+
+def list_databases(cursor):
+    """List all user databases (from the in-memory table directory)."""
+    return directory.databases(cursor)
 
 def list_tables(cursor, database):
-    """List all tables in the selected database."""
-    cursor.execute(f"USE {database}")
-    cursor.execute("SHOW TABLES")
-    return [table[0] for table in cursor.fetchall()]
+    """List all tables in the selected database (from the in-memory table directory)."""
+    return directory.tables(cursor, database)
+
+def describe_table_size(cursor, database, table_name):
+    """Return a short '~rows, size' note for a table listing, or '' if the directory has neither."""
+    info = directory.table_info(cursor, database, table_name) or {}
+    parts = []
+    if info.get("rows") is not None:
+        parts.append(f"~{info['rows']:,} rows")
+    if info.get("size") is not None:
+        parts.append(f"{info['size'] / (1024 * 1024):.1f} MB")
+    return f" ({', '.join(parts)})" if parts else ""
 
-def show_table_attributes(cursor, table_name):
+def show_table_attributes(cursor, table_name, database=None):
     """Show the attributes of a table."""
-    cursor.execute(f"DESCRIBE {table_name}")
-    return pd.DataFrame(cursor.fetchall(), columns=["Field", "Type", "Null", "Key", "Default", "Extra"])
+    import pandas as pd
+    entry = catalog.get_table(cursor, table_name, database)
+    rows = entry["describe"] if entry else []
+    return pd.DataFrame(rows, columns=["Field", "Type", "Null", "Key", "Default", "Extra"])
 
 def show_sample_data(cursor, table_name, limit=5):
     """Display the first `limit` rows of a table."""
+    from result_set import ColumnarResult
     cursor.execute(f"SELECT * FROM {table_name} LIMIT {limit}")
-    rows = cursor.fetchall()
-    columns = [desc[0] for desc in cursor.description]
-    return pd.DataFrame(rows, columns=columns)
+    return ColumnarResult.from_cursor(cursor).to_pandas()
 
 def upload_dataset(cursor, conn, table_name):
     """Upload a CSV file into a MySQL table, creating the table if it doesn't exist."""
@@ -35,44 +104,73 @@ def upload_dataset(cursor, conn, table_name):
     file_path = input("\nEnter the full path to your CSV file: ").strip()
     
     try:
-        # Load the CSV file with Pandas to inspect the structure
-        data = pd.read_csv(file_path, nrows=1)  # Only load the header row
-        
         # Check if the table exists
-        cursor.execute("SHOW TABLES;")
-        tables = [table[0] for table in cursor.fetchall()]
+        tables = directory.tables(cursor, current_database(cursor))
         if table_name not in tables:
-            print(f"Table '{table_name}' does not exist. Creating the table...")
-            create_table_from_csv(cursor, table_name, data)
+            print(f"Table '{table_name}' does not exist. Profiling the CSV to choose column types...")
+            profile = profile_csv(file_path)
+            for column, col_type in profile["columns"]:
+                print(f"  {column}: {col_type}")
+
+            primary_key = None
+            if profile["primary_key_candidates"]:
+                candidate = profile["primary_key_candidates"][0]
+                scope = "all" if profile["exact"] else f"the first {profile['rows']:,}"
+                answer = input(f"Column '{candidate}' is unique and never empty in {scope} rows. Use it as the primary key? (yes/no): ").strip().lower()
+                if answer == "yes":
+                    primary_key = candidate
+
+            print("Creating the table...")
+            create_table_from_csv(cursor, table_name, profile, primary_key)
             print(f"Table '{table_name}' created successfully!")
         
-        # Upload the data using LOAD DATA LOCAL INFILE
-        file_path = file_path.replace("\\", "/")
-        query = f"""
-        LOAD DATA LOCAL INFILE '{file_path}'
-        INTO TABLE {table_name}
-        FIELDS TERMINATED BY ',' 
-        ENCLOSED BY '"'
-        LINES TERMINATED BY '\\n'
-        IGNORE 1 ROWS;
-        """
-        cursor.execute(query)
-        conn.commit()
+        # Upload the data: LOAD DATA LOCAL INFILE when available, otherwise parallel chunked inserts
+        database = current_database(cursor)
+        if has_checkpoint(database, table_name, file_path):
+            # The interrupted run's chunks are committed: loading the file again from the start would duplicate them
+            print(f"An interrupted upload of this file was found; the chunks it loaded are already in '{table_name}'.")
+            choice = input("Resume it, empty the table and start over, or cancel? (resume/restart/cancel) [resume]: ").strip().lower()
+            if choice == "cancel":
+                print("Upload cancelled.")
+                return
+            if choice == "restart":
+                confirm = input(f"This deletes every row of '{table_name}'. Continue? (yes/no): ").strip().lower()
+                if confirm != "yes":
+                    print("Upload cancelled.")
+                    return
+                cursor.execute(f"DELETE FROM `{table_name}`")
+                conn.commit()
+                discard_checkpoint(database, table_name, file_path)
+        stats = ingest_csv(conn.pool, database, table_name, file_path)
+        invalidate_value_index(database, table_name)
+        directory.invalidate(database)
+        invalidate_rollups(database, table_name)
+        invalidate_stats(database, table_name)
+        forget_graph(database)
+        drop_sample(cursor, database, table_name)
+        print(f"{stats['rows']:,} rows in {stats['seconds']:.1f}s ({stats['rows_per_sec']:,.0f} rows/sec).")
+        if stats["quarantined"]:
+            print(f"{len(stats['quarantined'])} chunk(s) failed and were quarantined; run the upload again to retry them.")
         print(f"Data from {file_path} uploaded successfully into {table_name}!")
     except Exception as e:
         print(f"Error uploading dataset: {e}")
 
-def create_table_from_csv(cursor, table_name, data):
-    """Create a MySQL table dynamically based on the CSV structure."""
+def create_table_from_csv(cursor, table_name, profile, primary_key=None):
+    """
+    Create a MySQL table dynamically based on the CSV structure.
+
+    Args:
+        cursor: MySQL cursor object for executing queries.
+        table_name (str): The table name.
+        profile (dict): Result of csv_profiler.profile_csv for the CSV file.
+        primary_key (str, optional): Column to declare as the primary key.
+    """
     columns = []
-    for col, dtype in data.dtypes.items():
-        if dtype == 'int64':
-            col_type = "INT"
-        elif dtype == 'float64':
-            col_type = "FLOAT"
-        else:
-            col_type = "VARCHAR(255)"  # Default to string for non-numeric types
-        columns.append(f"`{col}` {col_type}")
+    for col, col_type in profile["columns"]:
+        null_sql = " NOT NULL" if col == primary_key else ""
+        columns.append(f"`{col}` {col_type}{null_sql}")
+    if primary_key:
+        columns.append(f"PRIMARY KEY (`{primary_key}`)")
     
     # Construct the CREATE TABLE query
     columns_sql = ", ".join(columns)
@@ -80,12 +178,65 @@ def create_table_from_csv(cursor, table_name, data):
     
     # Execute the query
     cursor.execute(create_table_query)
+    catalog.invalidate(current_database(cursor), table_name)
+
+def csv_table_name(file_name):
+    """Derive a table name from a CSV file name (olist_orders_dataset.csv -> orders)."""
+    name = os.path.splitext(os.path.basename(file_name))[0].lower()
+    if name.startswith("olist_"):
+        name = name[len("olist_"):]
+    if name.endswith("_dataset"):
+        name = name[:-len("_dataset")]
+    return name
 
-def insert_record(cursor, conn, table_name):
+def load_csv_directory(pool, database, directory):
+    """
+    Load every CSV file of a directory (e.g. the Olist dataset) into `database`,
+    one table per file, without prompting.
+
+    Existing tables are skipped. Column types come from csv_profiler, and a
+    column is declared the primary key only if it is unique over the whole file.
+
+    Args:
+        pool: ConnectionPool used for the upload.
+        database (str): The target database, created if needed.
+        directory (str): Directory containing the CSV files.
+    """
+    with pool.session() as session:
+        cursor = session.cursor()
+        backend = pool.backend
+        backend.create_database(cursor, database)
+        use_database(cursor, database)
+        existing = set(backend.list_tables(cursor, database))
+        for file_name in sorted(os.listdir(directory)):
+            if not file_name.lower().endswith(".csv"):
+                continue
+            table_name = csv_table_name(file_name)
+            if table_name in existing:
+                print(f"Table '{table_name}' already exists, skipping {file_name}.")
+                continue
+            file_path = os.path.join(directory, file_name)
+            try:
+                profile = profile_csv(file_path, sample_rows=0)
+                candidates = profile["primary_key_candidates"]
+                create_table_from_csv(cursor, table_name, profile, candidates[0] if candidates else None)
+                session.commit()
+                stats = ingest_csv(pool, database, table_name, file_path)
+                invalidate_rollups(database, table_name)
+                invalidate_stats(database, table_name)
+                forget_graph(database)
+                drop_sample(cursor, database, table_name)
+                print(f"Loaded {file_name} into {table_name}: {stats['rows']:,} rows ({stats['rows_per_sec']:,.0f} rows/sec).")
+            except Exception as e:
+                print(f"Error loading {file_name}: {e}")
+    invalidate_value_index(database)
+    directory.invalidate(database)
+
+def insert_record(cursor, conn, table_name, database=None):
     """Insert a record into the specified table."""
     # Get table schema
-    cursor.execute(f"DESCRIBE {table_name}")
-    columns = [row[0] for row in cursor.fetchall()]
+    entry = catalog.get_table(cursor, table_name, database)
+    columns = entry["columns"] if entry else []
     print(f"\nColumns in {table_name}: {', '.join(columns)}")
 
     # Get values for each column
@@ -99,16 +250,22 @@ def insert_record(cursor, conn, table_name):
     query = f"INSERT INTO {table_name} VALUES ({placeholders})"
     try:
         cursor.execute(query, tuple(values))
+        database = current_database(cursor)
+        sample_insert(cursor, database, table_name, values)
         conn.commit()
+        invalidate_value_index(database, table_name)
+        directory.invalidate(database)
+        note_changes(database, table_name, 1, [dict(zip(columns, values))])
+        apply_changes(cursor, database, table_name, added=[dict(zip(columns, values))])
         print("Record inserted successfully!")
     except Exception as e:
         print(f"Error inserting record: {e}")
 
-def update_record(cursor, conn, table_name):
+def update_record(cursor, conn, table_name, database=None):
     """Update a record in the specified table."""
     # Get table schema
-    cursor.execute(f"DESCRIBE {table_name}")
-    columns = [row[0] for row in cursor.fetchall()]
+    entry = catalog.get_table(cursor, table_name, database)
+    columns = entry["columns"] if entry else []
     print(f"\nColumns in {table_name}: {', '.join(columns)}")
 
     # Get details for the update
@@ -121,10 +278,28 @@ def update_record(cursor, conn, table_name):
     condition = input("Enter the condition for the update (e.g., id=1): ").strip()
 
     # Generate and execute the UPDATE query
-    query = f"UPDATE {table_name} SET {column_to_update} = %s WHERE {condition}"
+    where, where_params = ask_condition(condition, columns)
+    if where is None:
+        return
+    mode = ask_bulk_mode()
+    if mode != "single":
+        bulk_change(cursor, conn, table_name, where, where_params, column_to_update, new_value, dry_run=mode == "dry-run")
+        return
+    params = (new_value,) + where_params
+    query = f"UPDATE {table_name} SET {column_to_update} = %s WHERE {where}"
     try:
-        cursor.execute(query, (new_value,))
+        database = current_database(cursor)
+        # Rows as they were before the update, to adjust the rollups incrementally
+        old_rows = select_rows(cursor, table_name, where, where_params) if has_rollups(database, table_name) else []
+        cursor.execute(query, params)
+        changed = max(cursor.rowcount, 0)
+        sample_apply(cursor, database, table_name, where, where_params, column_to_update, new_value)
         conn.commit()
+        invalidate_value_index(database, table_name)
+        directory.invalidate(database)
+        note_changes(database, table_name, changed, [{column_to_update: new_value}])
+        apply_changes(cursor, database, table_name, removed=old_rows,
+                      added=[dict(row, **{column_to_update: new_value}) for row in old_rows])
         print("Record updated successfully!")
     except Exception as e:
         print(f"Error updating record: {e}")
@@ -135,14 +310,90 @@ def delete_record(cursor, conn, table_name):
     condition = input("Enter the condition for deletion (e.g., id=1): ").strip()
 
     # Generate and execute the DELETE query
-    query = f"DELETE FROM {table_name} WHERE {condition}"
+    entry = catalog.get_table(cursor, table_name)
+    where, where_params = ask_condition(condition, entry["columns"] if entry else [])
+    if where is None:
+        return
+    mode = ask_bulk_mode()
+    if mode != "single":
+        bulk_change(cursor, conn, table_name, where, where_params, dry_run=mode == "dry-run")
+        return
+    query = f"DELETE FROM {table_name} WHERE {where}"
     try:
-        cursor.execute(query)
+        database = current_database(cursor)
+        old_rows = select_rows(cursor, table_name, where, where_params) if has_rollups(database, table_name) else []
+        cursor.execute(query, where_params or None)
+        changed = max(cursor.rowcount, 0)
+        sample_apply(cursor, database, table_name, where, where_params)
         conn.commit()
+        invalidate_value_index(database, table_name)
+        directory.invalidate(database)
+        note_changes(database, table_name, changed)
+        apply_changes(cursor, database, table_name, removed=old_rows)
         print("Record deleted successfully!")
     except Exception as e:
         print(f"Error deleting record: {e}")
 
+def ask_condition(condition, columns):
+    """Parameterize a typed condition, explaining what is accepted when it cannot be. Returns (None, None) then."""
+    try:
+        return parameterize_condition(condition, columns)
+    except ValueError as e:
+        print(f"Cannot use this condition: {e}. Use comparisons of a column with a value joined by AND, "
+              "e.g. id = 1 AND city = 'curitiba'.")
+        return None, None
+
+def ask_bulk_mode():
+    """Ask how to run an update/delete: 'single' statement, 'bulk' batches or a 'dry-run' count."""
+    mode = input(f"Run as one statement, in committed batches of {BULK_BATCH_SIZE:,} rows, or only count the rows? "
+                 "(single/bulk/dry-run) [single]: ").strip().lower()
+    return mode if mode in ("bulk", "dry-run") else "single"
+
+def bulk_change(cursor, conn, table_name, where, where_params, column=None, value=None, dry_run=False):
+    """
+    Run an update (or a delete, without `column`) in primary-key-ranged batches
+    through bulk_mutation, offering to resume an interrupted run, and keep the
+    value index and the table's sample current afterwards.
+    """
+    database = current_database(cursor)
+    action = "update" if column else "delete"
+    try:
+        if not dry_run and has_bulk_checkpoint(database, table_name, where, where_params, column, value):
+            resume = input(f"An interrupted bulk {action} with this condition was found. Resume it? (yes/no): ").strip().lower()
+            if resume != "yes":
+                discard_bulk_checkpoint(database, table_name, where, where_params, column, value)
+        stats = bulk_mutate(cursor, conn, database, table_name, where, where_params, column, value, dry_run=dry_run)
+    except ValueError as e:
+        # Raised before any batch ran (no primary key to range over)
+        print(f"Cannot run a bulk {action}: {e}")
+        return
+    except (Exception, KeyboardInterrupt) as e:
+        if dry_run:
+            print(f"Error counting rows: {e}")
+            return
+        invalidate_value_index(database, table_name)
+        directory.invalidate(database)
+        # How many rows the committed batches changed is not known here
+        invalidate_stats(database, table_name)
+        reason = "interrupted" if isinstance(e, KeyboardInterrupt) else f"stopped: {e}"
+        print(f"\nBulk {action} {reason}. Committed batches are kept; run the same {action} again to resume.")
+        return
+
+    if dry_run:
+        print(f"Dry run: {stats['rows']:,} rows match, in {stats['batches']:,} batches of up to {BULK_BATCH_SIZE:,}. Nothing was changed.")
+        return
+    try:
+        sample_apply(cursor, database, table_name, where, where_params, column, value)
+        conn.commit()
+    except Exception as e:
+        print(f"Error updating the table sample: {e}")
+    invalidate_value_index(database, table_name)
+    directory.invalidate(database)
+    note_changes(database, table_name, stats["changed"], [{column: value}] if column else [])
+    resumed = f", resumed after {stats['resumed']:,} batches" if stats["resumed"] else ""
+    print(f"Bulk {action} done: {stats['rows']:,} rows matched, {stats['changed']:,} changed in {stats['batches']:,} batches "
+          f"({stats['seconds']:.1f}s, {stats['rows_per_sec']:,.0f} rows/sec{resumed}).")
+
 def delete_table(cursor, conn, table_name):
     """Delete a table from the current database."""
     confirm = input(f"Are you sure you want to delete the table '{table_name}'? This action cannot be undone. (yes/no): ").strip().lower()
@@ -150,6 +401,10 @@ def delete_table(cursor, conn, table_name):
         try:
             cursor.execute(f"DROP TABLE {table_name}")
             conn.commit()
+            database = current_database(cursor)
+            catalog.invalidate(database, table_name)
+            invalidate_value_index(database, table_name)
+            drop_sample(cursor, database, table_name)
             print(f"Table '{table_name}' has been deleted successfully!")
         except Exception as e:
             print(f"Error deleting table '{table_name}': {e}")
@@ -157,21 +412,24 @@ def delete_table(cursor, conn, table_name):
         print("Table deletion canceled.")
 
 
-def get_table_schema(cursor, table_name):
+def get_table_schema(cursor, table_name, database=None):
     """
     Retrieve the list of columns and their data types from the table, 
-    and divide them into categorical and numerical columns.
+    and divide them into categorical and numerical columns. Column statistics
+    then drop codes and ids from the numerical columns and keep low-cardinality
+    categories as the categorical ones (see column_stats.split_columns).
     
     Args:
         cursor: MySQL cursor object for executing queries.
         table_name (str): The table name.
+        database (str, optional): The database name. Defaults to the cursor's current database.
     
     Returns:
         A dictionary with two keys: 'categorical' and 'numerical'.
     """
     try:
-        cursor.execute(f"DESCRIBE {table_name}")
-        columns = cursor.fetchall()
+        entry = catalog.get_table(cursor, table_name, database)
+        columns = entry["describe"] if entry else []
         
         # List of MySQL data types classified as categorical or numerical
         numerical_types = ['int', 'bigint', 'decimal', 'float', 'double', 'numeric']
@@ -195,6 +453,7 @@ def get_table_schema(cursor, table_name):
             'categorical': categorical,
             'numerical': numerical
         }
+        schema = split_columns(cursor, table_name, database or current_database(cursor), schema)
 
         # print(f"Schema for table '{table_name}':")
         # print(f"Categorical: {categorical}")
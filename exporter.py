@@ -0,0 +1,283 @@
+import bz2
+import csv
+import functools
+import gzip
+import json
+import lzma
+import os
+import queue
+import threading
+import time
+from decimal import Decimal
+
+import index_advisor
+from db_connection import current_database
+from query_executor import close_result
+
+# Rows fetched and written per chunk
+EXPORT_CHUNK_ROWS = int(os.environ.get("CHATDB_EXPORT_CHUNK_ROWS", "10000"))
+# Chunks fetched ahead of the writer; client memory stays within (this + 2) chunks
+EXPORT_QUEUE_CHUNKS = 4
+
+# File suffix -> export format
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".json": "jsonl", ".parquet": "parquet", ".pq": "parquet"}
+# File suffix -> compression of text formats
+COMPRESSIONS = {".gz": "gzip", ".bz2": "bz2", ".xz": "xz"}
+# Fast compression levels: exports are written once and usually read by another job right away
+_OPENERS = {
+    None: open,
+    "gzip": functools.partial(gzip.open, compresslevel=6),
+    "bz2": bz2.open,
+    "xz": functools.partial(lzma.open, preset=1)
+}
+
+
+def export_format(path, fmt=None, compression=None):
+    """
+    Work out the format and compression of an export from its file name
+    (results.csv.gz -> ('csv', 'gzip')) unless they are given.
+
+    Raises:
+        ValueError: If the format cannot be told from the name or is unsupported.
+    """
+    base, suffix = os.path.splitext(path.lower())
+    if suffix in COMPRESSIONS:
+        compression = compression or COMPRESSIONS[suffix]
+        suffix = os.path.splitext(base)[1]
+    fmt = fmt or FORMATS.get(suffix)
+    if fmt not in ("csv", "jsonl", "parquet"):
+        raise ValueError(f"Cannot tell the export format of {path}; use .csv, .jsonl or .parquet.")
+    if fmt != "parquet" and compression not in _OPENERS:
+        raise ValueError(f"Unsupported compression '{compression}'; use gzip, bz2 or xz.")
+    return fmt, compression
+
+
+# MySQL field type codes (cursor.description) -> Arrow type name, for columns NULL throughout the first chunk
+_PARQUET_FALLBACK_TYPES = {
+    1: "int64", 2: "int64", 3: "int64", 8: "int64", 9: "int64", 13: "int64",
+    4: "float64", 5: "float64",
+    7: "timestamp", 12: "timestamp",
+    10: "date32", 14: "date32"
+}
+
+
+class _CSVWriter:
+    def __init__(self, path, compression):
+        self.path = path
+        self.compression = compression
+
+    def open(self, names, type_codes):
+        self.file = _OPENERS[self.compression](self.path, "wt", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(names)
+
+    def write(self, rows):
+        # NULL is written as an empty field
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class _JSONLWriter:
+    def __init__(self, path, compression):
+        self.path = path
+        self.compression = compression
+
+    def open(self, names, type_codes):
+        self.names = names
+        self.file = _OPENERS[self.compression](self.path, "wt", encoding="utf-8")
+
+    def write(self, rows):
+        self.file.write("".join(
+            json.dumps(dict(zip(self.names, row)), default=str, ensure_ascii=False) + "\n" for row in rows
+        ))
+
+    def close(self):
+        self.file.close()
+
+
+class _ParquetWriter:
+    """
+    One row group per chunk. The column types are taken from the first chunk;
+    a column that is NULL throughout it gets its type from the cursor's type
+    code, or is written as strings. DECIMAL columns are written as Arrow decimals.
+    """
+
+    def __init__(self, path, compression):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ValueError("Parquet export needs pyarrow (pip install pyarrow).")
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.path = path
+        self.compression = compression or "snappy"
+        self.writer = None
+
+    def open(self, names, type_codes):
+        self.names = names
+        self.type_codes = type_codes
+
+    def _decimal_array(self, values):
+        """Arrow decimals wide enough for every value of a column of Decimal objects."""
+        scale = integer_digits = 0
+        for value in values:
+            if value is not None:
+                _, digits, exponent = value.as_tuple()
+                scale = max(scale, -exponent)
+                integer_digits = max(integer_digits, len(digits) + exponent)
+        decimal_type = self.pa.decimal128(38, scale) if integer_digits + scale <= 38 else self.pa.decimal256(76, scale)
+        return self.pa.array(values, type=decimal_type)
+
+    def _table(self, rows):
+        from result_set import ColumnarResult
+
+        result = ColumnarResult.from_rows(rows, self.names)
+        arrays = []
+        for array, mask in zip(result.arrays, result.masks):
+            if array.dtype.kind in "ifM":
+                arrays.append(self.pa.array(array, mask=mask))
+                continue
+            values = [None if null else value for value, null in zip(array.tolist(), mask.tolist())]
+            if any(isinstance(value, Decimal) for value in values):
+                arrays.append(self._decimal_array(values))
+            else:
+                arrays.append(self.pa.array(values))
+        return self.pa.Table.from_arrays(arrays, names=self.names)
+
+    def _fallback_type(self, position):
+        name = _PARQUET_FALLBACK_TYPES.get(self.type_codes[position])
+        if name == "timestamp":
+            return self.pa.timestamp("us")
+        return getattr(self.pa, name)() if name else self.pa.string()
+
+    def _schema(self, table):
+        """The first chunk's schema, with untyped (all-NULL) columns given a concrete type."""
+        fields = [self.pa.field(field.name, self._fallback_type(position)) if self.pa.types.is_null(field.type) else field
+                  for position, field in enumerate(table.schema)]
+        return self.pa.schema(fields)
+
+    def write(self, rows):
+        table = self._table(rows)
+        if self.writer is None:
+            self.writer = self.pq.ParquetWriter(self.path, self._schema(table), compression=self.compression)
+        if table.schema != self.writer.schema:
+            table = table.cast(self.writer.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is None:
+            # No rows: still write the header so readers see the columns
+            self.pq.write_table(self.pa.table({name: self.pa.array([], self._fallback_type(position))
+                                              for position, name in enumerate(self.names)}),
+                                self.path, compression=self.compression)
+            return
+        self.writer.close()
+
+
+_WRITERS = {"csv": _CSVWriter, "jsonl": _JSONLWriter, "parquet": _ParquetWriter}
+
+
+def export_query(cursor, sql, path, params=None, fmt=None, compression=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Run a query and stream its full result into a CSV, JSONL or Parquet file.
+
+    Rows are fetched from the unbuffered cursor `chunk_rows` at a time and
+    handed to a writer thread through a queue of EXPORT_QUEUE_CHUNKS chunks,
+    so fetching from the server overlaps with encoding and writing, and client
+    memory does not grow with the size of the result. The file is written under
+    a temporary name and only appears under `path` once the export completed.
+
+    Args:
+        cursor: Cursor already using the query's database.
+        sql (str): The query to export; it is run without a LIMIT.
+        path (str): Output file; the format and compression follow from its name
+            (e.g. results.csv.gz, results.jsonl, results.parquet) unless given.
+        params (tuple, optional): Query parameters for the %s placeholders in `sql`.
+        fmt (str, optional): 'csv', 'jsonl' or 'parquet'.
+        compression (str, optional): gzip, bz2 or xz for CSV/JSONL; a Parquet codec
+            (snappy by default, gzip, zstd, ...) for Parquet.
+        chunk_rows (int): Rows per fetchmany() call and per write.
+
+    Returns:
+        dict: 'path', 'format', 'rows', 'bytes', 'seconds' and 'rows_per_sec'.
+
+    Raises:
+        ValueError: For an unknown format or compression, or Parquet without pyarrow.
+    """
+    fmt, compression = export_format(path, fmt, compression)
+    tmp_path = f"{path}.part"
+    writer = _WRITERS[fmt](tmp_path, compression)
+
+    start = time.perf_counter()
+    index_advisor.record(cursor, sql, params, current_database(cursor))
+    session = getattr(cursor, "session", None)
+    if params and session is not None:
+        cursor = session.execute_prepared(sql, tuple(params))
+    else:
+        cursor.execute(sql, tuple(params) if params else None)
+    if cursor.description is None:
+        raise ValueError("The statement returns no rows to export.")
+    names = [desc[0] for desc in cursor.description]
+    type_codes = [desc[1] for desc in cursor.description]
+
+    chunks = queue.Queue(EXPORT_QUEUE_CHUNKS)
+    failure = []
+
+    def write():
+        ended = False
+        try:
+            writer.open(names, type_codes)
+            while True:
+                chunk = chunks.get()
+                if chunk is None:
+                    ended = True
+                    break
+                writer.write(chunk)
+            writer.close()
+        except BaseException as e:
+            failure.append(e)
+            # Keep taking chunks so the fetching side never blocks on a full queue
+            while not ended and chunks.get() is not None:
+                pass
+
+    thread = threading.Thread(target=write, name="chatdb-export", daemon=True)
+    thread.start()
+    rows = 0
+    finished = False
+    try:
+        while not failure:
+            batch = cursor.fetchmany(chunk_rows)
+            if not batch:
+                finished = True
+                break
+            chunks.put(batch)
+            rows += len(batch)
+    finally:
+        chunks.put(None)
+        thread.join()
+        if not finished:
+            try:
+                close_result(cursor)
+            except Exception:
+                pass
+        if not finished or failure:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+    if failure:
+        raise failure[0]
+
+    os.replace(tmp_path, path)
+    seconds = time.perf_counter() - start
+    return {
+        "path": path,
+        "format": fmt,
+        "rows": rows,
+        "bytes": os.path.getsize(path),
+        "seconds": seconds,
+        "rows_per_sec": rows / seconds if seconds > 0 else 0.0
+    }
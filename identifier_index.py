@@ -0,0 +1,148 @@
+import threading
+
+from schema_catalog import catalog
+
+# Character n-gram size used to find substring candidates
+NGRAM_SIZE = 3
+
+# Match scores, best first; ties are broken by preferring shorter identifiers
+EXACT_SCORE = 1.0
+PART_SCORE = 0.8
+PREFIX_SCORE = 0.6
+SUBSTRING_SCORE = 0.4
+
+
+def _ngrams(text, size=NGRAM_SIZE):
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+class IdentifierIndex:
+    """
+    Index over table or column names for ranked token lookup.
+
+    Names are split on `_` into parts. Substring candidates come from a
+    character n-gram inverted index, so a lookup never scans every identifier;
+    tokens shorter than an n-gram only match whole names or parts through a
+    dictionary lookup. Candidates are ranked exact name > whole part > part
+    prefix > substring.
+    """
+
+    def __init__(self, identifiers):
+        self.identifiers = list(dict.fromkeys(identifiers))
+        self._exact = {}
+        self._parts = {}
+        self._grams = {}
+        # token -> ranked matches; questions reuse a small vocabulary
+        self._matches = {}
+        for position, identifier in enumerate(self.identifiers):
+            name = identifier.lower()
+            self._exact.setdefault(name, position)
+            for part in name.split("_"):
+                if part:
+                    self._parts.setdefault(part, set()).add(position)
+            for gram in _ngrams(name):
+                self._grams.setdefault(gram, set()).add(position)
+
+    def _candidates(self, token):
+        """Positions of identifiers that may contain `token`."""
+        if len(token) < NGRAM_SIZE:
+            # Tokens this short only match whole names or whole parts (e.g. "id")
+            positions = set(self._parts.get(token, ()))
+            if token in self._exact:
+                positions.add(self._exact[token])
+            return positions
+        postings = [self._grams.get(gram) for gram in _ngrams(token)]
+        if not all(postings):
+            return ()
+        return set.intersection(*sorted(postings, key=len))
+
+    def _score(self, token, position):
+        name = self.identifiers[position].lower()
+        if name == token:
+            return EXACT_SCORE
+        parts = name.split("_")
+        # Shorter names rank higher among equal kinds of match
+        bonus = 0.1 * len(token) / len(name)
+        if token in parts:
+            return PART_SCORE + bonus
+        if any(part.startswith(token) for part in parts):
+            return PREFIX_SCORE + bonus
+        if token in name:
+            return SUBSTRING_SCORE + bonus
+        return 0.0
+
+    def match(self, token, limit=None):
+        """
+        Return identifiers matching `token`, best first.
+
+        Returns:
+            list: (identifier, score) pairs with score > 0.
+        """
+        token = token.lower()
+        if not token:
+            return []
+        matches = self._matches.get(token)
+        if matches is None:
+            scored = [(self._score(token, p), p) for p in self._candidates(token)]
+            scored.sort(key=lambda pair: (-pair[0], pair[1]))
+            matches = [(self.identifiers[position], score) for score, position in scored if score > 0]
+            self._matches[token] = matches
+        return matches[:limit] if limit else matches
+
+    def best(self, token):
+        """Return the best identifier for `token`, or None."""
+        matches = self.match(token, limit=1)
+        return matches[0][0] if matches else None
+
+    def best_for_tokens(self, tokens, exclude=()):
+        """
+        Return the best (token, identifier, score) over all tokens, or None.
+
+        Ties keep the earliest token, as the question's word order suggests.
+        """
+        best = None
+        for token in tokens:
+            for identifier, score in self.match(token):
+                if identifier in exclude:
+                    continue
+                if best is None or score > best[2]:
+                    best = (token, identifier, score)
+                break
+        return best
+
+
+class DatabaseIdentifiers:
+    """Identifier indexes for one database: one over table names and one per table over its columns."""
+
+    def __init__(self, tables):
+        self.tables = IdentifierIndex(tables)
+        self.columns = {table: IdentifierIndex(entry["columns"]) for table, entry in tables.items()}
+
+
+# (database, schema version) -> DatabaseIdentifiers
+_indexes = {}
+_lock = threading.Lock()
+
+
+def _drop(database, table=None):
+    with _lock:
+        for key in list(_indexes):
+            if key[0] == database:
+                del _indexes[key]
+
+
+catalog.add_listener(_drop)
+
+
+def get_identifier_index(cursor, database):
+    """Return the identifier indexes of a database, rebuilding them when its schema changes."""
+    key = (database, catalog.version(cursor, database))
+    with _lock:
+        index = _indexes.get(key)
+    if index is None:
+        tables = {table: catalog.get_table(cursor, table, database) for table in catalog.get_tables(cursor, database)}
+        index = DatabaseIdentifiers(tables)
+        _drop(database)
+        with _lock:
+            _indexes[key] = index
+    return index
@@ -0,0 +1,278 @@
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+
+from db_connection import get_backend_for
+from schema_catalog import catalog
+
+# File the workload log is persisted to; set CHATDB_WORKLOAD_PATH to an empty string to keep it in memory only
+WORKLOAD_PATH = os.environ.get(
+    "CHATDB_WORKLOAD_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".chatdb_workload.json")
+)
+# Distinct query shapes remembered (the least used are dropped first)
+MAX_WORKLOAD_SHAPES = int(os.environ.get("CHATDB_WORKLOAD_MAX_SHAPES", "1000"))
+# Columns in a recommended index
+MAX_INDEX_COLUMNS = 3
+# Runs timed before and after creating an index (the fastest run is reported)
+TIMING_RUNS = 3
+# Rows fetched per timed run, as the display paths do
+TIMING_ROWS = 100
+
+_FROM = re.compile(r"\bfrom\s+`?(\w+)`?", re.IGNORECASE)
+_JOIN = re.compile(r"\bjoin\b", re.IGNORECASE)
+_WHERE = re.compile(r"\bwhere\b(?P<where>.*?)(?=\bgroup\s+by\b|\border\s+by\b|\bhaving\b|\blimit\b|$)",
+                    re.IGNORECASE | re.DOTALL)
+_COMPARISON = re.compile(r"`?(\w+)`?\s*(=|<=|>=|<>|!=|<|>|\blike\b|\bin\b|\bbetween\b)", re.IGNORECASE)
+_GROUP_BY = re.compile(r"\bgroup\s+by\s+`?(\w+)`?", re.IGNORECASE)
+_ORDER_BY = re.compile(r"\border\s+by\s+`?(\w+)`?", re.IGNORECASE)
+
+# (database, table, index columns) -> {'count', 'sql', 'params'}
+_workload = {}
+# count -> the keys of _workload with that count, oldest first, so the least used shape is found without a scan
+_by_count = {}
+# Lowest count in _by_count; new shapes start at 1, so it only has to be tracked upwards
+_min_count = 0
+_lock = threading.Lock()
+_loaded = False
+
+
+def index_columns(sql, columns):
+    """
+    Work out the index that would serve a single-table query.
+
+    Equality columns of the WHERE clause come first, then one range column,
+    or else the GROUP BY / ORDER BY column so rows are read in order.
+
+    Args:
+        sql (str): The query.
+        columns (list): Column names of the queried table.
+
+    Returns:
+        tuple: The index columns, empty if the query cannot use one (joins, no WHERE/GROUP BY/ORDER BY).
+    """
+    if _JOIN.search(sql):
+        return ()
+    known = {column.lower(): column for column in columns}
+    equality, ranges = [], []
+    where = _WHERE.search(sql)
+    if where:
+        for name, operator in _COMPARISON.findall(where.group("where")):
+            column = known.get(name.lower())
+            if column is None:
+                continue
+            target = equality if operator.lower() in ("=", "in") else ranges
+            if column not in equality and column not in target:
+                target.append(column)
+    ordered = []
+    for pattern in (_GROUP_BY, _ORDER_BY):
+        match = pattern.search(sql)
+        column = known.get(match.group(1).lower()) if match else None
+        if column and column not in equality:
+            ordered.append(column)
+
+    candidate = list(equality)
+    if ranges:
+        candidate.append(ranges[0])
+    elif ordered:
+        candidate.append(ordered[0])
+    return tuple(candidate[:MAX_INDEX_COLUMNS])
+
+
+def _load():
+    """Read the persisted workload on first use (called with the lock held)."""
+    global _loaded, _min_count
+    if _loaded:
+        return
+    _loaded = True
+    if not WORKLOAD_PATH or not os.path.exists(WORKLOAD_PATH):
+        return
+    try:
+        with open(WORKLOAD_PATH, encoding="utf-8") as f:
+            for database, table, columns, shape in json.load(f):
+                key = (database, table, tuple(columns))
+                _workload[key] = shape
+                _by_count.setdefault(shape["count"], {})[key] = None
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error reading the query workload log, starting empty: {e}")
+        _workload.clear()
+        _by_count.clear()
+    _min_count = min(_by_count, default=0)
+
+
+def _count(key, shape):
+    """Add one use to a logged shape and move it to its new count's bucket (called with the lock held)."""
+    global _min_count
+    count = shape["count"]
+    if count:
+        bucket = _by_count[count]
+        del bucket[key]
+        if not bucket:
+            del _by_count[count]
+            if _min_count == count:
+                _min_count = count + 1
+    else:
+        _min_count = 1
+    shape["count"] = count + 1
+    _by_count.setdefault(count + 1, {})[key] = None
+
+
+def _evict():
+    """Drop the least used shape, the oldest of them on a tie (called with the lock held)."""
+    bucket = _by_count[_min_count]
+    key = next(iter(bucket))
+    del bucket[key]
+    if not bucket:
+        del _by_count[_min_count]
+    del _workload[key]
+
+
+def record(cursor, sql, params=None, database=None):
+    """
+    Log the index a generated query could use, counting repeats of the same shape.
+
+    Called by fetch_preview for every query sent to the database; the last SQL
+    and parameters of each shape are kept to EXPLAIN and time it later.
+    """
+    match = _FROM.search(sql)
+    if not match or not database:
+        return
+    table = match.group(1)
+    entry = catalog.get_table(cursor, table, database)
+    if not entry:
+        return
+    columns = index_columns(sql, entry["columns"])
+    if not columns:
+        return
+    key = (database, table, columns)
+    with _lock:
+        _load()
+        shape = _workload.get(key)
+        if shape is None:
+            if len(_workload) >= MAX_WORKLOAD_SHAPES:
+                _evict()
+            shape = _workload[key] = {"count": 0}
+        _count(key, shape)
+        shape.update(sql=sql, params=list(params) if params else None)
+
+
+def save():
+    """Persist the workload log."""
+    if not WORKLOAD_PATH:
+        return
+    with _lock:
+        _load()
+        data = [[database, table, list(columns), shape] for (database, table, columns), shape in _workload.items()]
+    try:
+        directory = os.path.dirname(os.path.abspath(WORKLOAD_PATH))
+        # A temporary file of its own, so writers in other threads never replace each other's
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f"{os.path.basename(WORKLOAD_PATH)}.", suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, default=str)
+        os.replace(tmp_path, WORKLOAD_PATH)
+    except OSError as e:
+        print(f"Error saving the query workload log: {e}")
+
+
+def _covered(columns, indexes):
+    """True if an existing index starts with the recommended columns."""
+    return any([column.lower() for column in index[:len(columns)]] == [column.lower() for column in columns]
+               for index in indexes)
+
+
+def recommend(cursor, database, table=None):
+    """
+    Recommend secondary indexes for the logged workload of a database.
+
+    Each logged query shape whose index does not exist yet is run through
+    EXPLAIN; shapes whose plan reads the whole table or sorts outside an
+    index become recommendations, most frequent first.
+
+    Args:
+        cursor: Cursor already using `database`.
+        database (str): The database name.
+        table (str, optional): Only consider this table.
+
+    Returns:
+        list: Dicts with 'table', 'columns', 'count' (logged queries),
+        'sql'/'params' (an example query), 'reasons' and the plan 'detail'.
+    """
+    backend = get_backend_for(cursor)
+    with _lock:
+        _load()
+        shapes = [(key[1], key[2], dict(shape)) for key, shape in _workload.items()
+                  if key[0] == database and (table is None or key[1] == table)]
+
+    indexes = {}
+    recommendations = []
+    for table_name, columns, shape in sorted(shapes, key=lambda item: -item[2]["count"]):
+        if catalog.get_table(cursor, table_name, database) is None:
+            continue
+        if table_name not in indexes:
+            indexes[table_name] = backend.list_indexes(cursor, database, table_name)
+        if _covered(columns, indexes[table_name]):
+            continue
+        try:
+            plan = backend.explain(cursor, shape["sql"], tuple(shape["params"]) if shape["params"] else None)
+        except Exception as e:
+            print(f"Error explaining {shape['sql']}: {e}")
+            continue
+        steps = [step for step in plan if step["table"] in (table_name, None)]
+        reasons = []
+        if any(step["full_scan"] for step in steps):
+            reasons.append("full table scan")
+        if any(step["sort"] for step in steps):
+            reasons.append("sort outside an index")
+        if not reasons:
+            continue
+        recommendations.append({
+            "table": table_name,
+            "columns": columns,
+            "count": shape["count"],
+            "sql": shape["sql"],
+            "params": shape["params"],
+            "reasons": reasons,
+            "detail": "; ".join(step["detail"] for step in steps)
+        })
+    return recommendations
+
+
+def index_name(table, columns):
+    return f"idx_{table}_{'_'.join(columns)}"[:64]
+
+
+def _time_query(cursor, sql, params):
+    from query_executor import push_down_limit
+
+    # Run on the database directly: through fetch_preview the runs would be logged and could hit rollups
+    operation = push_down_limit(sql, TIMING_ROWS) or sql
+    best = None
+    for _ in range(TIMING_RUNS):
+        start = time.perf_counter()
+        cursor.execute(operation, params)
+        cursor.fetchall()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def create_recommended_index(cursor, database, recommendation):
+    """
+    Create a recommended index and time its example query before and after.
+
+    Returns:
+        dict: 'name', 'before_ms' and 'after_ms' (fastest of TIMING_RUNS runs each).
+    """
+    backend = get_backend_for(cursor)
+    table, columns = recommendation["table"], recommendation["columns"]
+    params = tuple(recommendation["params"]) if recommendation["params"] else None
+    entry = catalog.get_table(cursor, table, database)
+
+    before = _time_query(cursor, recommendation["sql"], params)
+    name = index_name(table, columns)
+    backend.create_index(cursor, table, name, columns, entry["types"])
+    after = _time_query(cursor, recommendation["sql"], params)
+    return {"name": name, "before_ms": before * 1000, "after_ms": after * 1000}
@@ -0,0 +1,289 @@
+import csv
+import hashlib
+import json
+import os
+import queue
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from backends import INTERNAL_TABLE_PREFIX
+from schema_catalog import catalog
+
+# Rows per chunk; a chunk is the unit of commit, checkpointing and quarantine
+CHUNK_SIZE = int(os.environ.get("CHATDB_INGEST_CHUNK_SIZE", "50000"))
+# Rows per multi-row INSERT sent by executemany
+BATCH_SIZE = int(os.environ.get("CHATDB_INGEST_BATCH_SIZE", "1000"))
+# Chunks loaded concurrently, each over its own pooled connection
+WORKERS = int(os.environ.get("CHATDB_INGEST_WORKERS", "4"))
+# Checkpoints and quarantined chunks are written here
+INGEST_DIR = os.environ.get(
+    "CHATDB_INGEST_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".chatdb_ingest")
+)
+# Chunks committed by chunked uploads, recorded in the same transaction as their rows
+PROGRESS_TABLE = f"{INTERNAL_TABLE_PREFIX}ingest_chunks"
+
+
+def _checkpoint_path(database, table_name, file_path):
+    """Checkpoints are keyed by target table and by the file's path, size and modification time."""
+    stat = os.stat(file_path)
+    key = f"{os.path.abspath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(INGEST_DIR, f"{database}.{table_name}.{digest}.json")
+
+
+def has_checkpoint(database, table_name, file_path):
+    """Return True if an interrupted upload of `file_path` into the table can be resumed."""
+    return os.path.exists(_checkpoint_path(database, table_name, file_path))
+
+
+def discard_checkpoint(database, table_name, file_path):
+    """Forget an interrupted upload so the next one starts from the first row."""
+    path = _checkpoint_path(database, table_name, file_path)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def _load_checkpoint(path, chunk_size):
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    return {"chunk_size": chunk_size, "completed": [], "quarantined": {}}
+
+
+def _save_checkpoint(path, checkpoint):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f"{os.path.basename(path)}.", suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def _upload_key(checkpoint_path):
+    """Identifies an upload (table and file version) in PROGRESS_TABLE."""
+    return os.path.basename(checkpoint_path)[:-len(".json")][-64:]
+
+
+def _committed_chunks(cursor, session, upload, resuming):
+    """
+    Create PROGRESS_TABLE if needed and return the chunks of `upload` it records.
+    A new upload first clears rows left by an earlier, discarded run of the same file.
+    """
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS `{PROGRESS_TABLE}` "
+                   "(upload VARCHAR(64) NOT NULL, chunk INT NOT NULL, PRIMARY KEY (upload, chunk))")
+    if not resuming:
+        cursor.execute(f"DELETE FROM `{PROGRESS_TABLE}` WHERE upload = %s", (upload,))
+    session.commit()
+    cursor.execute(f"SELECT chunk FROM `{PROGRESS_TABLE}` WHERE upload = %s", (upload,))
+    return {row[0] for row in cursor.fetchall()}
+
+
+def _converter(column_type):
+    """Return a function converting a CSV field to the Python value for a MySQL column type."""
+    base_type = column_type.split("(")[0].lower()
+    if "int" in base_type:
+        convert = int
+    elif base_type in ("float", "double", "real"):
+        convert = float
+    elif base_type in ("decimal", "numeric"):
+        convert = Decimal
+    else:
+        convert = str
+    return lambda value: None if value in ("", "\\N") else convert(value)
+
+
+def _read_chunks(file_path, chunk_size):
+    """Yield (chunk_index, rows) pairs from a CSV file, skipping the header row."""
+    with open(file_path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        chunk = []
+        index = 0
+        for row in reader:
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                yield index, chunk
+                chunk = []
+                index += 1
+        if chunk:
+            yield index, chunk
+
+
+def ingest_csv(pool, database, table_name, file_path, chunk_size=CHUNK_SIZE,
+               batch_size=BATCH_SIZE, workers=WORKERS, use_load_data=True):
+    """
+    Load a CSV file into an existing table.
+
+    The backend's bulk load (LOAD DATA LOCAL INFILE on MySQL) is tried first. If it is unavailable (or an earlier
+    chunked upload of the same file is being resumed), the file is read in chunks
+    of `chunk_size` rows, fields are converted to the column types, and chunks are
+    inserted concurrently by `workers` pooled connections using multi-row
+    executemany batches of `batch_size`. Each chunk is committed on its own,
+    together with a row in PROGRESS_TABLE recording it, so an interrupted upload
+    (even a crashed one) resumes where it stopped and never loads a chunk twice.
+    A checkpoint file marks the upload as started and holds the chunk size and
+    quarantined chunks. A chunk that fails is rolled back and written to a quarantine CSV
+    next to the checkpoint; the others continue.
+
+    Args:
+        pool: ConnectionPool used for the worker connections.
+        database (str): The database name.
+        table_name (str): The target table, which must already exist.
+        file_path (str): Path to the CSV file (with a header row).
+        chunk_size (int): Rows per chunk.
+        batch_size (int): Rows per INSERT statement.
+        workers (int): Number of chunks loaded in parallel.
+        use_load_data (bool): Whether to try the backend's bulk load first.
+
+    Returns:
+        dict: 'rows' loaded, 'seconds' elapsed, 'rows_per_sec' and the 'quarantined' chunk files.
+    """
+    start = time.perf_counter()
+    # Leave one pooled connection for the caller's own session
+    workers = max(1, min(workers, pool.size - 1, pool.backend.max_writers or workers))
+    checkpoint_path = _checkpoint_path(database, table_name, file_path)
+    resuming = os.path.exists(checkpoint_path)
+
+    with pool.session(database) as session:
+        with session.cursor() as cursor:
+            entry = catalog.get_table(cursor, table_name, database)
+            if not entry:
+                raise ValueError(f"Table '{table_name}' does not exist in '{database}'.")
+            rows = None
+            if use_load_data and not resuming:
+                rows = pool.backend.bulk_load(cursor, session, table_name, file_path, entry["columns"])
+            if rows is not None:
+                elapsed = time.perf_counter() - start
+                return {"rows": rows, "seconds": elapsed, "rows_per_sec": rows / elapsed if elapsed else 0.0, "quarantined": []}
+            upload = _upload_key(checkpoint_path)
+            committed = _committed_chunks(cursor, session, upload, resuming)
+
+    checkpoint = _load_checkpoint(checkpoint_path, chunk_size)
+    chunk_size = checkpoint["chunk_size"]
+    completed = set(checkpoint["completed"]) | committed
+    checkpoint["completed"] = sorted(completed)
+    # Saved before any chunk is loaded, so a crash at any point leaves a resumable upload
+    _save_checkpoint(checkpoint_path, checkpoint)
+    if completed:
+        print(f"Resuming upload: {len(completed)} chunk(s) of {chunk_size} rows already loaded.")
+
+    lock = threading.Lock()
+    stats = {"rows": 0, "quarantined": []}
+    # Bounded so the reader never gets more than a few chunks ahead of the workers
+    pending = queue.Queue(maxsize=workers * 2)
+
+    def report_progress():
+        elapsed = time.perf_counter() - start
+        rate = stats["rows"] / elapsed if elapsed else 0.0
+        print(f"\r{stats['rows']:,} rows loaded ({rate:,.0f} rows/sec)", end="", flush=True)
+
+    def quarantine(index, rows, error):
+        quarantine_path = checkpoint_path.replace(".json", f".chunk{index}.quarantine.csv")
+        # Recorded first: if writing the quarantine file fails, the checkpoint is still kept for a retry
+        with lock:
+            checkpoint["quarantined"][str(index)] = str(error)
+        os.makedirs(INGEST_DIR, exist_ok=True)
+        with open(quarantine_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerows(rows)
+        with lock:
+            stats["quarantined"].append(quarantine_path)
+            _save_checkpoint(checkpoint_path, checkpoint)
+        print(f"\nChunk {index} failed ({error}); rows written to {quarantine_path}")
+
+    def worker(session):
+        with session:
+            cursor = session.cursor()
+            while True:
+                item = pending.get()
+                if item is None:
+                    return
+                index, rows = item
+                try:
+                    width = len(rows[0])
+                    columns = entry["columns"][:width]
+                    converters = [_converter(entry["types"][column]) for column in columns]
+                    values = [tuple(convert(field) for convert, field in zip(converters, row)) for row in rows]
+                    column_sql = ", ".join(f"`{column}`" for column in columns)
+                    placeholders = ", ".join(["%s"] * width)
+                    query = f"INSERT INTO `{table_name}` ({column_sql}) VALUES ({placeholders})"
+                    for offset in range(0, len(values), batch_size):
+                        cursor.executemany(query, values[offset:offset + batch_size])
+                    cursor.execute(f"INSERT INTO `{PROGRESS_TABLE}` (upload, chunk) VALUES (%s, %s)", (upload, index))
+                    session.commit()
+                except Exception as e:
+                    try:
+                        session.rollback()
+                    except Exception:
+                        pass
+                    # A worker must outlive any failure, or the reader blocks on a queue nobody drains
+                    try:
+                        quarantine(index, rows, e)
+                    except Exception as quarantine_error:
+                        print(f"\nChunk {index} failed ({e}) and could not be quarantined: {quarantine_error}")
+                    continue
+                with lock:
+                    checkpoint["completed"].append(index)
+                    checkpoint["quarantined"].pop(str(index), None)
+                    stats["rows"] += len(rows)
+                    try:
+                        _save_checkpoint(checkpoint_path, checkpoint)
+                    except Exception as e:
+                        # PROGRESS_TABLE already records the chunk; the file only speeds up a resume
+                        print(f"\nChunk {index} loaded, but the checkpoint file could not be saved: {e}")
+                    report_progress()
+
+    # Open every worker connection up front so a pool or server problem fails before any rows are read
+    sessions = []
+    try:
+        for _ in range(workers):
+            sessions.append(pool.session(database))
+    except Exception:
+        for session in sessions:
+            session.close()
+        raise
+
+    def hand_over(item):
+        """Queue an item for the workers; False once every worker has stopped."""
+        while True:
+            try:
+                pending.put(item, timeout=1)
+                return True
+            except queue.Full:
+                if all(future.done() for future in futures):
+                    return False
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(worker, session) for session in sessions]
+        try:
+            for index, rows in _read_chunks(file_path, chunk_size):
+                if index in completed:
+                    continue
+                if not hand_over((index, rows)):
+                    break
+        finally:
+            for _ in futures:
+                if not hand_over(None):
+                    break
+        for future in futures:
+            future.result()
+    print()
+
+    if not checkpoint["quarantined"]:
+        with pool.session(database) as session:
+            with session.cursor() as cursor:
+                cursor.execute(f"DELETE FROM `{PROGRESS_TABLE}` WHERE upload = %s", (upload,))
+            session.commit()
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+
+    elapsed = time.perf_counter() - start
+    return {
+        "rows": stats["rows"],
+        "seconds": elapsed,
+        "rows_per_sec": stats["rows"] / elapsed if elapsed else 0.0,
+        "quarantined": stats["quarantined"]
+    }
@@ -0,0 +1,166 @@
+# Minimum cosine similarity for a query to be assigned to a pattern without asking the user
+MIN_CONFIDENCE = 0.2
+
+# Example phrasings per pattern, written in preprocessed form (lowercased, lemmatized, stopwords removed).
+# They hold intent words only: a table, column or value name in an example would make queries about
+# that table score as this pattern, so identifiers never take part in scoring (unknown tokens are ignored).
+PATTERN_EXAMPLES = {
+    "find all <A> where <B> = <value>": [
+        "find",
+        "find record",
+        "show record",
+        "get",
+        "filter",
+        "lookup",
+        "search",
+        "fetch record"
+    ],
+    "show total <A> in <B>": [
+        "grand total",
+        "total",
+        "sum",
+        "overall total",
+        "add"
+    ],
+    "show average <A> by <B>": [
+        "calculate average",
+        "average",
+        "mean",
+        "avg",
+        "typical"
+    ],
+    "list all <A> ordered by <B>": [
+        "list ordered",
+        "list sorted",
+        "list",
+        "sort",
+        "rank",
+        "ordered descending",
+        "sorted ascending",
+        "arrange"
+    ],
+    "show number of <A> by <B>": [
+        "many",
+        "count",
+        "number",
+        "count record",
+        "number record"
+    ],
+    "find max <A>": [
+        "maximum",
+        "highest",
+        "largest",
+        "max",
+        "biggest",
+        "top"
+    ],
+    "inner join <A> and <B>": [
+        "combine",
+        "join",
+        "inner join",
+        "merge",
+        "link",
+        "together",
+        "match"
+    ]
+}
+
+
+class IntentClassifier:
+    """
+    TF-IDF classifier scoring a query against every pattern at once.
+
+    Each pattern is represented by the L2-normalized sum of the TF-IDF vectors
+    of its example phrasings, giving a (vocabulary x patterns) weight matrix.
+    A query's scores are the cosine similarities obtained from one matrix
+    product, so many queries can be classified in a single batch.
+    """
+
+    def __init__(self, examples=PATTERN_EXAMPLES):
+        import numpy as np
+
+        self._np = np
+        self.patterns = list(examples)
+        documents = [(pattern, example.split()) for pattern in self.patterns for example in examples[pattern]]
+        self.vocabulary = {}
+        for _, tokens in documents:
+            for token in tokens:
+                self.vocabulary.setdefault(token, len(self.vocabulary))
+
+        document_frequency = np.zeros(len(self.vocabulary))
+        for _, tokens in documents:
+            for token in set(tokens):
+                document_frequency[self.vocabulary[token]] += 1
+        self.idf = np.log((1 + len(documents)) / (1 + document_frequency)) + 1
+
+        weights = np.zeros((len(self.vocabulary), len(self.patterns)))
+        for pattern, tokens in documents:
+            column = self.patterns.index(pattern)
+            weights[:, column] += self._vectorize(tokens)
+        norms = np.linalg.norm(weights, axis=0)
+        self.weights = weights / np.where(norms == 0, 1, norms)
+
+    def _vectorize(self, tokens):
+        """Return the L2-normalized TF-IDF vector of a token list (unknown tokens are ignored)."""
+        vector = self._np.zeros(len(self.vocabulary))
+        for token in tokens:
+            index = self.vocabulary.get(token)
+            if index is not None:
+                vector[index] += 1
+        vector *= self.idf
+        norm = self._np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def score_batch(self, token_lists):
+        """
+        Score many queries at once.
+
+        Args:
+            token_lists (list): One list of preprocessed tokens per query.
+
+        Returns:
+            numpy.ndarray: (queries x patterns) matrix of cosine similarities.
+        """
+        if not token_lists:
+            return self._np.zeros((0, len(self.patterns)))
+        queries = self._np.vstack([self._vectorize(tokens) for tokens in token_lists])
+        return queries @ self.weights
+
+    def rank_batch(self, token_lists):
+        """Return, for each query, a list of (pattern, confidence) pairs sorted best first."""
+        ranked = []
+        for scores in self.score_batch(token_lists):
+            order = self._np.argsort(-scores, kind="stable")
+            ranked.append([(self.patterns[i], float(scores[i])) for i in order])
+        return ranked
+
+    def rank(self, tokens):
+        """Return a list of (pattern, confidence) pairs for one query, sorted best first."""
+        return self.rank_batch([tokens])[0]
+
+
+_classifier = None
+
+
+def get_classifier():
+    """Build the shared classifier on first use, so numpy is only imported when needed."""
+    global _classifier
+    if _classifier is None:
+        _classifier = IntentClassifier()
+    return _classifier
+
+
+def classify(tokens, min_confidence=MIN_CONFIDENCE):
+    """
+    Return the best pattern for a query, or None if no pattern reaches `min_confidence`.
+    """
+    pattern, confidence = get_classifier().rank(tokens)[0]
+    return pattern if confidence >= min_confidence else None
+
+
+def classify_batch(token_lists, min_confidence=MIN_CONFIDENCE):
+    """Classify many queries with one matrix product; unconfident queries map to None."""
+    return [
+        ranked[0][0] if ranked and ranked[0][1] >= min_confidence else None
+        for ranked in get_classifier().rank_batch(token_lists)
+    ]
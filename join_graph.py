@@ -0,0 +1,277 @@
+import heapq
+import itertools
+import json
+import os
+import re
+import tempfile
+import threading
+
+from column_stats import get_table_stats
+from db_connection import get_backend_for
+from schema_catalog import catalog
+
+# Directory holding one join graph file per database
+JOIN_GRAPH_DIR = os.environ.get(
+    "CHATDB_JOIN_GRAPH_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".chatdb_joins")
+)
+# Values of the referencing column looked up in the referenced one to confirm a guessed key
+OVERLAP_PROBES = 200
+# Fraction of probed values that must be found for a guessed key to become an edge
+OVERLAP_THRESHOLD = 0.5
+# Tables a join path may add between the two tables named in a question
+MAX_JOIN_HOPS = 3
+# Columns whose name marks them as keys (order_id, product_key, zip_code, invoice_no, ...)
+_KEY_NAME = re.compile(r"(?:^|_)(?:id|key|code|no|number)$", re.IGNORECASE)
+
+# database -> {'version': schema version, 'edges': [edge, ...]}
+_graphs = {}
+_lock = threading.Lock()
+# database -> lock held while building, so concurrent first uses build the graph once
+_build_locks = {}
+
+
+def _graph_path(database):
+    return os.path.join(JOIN_GRAPH_DIR, f"{database}.json")
+
+
+def _save(database, graph):
+    os.makedirs(JOIN_GRAPH_DIR, exist_ok=True)
+    path = _graph_path(database)
+    fd, tmp_path = tempfile.mkstemp(dir=JOIN_GRAPH_DIR, prefix=f"{database}.", suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(graph, f)
+    os.replace(tmp_path, path)
+
+
+def _is_unique(cursor, database, table, entry, column):
+    """True if `column` identifies the rows of `table` (declared key, or distinct on every non-null row)."""
+    if entry["primary_key"] == [column] or entry["keys"].get(column) == "UNI":
+        return True
+    stats = get_table_stats(cursor, database, table)
+    column_stats = stats["columns"].get(column)
+    if not column_stats or not stats["rows"]:
+        return False
+    return column_stats["distinct"] >= 0.99 * stats["rows"] * (1 - column_stats["null_fraction"])
+
+
+def _overlap(cursor, table, column, parent, parent_column):
+    """Fraction of sampled `table.column` values that also occur in `parent.parent_column` (1.0 if there are none)."""
+    cursor.execute(f"SELECT DISTINCT `{column}` FROM `{table}` WHERE `{column}` IS NOT NULL LIMIT {OVERLAP_PROBES}")
+    values = [row[0] for row in cursor.fetchall()]
+    if not values:
+        return 1.0
+    cursor.execute(
+        f"SELECT COUNT(DISTINCT `{parent_column}`) FROM `{parent}` "
+        f"WHERE `{parent_column}` IN ({', '.join(['%s'] * len(values))})",
+        tuple(values)
+    )
+    return cursor.fetchone()[0] / len(values)
+
+
+def _candidates(tables):
+    """
+    Guess key pairs from names when no foreign keys are declared: a key-like column
+    shared by two tables (orders.order_id / payments.order_id), or `<name>_id`
+    pointing at the primary key of the table called `<name>` or its plural.
+
+    Yields:
+        tuple: (table, column, other table, other column), each pair once.
+    """
+    names = sorted(tables)
+    for i, table in enumerate(names):
+        entry = tables[table]
+        for other in names[i + 1:]:
+            other_columns = {column.lower(): column for column in tables[other]["columns"]}
+            for column in entry["columns"]:
+                if column.lower() == "id":
+                    continue
+                other_column = other_columns.get(column.lower())
+                if other_column and (_KEY_NAME.search(column) or column in entry["primary_key"]
+                                     or other_column in tables[other]["primary_key"]):
+                    yield table, column, other, other_column
+
+    by_name = {name.lower(): name for name in names}
+    for table in names:
+        for column in tables[table]["columns"]:
+            if not column.lower().endswith("_id") or len(column) <= 3:
+                continue
+            stem = column[:-3].lower()
+            for plural in (stem, f"{stem}s", f"{stem}es", f"{stem[:-1]}ies"):
+                parent = by_name.get(plural)
+                if parent is None or parent == table:
+                    continue
+                primary_key = tables[parent]["primary_key"]
+                parent_column = primary_key[0] if len(primary_key) == 1 else next(
+                    (c for c in tables[parent]["columns"] if c.lower() == "id"), None)
+                if parent_column and parent_column.lower() != column.lower():
+                    yield table, column, parent, parent_column
+                break
+
+
+def _edge(cursor, database, tables, indexes, table, column, other, other_column, declared):
+    """
+    Describe a join key between two tables, oriented from the referencing table
+    (`left`) to the referenced one (`right`), with the cost the path search uses:
+    declared, index-backed, one-to-many keys are cheapest.
+    """
+    left_unique = _is_unique(cursor, database, table, tables[table], column)
+    right_unique = _is_unique(cursor, database, other, tables[other], other_column)
+    if left_unique and not right_unique:
+        table, column, other, other_column = other, other_column, table, column
+    indexed = [any(index and index[0].lower() == key.lower() for index in indexes[name])
+               for name, key in ((table, column), (other, other_column))]
+    cost = 1.0
+    if not declared:
+        cost += 0.5
+    if not any(indexed):
+        cost += 2
+    elif not indexed[1]:
+        cost += 0.5
+    if not (left_unique or right_unique):
+        # Many-to-many: every row pairs with every row of the same key; go through the parent table instead
+        cost += 3
+    return {
+        "left": table, "left_column": column, "right": other, "right_column": other_column,
+        "source": "foreign key" if declared else "guessed",
+        "indexed": indexed[1], "cost": cost
+    }
+
+
+def build_graph(cursor, database):
+    """
+    Work out the join keys between the tables of a database.
+
+    Declared foreign keys (`information_schema.KEY_COLUMN_USAGE` on MySQL) are
+    taken as they are. Keys guessed from column and table names are only kept
+    if the referencing column's values are found in the referenced one. For each
+    pair of tables only the cheapest key is kept.
+
+    Args:
+        cursor: Cursor already using `database`.
+        database (str): The database name.
+
+    Returns:
+        dict: 'version' (the schema version it was built for) and 'edges', a
+        list of dicts with 'left'/'left_column', 'right'/'right_column', 'source',
+        'indexed' (the referenced column leads an index) and 'cost'.
+    """
+    backend = get_backend_for(cursor)
+    tables = {table: catalog.get_table(cursor, table, database) for table in catalog.get_tables(cursor, database)}
+    indexes = {table: backend.list_indexes(cursor, database, table) for table in tables}
+
+    best = {}
+
+    def add(edge):
+        pair = tuple(sorted((edge["left"], edge["right"])))
+        if pair not in best or edge["cost"] < best[pair]["cost"]:
+            best[pair] = edge
+
+    declared = set()
+    for table, column, parent, parent_column in backend.foreign_keys(cursor, database):
+        if table in tables and parent in tables:
+            declared.add((table, column, parent, parent_column))
+            add(_edge(cursor, database, tables, indexes, table, column, parent, parent_column, True))
+
+    for table, column, other, other_column in _candidates(tables):
+        if (table, column, other, other_column) in declared or (other, other_column, table, column) in declared:
+            continue
+        try:
+            edge = _edge(cursor, database, tables, indexes, table, column, other, other_column, False)
+            if _overlap(cursor, edge["left"], edge["left_column"], edge["right"], edge["right_column"]) < OVERLAP_THRESHOLD:
+                continue
+        except Exception as e:
+            print(f"Error checking join key {table}.{column} = {other}.{other_column}: {e}")
+            continue
+        add(edge)
+
+    graph = {"version": catalog.version(cursor, database), "edges": list(best.values())}
+    with _lock:
+        _graphs[database] = graph
+    _save(database, graph)
+    return graph
+
+
+def get_graph(cursor, database):
+    """Return the join graph of a database, building it when missing or built for another schema version."""
+    version = catalog.version(cursor, database)
+    with _lock:
+        graph = _graphs.get(database)
+        if graph is not None and graph.get("version") == version:
+            return graph
+        build_lock = _build_locks.setdefault(database, threading.Lock())
+
+    with build_lock:
+        with _lock:
+            graph = _graphs.get(database)
+        if graph is None and os.path.exists(_graph_path(database)):
+            try:
+                with open(_graph_path(database), encoding="utf-8") as f:
+                    graph = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Error reading the join graph of {database}, rebuilding it: {e}")
+        if graph is None or graph.get("version") != version:
+            return build_graph(cursor, database)
+        with _lock:
+            _graphs[database] = graph
+        return graph
+
+
+def join_path(cursor, database, table1, table2):
+    """
+    Find the cheapest chain of joins from `table1` to `table2`, going through
+    at most MAX_JOIN_HOPS other tables (customers -> orders -> payments).
+
+    Returns:
+        list: One step per joined table, in order: dicts with 'table'/'column'
+        (the joined table and its key) and 'from_table'/'from_column' (the key
+        it is joined to). Empty if `table1` and `table2` are the same table,
+        None if no path joins them.
+    """
+    if table1 == table2:
+        return []
+    neighbours = {}
+    for edge in get_graph(cursor, database)["edges"]:
+        neighbours.setdefault(edge["left"], []).append((edge["right"], edge["right_column"], edge["left_column"], edge["cost"]))
+        neighbours.setdefault(edge["right"], []).append((edge["left"], edge["left_column"], edge["right_column"], edge["cost"]))
+
+    # Dijkstra over tables; a state carries its steps so far (the counter breaks ties without comparing them)
+    order = itertools.count()
+    queue = [(0.0, next(order), table1, [])]
+    # table -> fewest steps it was expanded with. A table reached again at a higher cost is still
+    # expanded if it took fewer steps, since the cheaper route may leave no hops for the rest of the path.
+    expanded = {}
+    while queue:
+        cost, _, table, steps = heapq.heappop(queue)
+        if table == table2:
+            return steps
+        if len(steps) > MAX_JOIN_HOPS or expanded.get(table, len(steps) + 1) <= len(steps):
+            continue
+        expanded[table] = len(steps)
+        visited = {table1}.union(step["table"] for step in steps)
+        for other, column, from_column, edge_cost in neighbours.get(table, ()):
+            if other not in visited:
+                step = {"table": other, "column": column, "from_table": table, "from_column": from_column}
+                heapq.heappush(queue, (cost + edge_cost, next(order), other, steps + [step]))
+    return None
+
+
+def join_sql(table1, steps):
+    """Render a join path as `SELECT * FROM table1 INNER JOIN ... ON ...`."""
+    sql = f"SELECT * FROM {table1}"
+    for step in steps:
+        sql += f" INNER JOIN {step['table']} ON {step['from_table']}.{step['from_column']} = {step['table']}.{step['column']}"
+    return sql
+
+
+def forget_graph(database, table=None):
+    """Drop the join graph of a database so it is rebuilt on next use (any table change can add or remove keys)."""
+    with _lock:
+        _graphs.pop(database, None)
+    try:
+        os.remove(_graph_path(database))
+    except FileNotFoundError:
+        pass
+
+
+catalog.add_listener(forget_graph)
@@ -1,7 +1,17 @@
-from db_connection import connect_to_db
-from db_operation import list_databases, list_tables, show_sample_data, upload_dataset,insert_record,update_record,delete_record, delete_table, get_table_schema
-from nlp_usage import preprocess_query, match_query_pattern, identify_entities, generate_sql_query_from_nl
+from backends import SQLITE_DIR, MySQLBackend, SQLiteBackend
+from batch import BATCH_CONCURRENCY, BATCH_MAX_ROWS, default_output_path, run_batch
+from db_connection import BACKEND, ConnectionPool, DatabaseConnectionError, use_database
+from db_operation import describe_table_size, load_csv_directory, list_databases, list_tables, show_sample_data, upload_dataset,insert_record,update_record,delete_record, delete_table, get_table_schema
+from nlp_usage import translate_nl_query
 from query_generator import generate_sql_query, generate_group_by_query,generate_sample_queries
+from exporter import export_query
+from query_executor import fetch_preview, run_queries
+from schema_catalog import catalog
+import approximate
+import index_advisor
+import rollups
+import tracing
+import argparse
 import sys
 
 
@@ -24,14 +34,14 @@ def explore_database(cursor, conn):
         
         selected_db = databases[int(db_choice) - 1]
         print(f"\nYou selected: {selected_db} database.")
-        cursor.execute(f"USE {selected_db}")
+        use_database(cursor, selected_db)
 
         # Step 2: List Tables in the Selected Database
         while True:
             tables = list_tables(cursor, selected_db)
             print(f"\nTables in {selected_db} database:")
             for i, table in enumerate(tables, 1):
-                print(f"{i}. {table}")
+                print(f"{i}. {table}{describe_table_size(cursor, selected_db, table)}")
             
             print(f"{len(tables) + 1}. Upload Dataset")
             print(f"{len(tables) + 2}. Back to Database Selection")
@@ -68,9 +78,9 @@ def explore_database(cursor, conn):
                     print("\nSample Data:")
                     print(sample_data)
                 elif choice == "2":
-                    insert_record(cursor, conn, selected_table)
+                    insert_record(cursor, conn, selected_table, selected_db)
                 elif choice == "3":
-                    update_record(cursor, conn, selected_table)
+                    update_record(cursor, conn, selected_table, selected_db)
                 elif choice == "4":
                     delete_record(cursor, conn, selected_table)
                 elif choice == "5":
@@ -98,7 +108,7 @@ def sample_queries_3(cursor):
         return
     
     selected_db = databases[int(db_choice) - 1]
-    cursor.execute(f"USE {selected_db}")
+    use_database(cursor, selected_db)
     print(f"\nYou selected: {selected_db} database.")
 
     # Step 2: List Tables in the Selected Database
@@ -116,8 +126,8 @@ def sample_queries_3(cursor):
     print(f"\nYou selected: {selected_table} table.")
 
     # Step 3: Fetch Table Schema
-    cursor.execute(f"DESCRIBE {selected_table}")
-    columns = [desc[0] for desc in cursor.fetchall()]
+    entry = catalog.get_table(cursor, selected_table, selected_db)
+    columns = entry["columns"] if entry else []
 
     print("\nAvailable Columns:")
     for i, col in enumerate(columns, 1):
@@ -155,15 +165,34 @@ def sample_queries_3(cursor):
 
     # Step 6: Display Queries
     print("\nHere are some sample queries. Let me know if there is a specific type of queries you want to learn about or type 'menu'.")
-    print("Enter 'execute <query_number>' to run a query.\n")
+    print("Enter 'execute <query_number>' to run a query, or 'execute all' to run them all at once.")
+    print("Enter 'export <query_number> <file>' to write all of a query's rows to a .csv, .jsonl or .parquet file (add .gz to compress).\n")
     for i, query in enumerate(queries, 1):
         print(f"{i}. {query['heading']}\n```{query['sql']}```\n")
 
     # Step 7: Handle User Interaction
     while True:
-        user_input = input("\nYour choice: ").strip().lower()
+        raw_input = input("\nYour choice: ").strip()
+        user_input = raw_input.lower()
         if user_input == "menu":
             break
+        elif user_input == "execute all":
+            for position, results, error, seconds in run_queries(cursor, queries, 10, columnar=True):
+                print(f"\n{position + 1}. {queries[position]['heading']}")
+                if error:
+                    print(f"Error executing query: {error}")
+                elif results:
+                    for row in results:  # Show only the first 10 rows
+                        print(row)
+                else:
+                    print("No results returned.")
+        elif user_input.startswith("export"):
+            # File names keep their case
+            parts = raw_input.split(maxsplit=2)
+            if len(parts) < 3 or not parts[1].isdigit() or not 1 <= int(parts[1]) <= len(queries):
+                print("Invalid input format. Use 'export <query_number> <file>'.")
+                continue
+            export_results(cursor, queries[int(parts[1]) - 1]["sql"], None, parts[2])
         elif user_input.startswith("execute"):
             try:
                 query_number = int(user_input.split()[1])
@@ -174,11 +203,10 @@ def sample_queries_3(cursor):
                 # Execute the selected query
                 selected_query = queries[query_number - 1]["sql"]
                 print(f"\nExecuting Query:\n{selected_query}")
-                cursor.execute(selected_query)
-                results = cursor.fetchall()
+                results = fetch_preview(cursor, selected_query, 10, columnar=True)
 
                 if results:
-                    for row in results[:10]:  # Show only the first 10 rows
+                    for row in results:  # Show only the first 10 rows
                         print(row)
                 else:
                     print("No results returned.")
@@ -189,33 +217,34 @@ def sample_queries_3(cursor):
         else:
             print("Invalid input. Type 'menu' to return or 'execute <query_number>' to run a query.")
 
-def display_sample_queries(cursor, table_name):
+def display_sample_queries(cursor, table_name, database=None):
     """
     Display three sample queries with query descriptions and SQL results.
     
     Args:
         cursor: MySQL cursor object for executing queries.
         table_name (str): The table name.
+        database (str, optional): The database name. Defaults to the cursor's current database.
     """
     # Step 1: Extract the table schema dynamically
-    schema = get_table_schema(cursor, table_name)
+    schema = get_table_schema(cursor, table_name, database)
     
     # Step 2: Generate the sample queries
     queries = generate_sample_queries(table_name, schema)
     
-    for i, query in enumerate(queries, 1):
-        print(f"{i}. {query['description']}")
+    # Step 3: Run them concurrently and show each one as soon as it finishes
+    for position, results, error, seconds in run_queries(cursor, queries, 5, database=database, columnar=True):
+        query = queries[position]
+        print(f"{position + 1}. {query['description']}")
         print(f"SQL: {query['sql']}\n")
-        
-        try:
-            cursor.execute(query['sql'])
-            results = cursor.fetchall()
-            print("Query Results (First 5 rows):")
-            for row in results[:5]:  # Display only the first 5 rows
-                print(row)
-            print("\n" + "-" * 40 + "\n")  # Separator
-        except Exception as e:
-            print(f"Error executing query: {e}")
+
+        if error:
+            print(f"Error executing query: {error}")
+            continue
+        print(f"Query Results (First 5 rows, {seconds * 1000:.0f} ms):")
+        for row in results:  # Display only the first 5 rows
+            print(row)
+        print("\n" + "-" * 40 + "\n")  # Separator
 
 def sample_queries_2(cursor):
     """
@@ -228,7 +257,7 @@ def sample_queries_2(cursor):
     
     db_choice = input("\nSelect a database by typing the number: ").strip()
     selected_db = databases[int(db_choice) - 1]
-    cursor.execute(f"USE {selected_db}")
+    use_database(cursor, selected_db)
     
     tables = list_tables(cursor, selected_db)
     print("\nTables in {selected_db}:")
@@ -239,7 +268,7 @@ def sample_queries_2(cursor):
     selected_table = tables[int(table_choice) - 1]
     print(f"\nYou selected: {selected_table} table.")
     
-    display_sample_queries(cursor, selected_table)
+    display_sample_queries(cursor, selected_table, selected_db)
 
 
 
@@ -256,59 +285,189 @@ def natural_language_query(cursor):
         return
 
     selected_db = databases[int(db_choice) - 1]
-    cursor.execute(f"USE {selected_db}")
+    use_database(cursor, selected_db)
 
     user_query = input("\nEnter your query in natural language: ").strip()
-    tokens = preprocess_query(user_query)
-    # print(f"Tokens: {tokens}")  # Debugging output
-
-    # Step 3: Match Query Pattern
-    pattern = match_query_pattern(tokens)
-    if not pattern:
-        print("\nCould not match your query to any known patterns.")
-        return
+    with tracing.span("natural_language_query", question=user_query) as root:
+        answered = answer_nl_query(cursor, user_query, selected_db)
+    tracing.report(root)
+    if answered:
+        path = input("\nExport all rows to a .csv, .jsonl or .parquet file (add .gz to compress), or press Enter to skip: ").strip()
+        if path:
+            export_results(cursor, *answered, path)
 
-    # Step 4: Identify Entities (table, attribute, value)
-    table1, table2, attribute1, attribute2, value = identify_entities(pattern, tokens, cursor, selected_db)
-    # print(f"Matched Table1: {table1}, Matched Table2: {table2}, Attribute1: {attribute1}, Attribute2: {attribute2}, Value: {value}")  # Debugging output
 
-    if not table1 or not attribute1:
-        print("Could not identify all necessary entities for query construction.")
-        return
+def answer_nl_query(cursor, user_query, selected_db):
+    """
+    Translate a question to SQL, run it and print the first rows.
 
-    # Step 5: Generate SQL Query
-    sql_query = generate_sql_query_from_nl(pattern, table1, table2, attribute1, attribute2, value)
-    if not sql_query:
-        print("Failed to generate a valid SQL query.")
+    Returns:
+        tuple: (sql, params) of the query if it ran, else None.
+    """
+    with tracing.span("translate"):
+        try:
+            translated = translate_nl_query(cursor, user_query, selected_db)
+        except LookupError as e:
+            print(f"Error loading NLP resources: {e}")
+            return
+    if not translated:
         return
+    sql_query, params = translated
 
     print(f"\nGenerated SQL Query:\n{sql_query}")
+    if params:
+        print(f"Parameters: {params}")
 
     # Step 6: Execute Query
     try:
-        cursor.execute(sql_query)
-        rows = cursor.fetchall()
+        with tracing.span("run_query"):
+            rows = fetch_preview(cursor, sql_query, 5, params, columnar=True)
         print("\nQuery Results (First 5 rows):")
-        for row in rows[:5]:  # Display only the first 5 rows
+        for row in rows:  # Display only the first 5 rows
             print(row)
-                    # Clear any remaining results
-        while cursor.nextset():
-            pass
+        return sql_query, params
     except Exception as e:
         print(f"Error executing query: {e}")
 
 
+def export_results(cursor, sql, params, path):
+    """Stream every row of a query into a file and report the throughput."""
+    print(f"\nExporting to {path}...")
+    try:
+        stats = export_query(cursor, sql, path, params)
+    except Exception as e:
+        print(f"Error exporting results: {e}")
+        return
+    print(f"Exported {stats['rows']:,} rows ({stats['bytes'] / (1024 * 1024):.1f} MB, {stats['format']}) "
+          f"in {stats['seconds']:.1f}s ({stats['rows_per_sec']:,.0f} rows/sec) to {stats['path']}.")
+
+
+def toggle_approximate(conn):
+    """Switch the session between exact and approximate aggregate results."""
+    conn.approximate = not conn.approximate
+    if conn.approximate:
+        print(f"\nApproximate mode on: aggregate sample queries on tables over {approximate.SAMPLE_ROWS:,} rows "
+              "run on a random sample and show 'estimate ± 95% confidence interval' (MIN/MAX as '~value').")
+    else:
+        print("\nExact mode on: every query runs on the full table.")
+
+
+def advise_indexes(cursor):
+    """Recommend indexes for the queries run so far and create the ones the user confirms."""
+    databases = list_databases(cursor)
+    print("\nAvailable Databases:")
+    for i, db in enumerate(databases, 1):
+        print(f"{i}. {db}")
+    db_choice = input("\nSelect a database by typing the number: ").strip()
+    if not db_choice.isdigit() or int(db_choice) < 1 or int(db_choice) > len(databases):
+        print("Invalid choice.")
+        return
+    selected_db = databases[int(db_choice) - 1]
+    use_database(cursor, selected_db)
+
+    try:
+        recommendations = index_advisor.recommend(cursor, selected_db)
+    except Exception as e:
+        print(f"Error analyzing queries: {e}")
+        return
+    if not recommendations:
+        print(f"\nNo index recommendations for {selected_db}: no logged query scans a whole table or sorts without an index.")
+        return
+
+    print(f"\nRecommended indexes for {selected_db}:")
+    for i, rec in enumerate(recommendations, 1):
+        print(f"{i}. {rec['table']} ({', '.join(rec['columns'])}): {' and '.join(rec['reasons'])}, {rec['count']} logged queries")
+        print(f"   e.g. {' '.join(rec['sql'].split())}")
+        print(f"   plan: {rec['detail']}")
+
+    while True:
+        choice = input("\nType the number of an index to create it, or 'menu' to return: ").strip().lower()
+        if choice == "menu":
+            return
+        if not choice.isdigit() or int(choice) < 1 or int(choice) > len(recommendations):
+            print("Invalid choice.")
+            continue
+        rec = recommendations[int(choice) - 1]
+        name = index_advisor.index_name(rec["table"], rec["columns"])
+        confirm = input(f"Create index {name} on {rec['table']} ({', '.join(rec['columns'])})? (yes/no): ").strip().lower()
+        if confirm != "yes":
+            continue
+        try:
+            timing = index_advisor.create_recommended_index(cursor, selected_db, rec)
+            print(f"Index {timing['name']} created. Example query: {timing['before_ms']:.2f} ms before, {timing['after_ms']:.2f} ms after.")
+        except Exception as e:
+            print(f"Error creating index: {e}")
+
+
 def exit_chatdb(cursor, conn):
     """Gracefully exit ChatDB."""
     print("\nExiting ChatDB... Goodbye!")
+    index_advisor.save()
     cursor.close()
     conn.close()
+    conn.pool.close()
     sys.exit(0)
 
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="ChatDB: explore and query databases in natural language.")
+    parser.add_argument("--backend", choices=["mysql", "sqlite"], default=BACKEND,
+                        help="Database engine: a MySQL server or embedded SQLite files (default: %(default)s).")
+    parser.add_argument("--sqlite-dir", default=SQLITE_DIR,
+                        help="Directory of the embedded SQLite databases (default: %(default)s).")
+    parser.add_argument("--load-csv", metavar="DIR",
+                        help="Load every CSV file in DIR (e.g. the Olist dataset) into --database before starting.")
+    parser.add_argument("--database", default="olist",
+                        help="Target database for --load-csv, and for --batch questions that name none (default: %(default)s).")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="Answer every question in a JSONL/CSV file without prompting, then exit.")
+    parser.add_argument("--output", metavar="FILE",
+                        help="JSONL results file for --batch (default: next to the input).")
+    parser.add_argument("--processes", type=int,
+                        help="Worker processes preprocessing --batch questions (default: CPU count).")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY,
+                        help="--batch questions executed at the same time (default: %(default)s).")
+    parser.add_argument("--max-rows", type=int, default=BATCH_MAX_ROWS,
+                        help="Result rows written per --batch question (default: %(default)s).")
+    parser.add_argument("--rollups", action="store_true", default=rollups.enabled,
+                        help="Answer SUM/AVG/COUNT ... GROUP BY sample queries from precomputed rollups.")
+    parser.add_argument("--approximate", action="store_true",
+                        help="Start in approximate mode: answer aggregate sample queries from random table samples.")
+    parser.add_argument("--profile", action="store_true",
+                        help="Print a per-stage timing breakdown after every natural language query.")
+    parser.add_argument("--trace-file", metavar="PATH",
+                        help="With --profile, also export all spans as Chrome trace JSON to PATH.")
+    return parser.parse_args(argv)
+
+
 def main():
     """Main function to run ChatDB."""
-    conn = connect_to_db()
+    args = parse_args()
+    if args.profile:
+        tracing.enable(args.trace_file)
+    rollups.enable(args.rollups)
+    backend = SQLiteBackend(args.sqlite_dir) if args.backend == "sqlite" else MySQLBackend()
+    try:
+        pool = ConnectionPool(backend=backend)
+        if args.load_csv:
+            load_csv_directory(pool, args.database, args.load_csv)
+        if args.batch:
+            run_batch(pool, args.batch, args.output or default_output_path(args.batch), args.database,
+                      args.processes, args.concurrency, args.max_rows)
+            pool.close()
+            sys.exit(0)
+        conn = pool.session()
+    except DatabaseConnectionError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    except LookupError as e:
+        print(f"Error loading NLP resources: {e}")
+        sys.exit(1)
+    if args.backend == "sqlite":
+        print(f"Using embedded SQLite databases in {args.sqlite_dir}")
+    else:
+        print("Connected to MySQL database!")
+    conn.approximate = args.approximate
     cursor = conn.cursor()
     print("Welcome to ChatDB!")
 
@@ -318,7 +477,9 @@ def main():
         print("2. Sample queries")
         print("3. Advanced Sample queries")
         print("4. Ask natural language query")
-        print("5. Exit")
+        print(f"5. Switch to {'exact' if conn.approximate else 'approximate'} results")
+        print("6. Index advisor")
+        print("7. Exit")
         print("----------------------")
         choice = input("\nSelect an option by typing the number: ").strip()
 
@@ -331,6 +492,10 @@ def main():
         elif choice == "4":
             natural_language_query(cursor)
         elif choice == "5":
+            toggle_approximate(conn)
+        elif choice == "6":
+            advise_indexes(cursor)
+        elif choice == "7":
             exit_chatdb(cursor, conn)
         else:
             print("Invalid choice. Please try again.")
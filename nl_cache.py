@@ -0,0 +1,166 @@
+import atexit
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+# Maximum number of translations kept (least recently used entries are evicted first)
+NL_CACHE_SIZE = int(os.environ.get("CHATDB_NL_CACHE_SIZE", "1000"))
+# File the cache is persisted to; set CHATDB_NL_CACHE_PATH to an empty string to keep it in memory only
+NL_CACHE_PATH = os.environ.get(
+    "CHATDB_NL_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".chatdb_nl_cache.json")
+)
+
+
+def normalize_question(question):
+    """Canonical text form of a question: lowercased with whitespace collapsed."""
+    return " ".join(question.lower().split())
+
+
+class TranslationCache:
+    """
+    LRU cache from natural language questions to generated SQL.
+
+    Two maps are kept. `tokens` maps a normalized question to its preprocessed
+    tokens so a repeated question skips NLTK. `translations` maps
+    (database, schema version, tokens) to the generated SQL so it skips
+    entity resolution; differently worded questions with the same tokens share
+    an entry. Both are optionally persisted to a JSON file.
+    """
+
+    def __init__(self, max_size=NL_CACHE_SIZE, path=NL_CACHE_PATH):
+        self.max_size = max_size
+        self.path = path
+        self.tokens = OrderedDict()
+        self.translations = OrderedDict()
+        self._lock = threading.Lock()
+        self._loaded = False
+        # Changed in memory since the last save (invalidations are only persisted with the next save or at exit)
+        self._dirty = False
+        atexit.register(self.flush)
+
+    @staticmethod
+    def _key(tokens, database, schema_version):
+        return json.dumps([database, schema_version, list(tokens)])
+
+    def _load(self):
+        """Read the persisted cache on first use (called with the lock held)."""
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.tokens.update((question, tuple(tokens)) for question, tokens in data.get("tokens", []))
+            self.translations.update((key, entry) for key, entry in data.get("translations", []))
+        except (OSError, ValueError) as e:
+            print(f"Error reading NL cache, starting empty: {e}")
+
+    def _save(self):
+        if not self.path:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        # A temporary file of its own, so concurrent ChatDB processes never replace each other's
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f"{os.path.basename(self.path)}.", suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({
+                "tokens": [[question, list(tokens)] for question, tokens in self.tokens.items()],
+                "translations": list(self.translations.items())
+            }, f)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    @staticmethod
+    def _touch(mapping, key, max_size, value=None):
+        if value is not None:
+            mapping[key] = value
+        mapping.move_to_end(key)
+        while len(mapping) > max_size:
+            mapping.popitem(last=False)
+
+    def get_tokens(self, question):
+        """Return the cached tokens of a question, or None."""
+        question = normalize_question(question)
+        with self._lock:
+            self._load()
+            tokens = self.tokens.get(question)
+            if tokens is not None:
+                self._touch(self.tokens, question, self.max_size)
+            return tokens
+
+    def put_tokens(self, question, tokens):
+        with self._lock:
+            self._load()
+            self._touch(self.tokens, normalize_question(question), self.max_size, tuple(tokens))
+            self._dirty = True
+
+    def get(self, tokens, database, schema_version):
+        """
+        Return the cached translation for a token tuple, or None.
+
+        Returns:
+            dict: 'sql' and its 'params' plus the 'pattern' and entities it was generated from.
+        """
+        key = self._key(tokens, database, schema_version)
+        with self._lock:
+            self._load()
+            entry = self.translations.get(key)
+            if entry is not None:
+                self._touch(self.translations, key, self.max_size)
+            return entry
+
+    def put(self, tokens, database, schema_version, entry, save=True):
+        """Store a translation and, unless `save` is False, persist the cache."""
+        with self._lock:
+            self._load()
+            self._touch(self.translations, self._key(tokens, database, schema_version), self.max_size, entry)
+            self._dirty = True
+            if save:
+                self._save_quietly()
+
+    def save(self):
+        """Persist the cache (after a run of put(..., save=False) calls)."""
+        with self._lock:
+            self._load()
+            self._save_quietly()
+
+    def flush(self):
+        """Persist the cache if it changed since it was last saved (registered to run at exit)."""
+        with self._lock:
+            if self._dirty:
+                self._save_quietly()
+
+    def _save_quietly(self):
+        try:
+            self._save()
+        except OSError as e:
+            print(f"Error saving NL cache: {e}")
+
+    def invalidate(self, database, table=None):
+        """
+        Drop every translation for a database (its schema or data changed).
+        Called on every insert, update and delete, so the file is not rewritten
+        here; the change is persisted with the next save or at exit.
+        """
+        with self._lock:
+            self._load()
+            for key in list(self.translations):
+                if json.loads(key)[0] == database:
+                    del self.translations[key]
+                    self._dirty = True
+
+    def clear(self):
+        with self._lock:
+            self._load()
+            self.tokens.clear()
+            self.translations.clear()
+            self._save_quietly()
+
+
+# Shared cache used by nlp_usage.translate_nl_query
+translation_cache = TranslationCache()
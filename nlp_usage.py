@@ -1,17 +1,78 @@
-import nltk
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
-import numpy as np
+import os
+
+import tracing
+from column_stats import columns_of_kind, value_columns
+from identifier_index import get_identifier_index
+from intent_classifier import classify, get_classifier
+from join_graph import join_path, join_sql
+from db_connection import use_database
+from nl_cache import translation_cache
+from schema_catalog import catalog
+from value_index import add_invalidation_listener, value_exists
+
+# Local NLTK data directory; resources are never downloaded at runtime
+NLTK_DATA_DIR = os.environ.get(
+    "CHATDB_NLTK_DATA",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "nltk_data")
+)
+# NLTK resource name -> path inside the data directory
+NLTK_RESOURCES = {
+    "punkt_tab": "tokenizers/punkt_tab",
+    "stopwords": "corpora/stopwords",
+    "wordnet": "corpora/wordnet"
+}
+
+# Loaded on the first natural language query by load_nlp_resources()
+word_tokenize = None
+lemmatizer = None
+stop_words = None
+pattern = None
 
+# Cached translations must not outlive the schema or the data used to resolve values
+catalog.add_listener(translation_cache.invalidate)
+add_invalidation_listener(translation_cache.invalidate)
 
-nltk.download("punkt_tab", quiet=True)
-nltk.download("stopwords", quiet=True)
-nltk.download("wordnet", quiet=True)
 
-lemmatizer = WordNetLemmatizer()
-stop_words = set(stopwords.words("english"))
-pattern = None
+def load_nlp_resources():
+    """
+    Import NLTK and build the tokenizer, lemmatizer and stopword set on first use.
+
+    Resources are looked up in NLTK_DATA_DIR (then NLTK's default locations) and
+    verified before use; nothing is downloaded.
+
+    Raises:
+        LookupError: If a required NLTK resource is not installed locally.
+    """
+    global word_tokenize, lemmatizer, stop_words
+    if lemmatizer is not None:
+        return
+
+    import nltk
+    if NLTK_DATA_DIR not in nltk.data.path:
+        nltk.data.path.insert(0, NLTK_DATA_DIR)
+
+    missing = []
+    for name, resource_path in NLTK_RESOURCES.items():
+        try:
+            nltk.data.find(resource_path)
+        except LookupError:
+            try:
+                nltk.data.find(f"{resource_path}.zip")
+            except LookupError:
+                missing.append(name)
+    if missing:
+        raise LookupError(
+            f"Missing NLTK data: {', '.join(missing)}. Install it once with: "
+            f"python -m nltk.downloader -d {NLTK_DATA_DIR} {' '.join(missing)}"
+        )
+
+    from nltk.tokenize import word_tokenize as tokenize
+    from nltk.corpus import stopwords
+    from nltk.stem import WordNetLemmatizer
+
+    stop_words = set(stopwords.words("english"))
+    lemmatizer = WordNetLemmatizer()
+    word_tokenize = tokenize
 
 # DATABASE_SCHEMA = {
 #     "ChatDB": {
@@ -42,8 +103,9 @@ pattern = None
 # }
 
 # Query patterns and templates
+# SQL templates per pattern; values are bound to the %s placeholders, never formatted in
 QUERY_PATTERNS = {
-    "find all <A> where <B> = <value>": "SELECT * FROM {table1} WHERE {attribute1} = '{value}'",
+    "find all <A> where <B> = <value>": "SELECT * FROM {table1} WHERE {attribute1} = %s",
     "show total <A> in <B>": "SELECT SUM({attribute1}) as total_{attribute1} FROM {table1}",
     "show average <A> by <B>": "SELECT AVG({attribute1}) AS avg_{attribute1} FROM {table1}",
     "list all <A> ordered by <B>": "SELECT {attribute1} FROM {table1} ORDER BY {attribute1} DESC",
@@ -52,9 +114,15 @@ QUERY_PATTERNS = {
     "inner join <A> and <B>": "SELECT * FROM {table1} INNER JOIN {table2} ON {table1}.{attribute1} = {table2}.{attribute2}"
 }
 
+JOIN_PATTERN = "inner join <A> and <B>"
+
+# Patterns that SUM or AVG their attribute, so it should be a measure rather than a code or id
+MEASURE_PATTERNS = ("show total <A> in <B>", "show average <A> by <B>")
+
 # Step 1: Preprocess Query
 def preprocess_query(input_query):
     """Preprocess the natural language query: tokenize, lemmatize, and remove stopwords."""
+    load_nlp_resources()
     tokens = word_tokenize(input_query.lower())
     # stop_words.remove("by")
     tokens = [lemmatizer.lemmatize(word) for word in tokens if word not in stop_words]
@@ -62,165 +130,137 @@ def preprocess_query(input_query):
 
 # Step 2: Match Query Pattern
 def match_query_pattern(tokens):
-    """Match tokens to a predefined query pattern."""
-    if "find" in tokens:
-        return "find all <A> where <B> = <value>"
-    elif "total" in tokens:
-        return "show total <A> in <B>"
-    elif "average" in tokens:
-        return "show average <A> by <B>"
-    elif "list" in tokens:
-        return "list all <A> ordered by <B>"
-    elif "many" in tokens:
-        return "show number of <A> by <B>"
-    elif "maximum" in tokens:
-        return "find max <A>"
-    elif len(set(tokens)) > 1:
-        return "inner join <A> and <B>"
-    return None
-
-def fuzzy_match_by_substring(token, candidates):
     """
-    Match a token against a list of candidates using substring matching.
-
-    Args:
-        token (str): The token to match.
-        candidates (list): A list of candidate strings.
+    Match tokens to a predefined query pattern with the intent classifier.
 
     Returns:
-        str: The first candidate that contains the token as a substring, or None if no match is found.
+        str: The best scoring pattern, or None if no pattern is a confident match.
     """
-    token_lower = token.lower()
-    for candidate in candidates:
-        if token_lower in candidate.lower():
-            return candidate
-    return None
+    return classify(tokens)
 
-def classify_attributes(cursor, table):
-    """
-    Classify attributes of a table into categorical and numerical columns using SQL DESCRIBE.
+def rank_query_patterns(tokens, limit=3):
+    """Return the `limit` best (pattern, confidence) pairs for the tokens."""
+    return get_classifier().rank(tokens)[:limit]
 
-    Args:
-        cursor: The MySQL cursor object.
-        table (str): The table name.
-    
-    Returns:
-        dict: Dictionary with "categorical" and "numerical" keys containing lists of attributes.
-    """
-    cursor.execute(f"DESCRIBE {table}")
-    rows = cursor.fetchall()
-    categorical = []
-    numerical = []
-    for row in rows:
-        column_name = row[0]
-        data_type = row[1].lower()
-        if "int" in data_type or "float" in data_type or "double" in data_type or "decimal" in data_type:
-            numerical.append(column_name)
-        else:
-            categorical.append(column_name)
-    return {"categorical": categorical, "numerical": numerical}
+def ask_query_pattern(tokens):
+    """Ask the user to pick a pattern when the classifier is not confident."""
+    candidates = [(p, score) for p, score in rank_query_patterns(tokens) if score > 0]
+    if not candidates:
+        return None
+    print("\nI am not sure what kind of query you mean. Did you want to:")
+    for i, (candidate, score) in enumerate(candidates, 1):
+        print(f"{i}. {candidate} (confidence {score:.2f})")
+    choice = input("Select a pattern by typing the number (or press Enter to cancel): ").strip()
+    if not choice.isdigit() or int(choice) < 1 or int(choice) > len(candidates):
+        return None
+    return candidates[int(choice) - 1][0]
 
 def identify_entities(pattern, tokens, cursor, current_database):
     """
-    Identify table, attributes, and values from tokens using fuzzy matching.
+    Identify table, attributes, and values from tokens using the ranked identifier index.
     
     Args:
-        tokens (list): Tokenized input query.
-        schema (dict): The database schema.
+        pattern (str): The matched query pattern.
+        tokens (list): Tokenized input query. Tokens used for the table, attribute and value are removed.
+        cursor: The MySQL cursor object.
+        current_database (str): The database to resolve names in.
     
     Returns:
-        tuple: (table, attribute, value) if identified, otherwise None.
+        tuple: (table1, table2, attribute1, attribute2, value, joins); unresolved entries are None.
+        For the join pattern `joins` is the join path from table1 to table2 (see
+        join_graph.join_path) and the attributes are the keys of its first join.
     """
     if not current_database:
         print("No database selected.")
-        return None, None, None, None, None
+        return None, None, None, None, None, None
 
     # Set the database context
-    cursor.execute(f"USE {current_database}")
+    use_database(cursor, current_database)
 
     table1 = None
     table2 = None
     attribute1 = None
     attribute2 = None
     value = None
+    joins = None
+    attribute_token = None
     
     # Step 1: Identify table
-    cursor.execute("SHOW TABLES")
-    tables = [row[0] for row in cursor.fetchall()]
-    matched_tables = []
-
-    if pattern == "inner join <A> and <B>":
-        for token in tokens:
-            match = fuzzy_match_by_substring(token, tables)
-            if match and match not in matched_tables:
-                matched_tables.append(match)
-                # tokens.remove(token)
-            if len(matched_tables) == 2:
-                break
-
-    
-        if matched_tables:
-            table1 = matched_tables[0]
-            if len(matched_tables) > 1:
-                table2 = matched_tables[1]
-
-        # Step 2: Identify attributes
-        attributes1, attributes2 = [], []
-        if table1:
-            attributes1 = classify_attributes(cursor, table1)["categorical"] + classify_attributes(cursor, table1)["numerical"]
-        if table2:
-            attributes2 = classify_attributes(cursor, table2)["categorical"] + classify_attributes(cursor, table2)["numerical"]
-
-        for token in tokens:
-            if table1 and not attribute1:
-                match = fuzzy_match_by_substring(token, attributes1)
-                if match:
-                    attribute1 = match
-                    # tokens.remove(token)
-            if table2 and not attribute2:
-                match = fuzzy_match_by_substring(token, attributes2)
-                if match:
-                    attribute2 = match
-                    # tokens.remove(token)
-        # print("Table: ", table)
-        # print("Attribute: ", attribute)
-        # cursor.execute(f"SELECT DISTINCT {attribute} FROM {table}")
-        # Step 3: Identify value (tokens not matching table or attributes)
+    identifiers = get_identifier_index(cursor, current_database)
+
+    if pattern == JOIN_PATTERN:
+        first = identifiers.tables.best_for_tokens(tokens)
+        if first:
+            table1 = first[1]
+            remaining = [token for token in tokens if token != first[0]]
+            second = identifiers.tables.best_for_tokens(remaining, exclude=(table1,))
+            if second:
+                table2 = second[1]
+
+        # Step 2: Join keys come from the join graph (declared or verified keys), not from the wording
+        if table1 and table2:
+            joins = join_path(cursor, current_database, table1, table2)
+            if joins:
+                attribute1, attribute2 = joins[0]["from_column"], joins[0]["column"]
     else:
-        for token in tokens:
-            match = fuzzy_match_by_substring(token, tables)
-            if match:
-                table1 = match
-                tokens.remove(token)
-                break
+        match = identifiers.tables.best_for_tokens(tokens)
+        if match:
+            table1 = match[1]
+            tokens.remove(match[0])
 
     # Step 2: Identify attributes
         if table1:
-            attributes_info = classify_attributes(cursor, table1)
-            attributes = attributes_info["categorical"] + attributes_info["numerical"]
-            for token in tokens:
-                match = fuzzy_match_by_substring(token, attributes)
-                if match:
-                    attribute1 = match
-                    tokens.remove(token)
-                    break
+            columns = identifiers.columns[table1]
+            match = None
+            if pattern in MEASURE_PATTERNS:
+                measures = columns_of_kind(cursor, current_database, table1, ("measure",))
+                match = columns.best_for_tokens(tokens, exclude=[c for c in columns.identifiers if c not in measures])
+            match = match or columns.best_for_tokens(tokens)
+            if match:
+                attribute1 = match[1]
+                attribute_token = match[0]
+                tokens.remove(match[0])
         
         # Step 3: Identify value (tokens not matching table or attributes)
         if table1 and attribute1:
-            cursor.execute(f"SELECT DISTINCT {attribute1} FROM {table1}")
-            attribute_values = [str(row[0]).lower() for row in cursor.fetchall()]
             for token in tokens:
-                if token.lower() in attribute_values:
+                if value_exists(cursor, current_database, table1, attribute1, token):
                     value = token
                     tokens.remove(token)
                     break
 
-    return table1, table2, attribute1, attribute2, value
+        # The named column does not hold any of the tokens: probe only the columns
+        # whose statistics admit a token, and take the column the value is found in.
+        # The token matched as a column name may itself be the value ("delivered").
+        if table1 and value is None and "<value>" in pattern:
+            for token in tokens + ([attribute_token] if attribute_token else []):
+                column = next((column for column in value_columns(cursor, current_database, table1, token)
+                               if value_exists(cursor, current_database, table1, column, token)), None)
+                if column:
+                    attribute1, value = column, token
+                    if token in tokens:
+                        tokens.remove(token)
+                    break
+
+    return table1, table2, attribute1, attribute2, value, joins
 # Step 3: Generate SQL Query
-def generate_sql_query_from_nl(pattern, table1, table2, attribute1, attribute2, value):
-    """Generate SQL query based on the matched pattern."""
+def generate_sql_query_from_nl(pattern, table1, table2, attribute1, attribute2, value, joins=None):
+    """
+    Generate a parameterized SQL query based on the matched pattern.
+
+    Args:
+        joins (list, optional): Join path from join_graph.join_path for the join pattern;
+            paths through other tables (customers -> orders -> payments) need it.
+
+    Returns:
+        tuple: (sql, params). Identifiers are part of `sql`; the value is bound to
+        its %s placeholder through `params`. `sql` is None for an unknown pattern.
+    """
     if pattern not in QUERY_PATTERNS:
-        return None
+        return None, ()
+
+    if pattern == JOIN_PATTERN and joins:
+        return join_sql(table1, joins), ()
 
     sql_template = QUERY_PATTERNS[pattern]
     # table_schema = schema["ChatDB"]["tables"][table]
@@ -228,7 +268,8 @@ def generate_sql_query_from_nl(pattern, table1, table2, attribute1, attribute2,
     # numerical = table_schema["numerical"]
 
     # sql_template = QUERY_PATTERNS[pattern]
-    return sql_template.format(table1=table1, table2=table2, attribute1=attribute1, attribute2=attribute2, value=value)
+    sql = sql_template.format(table1=table1, table2=table2, attribute1=attribute1, attribute2=attribute2)
+    return sql, ((value,) if "%s" in sql_template else ())
     # Dynamically populate placeholders based on the pattern
     # if pattern == "find all <A> where <B> = <value>":
     #     field = categorical[0]  # Default field for simplicity
@@ -249,6 +290,97 @@ def generate_sql_query_from_nl(pattern, table1, table2, attribute1, attribute2,
 
 
 
+def translate_tokens(cursor, tokens, current_database, pattern=None, interactive=True, save_cache=True):
+    """
+    Translate preprocessed tokens into SQL, using the translation cache.
+
+    Args:
+        cursor: The MySQL cursor object.
+        tokens (list): Output of preprocess_query.
+        current_database (str): The database to query.
+        pattern (str, optional): Pattern already chosen for the tokens (e.g. by a batch classifier).
+        interactive (bool): Ask the user to choose a pattern when the classifier is unsure.
+        save_cache (bool): Persist the cache after storing a new translation.
+
+    Returns:
+        tuple: (entry, error). `entry` is the cache entry ('sql', its 'params', 'pattern'
+        and the entities) or None, in which case `error` says why translation failed.
+    """
+    tokens = list(tokens)
+    key_tokens = tuple(tokens)
+
+    schema_version = catalog.version(cursor, current_database)
+    cached = translation_cache.get(key_tokens, current_database, schema_version)
+    if cached:
+        tracing.current_span().set(cached=True)
+        return cached, None
+
+    # Match Query Pattern
+    if not pattern:
+        with tracing.span("match_query_pattern"):
+            pattern = match_query_pattern(tokens)
+    if not pattern and interactive:
+        pattern = ask_query_pattern(tokens)
+    if not pattern:
+        return None, "Could not match your query to any known patterns."
+
+    # Identify Entities (table, attribute, value)
+    with tracing.span("identify_entities"):
+        table1, table2, attribute1, attribute2, value, joins = identify_entities(pattern, tokens, cursor, current_database)
+    if not table1 or not attribute1:
+        return None, "Could not identify all necessary entities for query construction."
+
+    # Generate SQL Query
+    with tracing.span("generate_sql"):
+        sql_query, params = generate_sql_query_from_nl(pattern, table1, table2, attribute1, attribute2, value, joins)
+    if not sql_query:
+        return None, "Failed to generate a valid SQL query."
+
+    entry = {
+        "sql": sql_query,
+        "params": list(params),
+        "pattern": pattern,
+        "table1": table1,
+        "table2": table2,
+        "attribute1": attribute1,
+        "attribute2": attribute2,
+        "value": value
+    }
+    translation_cache.put(key_tokens, current_database, schema_version, entry, save=save_cache)
+    return entry, None
+
+
+def translate_nl_query(cursor, user_query, current_database, interactive=True):
+    """
+    Translate a natural language question into SQL.
+
+    Repeated questions are answered from the translation cache: the same wording
+    skips NLTK preprocessing, and the same tokens for the same database and schema
+    version skip pattern matching and entity resolution.
+
+    Args:
+        cursor: The MySQL cursor object.
+        user_query (str): The question as typed by the user.
+        current_database (str): The database to query.
+        interactive (bool): Ask the user to choose a pattern when the classifier is unsure.
+
+    Returns:
+        tuple: (sql, params) of the generated query, or None if it could not be translated.
+    """
+    tokens = translation_cache.get_tokens(user_query)
+    if tokens is None:
+        with tracing.span("preprocess_query"):
+            tokens = preprocess_query(user_query)
+        translation_cache.put_tokens(user_query, tokens)
+
+    entry, error = translate_tokens(cursor, tokens, current_database, interactive=interactive)
+    if entry is None:
+        print(f"\n{error}")
+        return None
+    return entry["sql"], tuple(entry.get("params") or ())
+
+
+
 # Step 4: Execute Natural Language Query
 # def execute_nl_query(cursor, schema, current_database):
 #     """Process and execute a natural language query."""
@@ -0,0 +1,234 @@
+import os
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import approximate
+import index_advisor
+import rollups
+from db_connection import current_database
+
+# Rows read per fetchmany() call when streaming
+FETCH_BATCH_SIZE = 1000
+# Rows that may be drained after a preview before the query is cancelled instead
+DRAIN_LIMIT = 10000
+# Seconds a query run by run_queries may take before it is cancelled
+QUERY_TIMEOUT = float(os.environ.get("CHATDB_QUERY_TIMEOUT", "30"))
+
+_TRAILING_LIMIT = re.compile(r"\blimit\s+\d+(\s*(,|offset)\s*\d+)?\s*;?\s*$", re.IGNORECASE)
+_NO_PUSHDOWN = re.compile(
+    r"\binto\s+(outfile|dumpfile|@)|\bfor\s+(update|share)\b|\block\s+in\s+share\s+mode\b|\bprocedure\b",
+    re.IGNORECASE
+)
+
+
+def push_down_limit(sql, limit):
+    """
+    Append `LIMIT limit` to a SELECT statement when it is safe to do so.
+
+    Args:
+        sql (str): The query to rewrite.
+        limit (int): Number of rows the caller will display.
+
+    Returns:
+        str: The rewritten query, or None if the limit cannot be pushed down
+        (not a SELECT, already limited, or a locking/INTO statement).
+    """
+    stripped = sql.strip().rstrip(";").rstrip()
+    if not stripped.lower().startswith("select"):
+        return None
+    if _TRAILING_LIMIT.search(stripped) or _NO_PUSHDOWN.search(stripped):
+        return None
+    return f"{stripped} LIMIT {int(limit)}"
+
+
+def iter_rows(cursor, batch_size=FETCH_BATCH_SIZE):
+    """Yield the rows of the cursor's current result set, `batch_size` rows at a time."""
+    while True:
+        batch = cursor.fetchmany(batch_size)
+        if not batch:
+            return
+        yield from batch
+
+
+def close_result(cursor, drain_limit=DRAIN_LIMIT):
+    """
+    Finish an unbuffered result set without holding the rest of it in memory.
+
+    Up to `drain_limit` remaining rows are read and discarded. Past that, the
+    query is cancelled with `KILL QUERY` when the cursor belongs to a pooled
+    session, so the server stops sending rows.
+    """
+    drained = 0
+    while drained < drain_limit:
+        batch = cursor.fetchmany(FETCH_BATCH_SIZE)
+        if not batch:
+            break
+        drained += len(batch)
+    else:
+        session = getattr(cursor, "session", None)
+        if session is not None and session.cancel():
+            try:
+                while cursor.fetchmany(FETCH_BATCH_SIZE):
+                    pass
+            except Exception:
+                pass  # The cancelled statement reports "Query execution was interrupted"
+            cursor.reset()
+            return
+        for _ in iter_rows(cursor):
+            pass
+
+    try:
+        while cursor.nextset():
+            pass
+    except Exception:
+        pass
+
+
+def _columnar(rows, columnar):
+    if not columnar:
+        return rows
+    from result_set import ColumnarResult
+    return ColumnarResult.from_rows(rows)
+
+
+def fetch_preview(cursor, sql, limit, params=None, columnar=False):
+    """
+    Execute a query and return only the first `limit` rows.
+
+    Aggregates that match the rollup store are answered from it when rollups
+    are enabled, and from the table's random sample when the cursor's session
+    is in approximate mode. Otherwise the limit is pushed into the SQL when possible, or
+    the rows are streamed with fetchmany() and the rest of the result is
+    drained or cancelled, so client memory does not grow with the size of the table.
+    Parameterized queries on a pooled session go through its prepared-statement cache.
+    With `columnar`, rows are converted batch by batch into typed column arrays
+    (see result_set.py) instead of being kept as tuples.
+
+    Args:
+        cursor: MySQL cursor object for executing queries.
+        sql (str): The query to execute.
+        limit (int): Maximum number of rows to return.
+        params (tuple, optional): Query parameters for the %s placeholders in `sql`.
+        columnar (bool): Return a result_set.ColumnarResult instead of a list.
+
+    Returns:
+        list: Up to `limit` result rows (a ColumnarResult with `columnar`).
+    """
+    if rollups.enabled and not params:
+        rows = rollups.answer(cursor, sql, current_database(cursor))
+        if rows is not None:
+            return _columnar(rows[:limit], columnar)
+    session = getattr(cursor, "session", None)
+    if session is not None and session.approximate and not params:
+        rows = approximate.answer(cursor, sql, current_database(cursor))
+        if rows is not None:
+            return _columnar(rows[:limit], columnar)
+
+    index_advisor.record(cursor, sql, params, current_database(cursor))
+    operation = push_down_limit(sql, limit) or sql
+    if params and session is not None:
+        cursor = session.execute_prepared(operation, tuple(params))
+    else:
+        cursor.execute(operation, tuple(params) if params else None)
+    if cursor.description is None:
+        return _columnar([], columnar)
+    if columnar:
+        from result_set import ColumnarResult
+        rows = ColumnarResult.from_cursor(cursor, limit, FETCH_BATCH_SIZE)
+    else:
+        rows = cursor.fetchmany(limit)
+    close_result(cursor)
+    return rows
+
+
+def run_queries(cursor, queries, limit, timeout=QUERY_TIMEOUT, database=None, columnar=False):
+    """
+    Run several queries at once and yield each result as soon as it is ready.
+
+    Every query runs on its own pooled session in `database` (default: the
+    cursor's current database). A query still running `timeout` seconds after it started is
+    cancelled (`KILL QUERY` on MySQL) and reported as timed out; its connection
+    is then closed instead of returned to the pool. Two pool connections are
+    left free: one for the caller and one to send the cancel.
+    Cursors that do not belong to a session run the queries one after another.
+
+    Args:
+        cursor: Cursor of the caller's session.
+        queries (list): Dicts with an 'sql' key, e.g. from query_generator.
+        limit (int): Maximum number of rows returned per query.
+        timeout (float): Per-query time limit in seconds.
+        database (str, optional): The database to run the queries in.
+        columnar (bool): Return each result as a result_set.ColumnarResult.
+
+    Yields:
+        tuple: (position in `queries`, rows or None, error message or None, seconds).
+    """
+    session = getattr(cursor, "session", None)
+    if session is None:
+        for position, query in enumerate(queries):
+            start = time.perf_counter()
+            try:
+                yield position, fetch_preview(cursor, query["sql"], limit, columnar=columnar), None, time.perf_counter() - start
+            except Exception as e:
+                yield position, None, str(e), time.perf_counter() - start
+        return
+
+    pool = session.pool
+    database = database or current_database(cursor)
+    # position -> (session, its connection, start time) while the query runs
+    running = {}
+    # Positions a cancel was sent for; like `running`, only read or changed under `lock`
+    cancelled = set()
+    lock = threading.Lock()
+
+    def run(position, sql):
+        worker = pool.session(database)
+        worker.approximate = session.approximate
+        start = time.perf_counter()
+        with lock:
+            running[position] = (worker, worker.connection, time.monotonic())
+        try:
+            with worker.cursor() as worker_cursor:
+                rows = fetch_preview(worker_cursor, sql, limit, columnar=columnar)
+            return rows, time.perf_counter() - start
+        finally:
+            with lock:
+                running.pop(position, None)
+                cancel_sent = position in cancelled
+            # A cancel can arrive after the query ended on its own; the connection must not
+            # be handed to another session, whose statement it would abort instead
+            worker.close(discard=cancel_sent)
+
+    executor = ThreadPoolExecutor(max(1, min(len(queries), pool.size - 2)))
+    futures = {executor.submit(run, position, query["sql"]): position for position, query in enumerate(queries)}
+    pending = set(futures)
+    try:
+        while pending:
+            with lock:
+                deadlines = [started + timeout for position, (_, _, started) in running.items() if position not in cancelled]
+            wait_for = max(0.0, min(deadlines) - time.monotonic()) if deadlines else 0.05
+            done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+            for future in done:
+                position = futures[future]
+                try:
+                    rows, seconds = future.result()
+                    yield position, rows, None, seconds
+                except Exception as e:
+                    with lock:
+                        timed_out = position in cancelled
+                    error = f"Timed out after {timeout:g}s and was cancelled." if timed_out else str(e)
+                    yield position, None, error, None
+
+            now = time.monotonic()
+            # Marked under the lock, so a worker finishing now either is not cancelled or discards its connection
+            with lock:
+                overrun = [position for position, (_, _, started) in running.items()
+                           if position not in cancelled and now - started >= timeout]
+                cancelled.update(overrun)
+                targets = [running[position][:2] for position in overrun]
+            for worker, connection in targets:
+                worker.cancel(connection)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,209 @@
+import datetime
+from decimal import Decimal
+
+import numpy as np
+
+# Rows converted per batch when building from a cursor
+BATCH_SIZE = 1000
+
+# Variable-width UTF-8 strings packed in one buffer (NumPy 2); older NumPy keeps str objects
+try:
+    _STRING_DTYPE = np.dtypes.StringDType()
+except AttributeError:
+    _STRING_DTYPE = np.dtype(object)
+
+# Placeholder stored under NULLs, so typed columns need no sentinel values
+_FILL = {"int": 0, "float": 0.0, "datetime": datetime.datetime(1970, 1, 1), "date": datetime.date(1970, 1, 1), "str": ""}
+_DTYPES = {"int": np.dtype(np.int64), "float": np.dtype(np.float64), "datetime": np.dtype("datetime64[us]"),
+           "date": np.dtype("datetime64[D]"), "str": _STRING_DTYPE, "decimal": np.dtype(object),
+           "object": np.dtype(object)}
+
+
+def _kind(values):
+    """Storage kind of a batch of non-null column values."""
+    types = {type(value) for value in values}
+    if not types:
+        return None
+    if types == {int}:
+        return "int"
+    if types <= {int, Decimal}:
+        return "decimal"
+    if types <= {int, float}:
+        return "float"
+    if types == {datetime.datetime}:
+        return "datetime"
+    if types == {datetime.date}:
+        return "date"
+    if types == {str}:
+        return "str"
+    return "object"
+
+
+def _common_kind(kinds):
+    kinds = set(kinds) - {None}
+    if not kinds:
+        return "object"
+    if len(kinds) == 1:
+        return kinds.pop()
+    if kinds == {"int", "float"}:
+        return "float"
+    if kinds == {"int", "decimal"}:
+        return "decimal"
+    return "object"
+
+
+class _ColumnBuilder:
+    """Collects one column batch by batch as typed arrays plus a NULL mask."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def add(self, values):
+        mask = np.fromiter((value is None for value in values), dtype=bool, count=len(values))
+        kind = _kind([value for value in values if value is not None])
+        if kind is None:
+            self.chunks.append((None, None, mask))
+            return
+        if kind in _FILL:
+            filled = [_FILL[kind] if value is None else value for value in values]
+            try:
+                self.chunks.append((kind, np.array(filled, dtype=_DTYPES[kind]), mask))
+                return
+            except (OverflowError, ValueError):
+                kind = "object"  # e.g. BIGINT UNSIGNED values past int64
+        if kind == "decimal":
+            values = [Decimal(value) if type(value) is int else value for value in values]
+        array = np.empty(len(values), dtype=object)
+        array[:] = values
+        self.chunks.append((kind, array, mask))
+
+    def finish(self):
+        kind = _common_kind(chunk_kind for chunk_kind, _, _ in self.chunks)
+        dtype = _DTYPES[kind]
+        arrays = []
+        for chunk_kind, array, mask in self.chunks:
+            if array is None:
+                array = np.full(len(mask), _FILL.get(kind), dtype=dtype) if kind in _FILL else np.full(len(mask), None, dtype=object)
+            elif kind == "decimal" and chunk_kind == "int":
+                array = np.array([Decimal(value) for value in array.tolist()], dtype=object)
+            elif array.dtype != dtype:
+                array = array.astype(dtype)
+            arrays.append(array)
+        masks = [mask for _, _, mask in self.chunks]
+        if not arrays:
+            return np.empty(0, dtype=dtype), np.empty(0, dtype=bool)
+        return np.concatenate(arrays), np.concatenate(masks)
+
+
+class ColumnarResult:
+    """
+    A query result stored column by column: one typed NumPy array per column
+    (int64, float64, datetime64, packed strings, Decimal objects, or objects for anything else)
+    plus a boolean NULL mask, instead of a Python tuple per row and object per cell.
+
+    Iterating yields row tuples of plain Python values (NULL as None), so it can
+    stand in for the row lists of fetch_preview. DECIMAL columns keep their
+    values exact, as an object array of Decimal.
+    """
+
+    def __init__(self, names, arrays, masks):
+        self.names = list(names)
+        self.arrays = arrays
+        self.masks = masks
+
+    @classmethod
+    def from_cursor(cls, cursor, limit=None, batch_size=BATCH_SIZE):
+        """
+        Read the cursor's current result set (at most `limit` rows) with fetchmany(),
+        converting each batch into the column arrays as it arrives.
+        """
+        names = [desc[0] for desc in cursor.description]
+        builders = [_ColumnBuilder() for _ in names]
+        read = 0
+        while limit is None or read < limit:
+            size = batch_size if limit is None else min(batch_size, limit - read)
+            batch = cursor.fetchmany(size)
+            if not batch:
+                break
+            read += len(batch)
+            for builder, values in zip(builders, zip(*batch)):
+                builder.add(values)
+        return cls._finish(names, builders)
+
+    @classmethod
+    def from_rows(cls, rows, names=None):
+        """Build from a list of row tuples (e.g. rollup or approximate answers)."""
+        rows = list(rows)
+        width = len(names) if names is not None else (len(rows[0]) if rows else 0)
+        names = names if names is not None else [f"column_{i + 1}" for i in range(width)]
+        builders = [_ColumnBuilder() for _ in names]
+        for start in range(0, len(rows), BATCH_SIZE):
+            batch = rows[start:start + BATCH_SIZE]
+            for builder, values in zip(builders, zip(*batch)):
+                builder.add(values)
+        return cls._finish(names, builders)
+
+    @classmethod
+    def _finish(cls, names, builders):
+        arrays, masks = [], []
+        for builder in builders:
+            array, mask = builder.finish()
+            arrays.append(array)
+            masks.append(mask)
+        return cls(names, arrays, masks)
+
+    def __len__(self):
+        return len(self.arrays[0]) if self.arrays else 0
+
+    def __iter__(self):
+        columns = []
+        for array, mask in zip(self.arrays, self.masks):
+            values = array.tolist()
+            if mask.any():
+                values = [None if null else value for value, null in zip(values, mask.tolist())]
+            columns.append(values)
+        return iter(zip(*columns))
+
+    def __getitem__(self, key):
+        """Rows `key` as a new result (slices) or one row tuple (integers)."""
+        if isinstance(key, slice):
+            return ColumnarResult(self.names, [array[key] for array in self.arrays], [mask[key] for mask in self.masks])
+        return tuple(None if mask[key] else array[[key]].tolist()[0] for array, mask in zip(self.arrays, self.masks))
+
+    def column(self, name):
+        """Return (values array, NULL mask) of a column."""
+        position = self.names.index(name)
+        return self.arrays[position], self.masks[position]
+
+    @property
+    def nbytes(self):
+        """Client memory held by the arrays and masks (for packed string columns, their fixed-size slots)."""
+        return sum(array.nbytes + mask.nbytes for array, mask in zip(self.arrays, self.masks))
+
+    def to_pandas(self):
+        """
+        Return a DataFrame over the same buffers. Numeric and date columns
+        without NULLs are shared as they are, and nullable ints and floats
+        become masked pandas arrays that share them too. String and object
+        columns are converted.
+        """
+        import pandas as pd
+
+        # Keyed by position: joins can return the same column name twice
+        data = {}
+        for position, (array, mask) in enumerate(zip(self.arrays, self.masks)):
+            has_nulls = bool(mask.any())
+            if array.dtype == np.int64 and has_nulls:
+                data[position] = pd.arrays.IntegerArray(array, mask)
+            elif array.dtype == np.float64 and has_nulls:
+                data[position] = pd.arrays.FloatingArray(array, mask)
+            elif array.dtype.kind in "ifM" and not has_nulls:
+                data[position] = array
+            else:
+                values = array.astype(object)
+                if has_nulls:
+                    values[mask] = None
+                data[position] = values
+        frame = pd.DataFrame(data, copy=False)
+        frame.columns = self.names
+        return frame
@@ -0,0 +1,358 @@
+import datetime
+import json
+import os
+import re
+import tempfile
+import threading
+from decimal import Decimal
+
+from schema_catalog import NUMERICAL_TYPE_MARKERS, catalog
+
+# Answer matching aggregate queries from rollups; toggled with enable() or CHATDB_ROLLUPS=1
+enabled = os.environ.get("CHATDB_ROLLUPS", "0") == "1"
+# Directory holding one rollup file per (database, table, group column)
+ROLLUP_DIR = os.environ.get(
+    "CHATDB_ROLLUP_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".chatdb_rollups")
+)
+# Group columns with more distinct values than this are not rolled up
+MAX_ROLLUP_GROUPS = int(os.environ.get("CHATDB_ROLLUP_MAX_GROUPS", "10000"))
+
+# Aggregates of the shape produced by query_generator and sample_queries_3:
+#   SELECT [g,] SUM|AVG|COUNT|MIN|MAX(col|*) [AS alias] FROM t [GROUP BY g [HAVING COUNT(*) > n]]
+_AGGREGATE_QUERY = re.compile(
+    r"^\s*select\s+(?:`?(?P<select_group>\w+)`?\s*,\s*)?"
+    r"(?P<function>sum|avg|count|min|max)\s*\(\s*(?P<column>\*|`?\w+`?)\s*\)(?:\s+as\s+\w+)?\s+"
+    r"from\s+`?(?P<table>\w+)`?"
+    r"(?:\s+group\s+by\s+`?(?P<group>\w+)`?"
+    r"(?:\s+having\s+count\s*\(\s*\*\s*\)\s*>\s*(?P<having>\d+))?)?"
+    r"\s*;?\s*$",
+    re.IGNORECASE
+)
+
+# (database, table, group column or None) -> {group key: stats}, or None when over MAX_ROLLUP_GROUPS
+_rollups = {}
+_lock = threading.Lock()
+
+
+def enable(on=True):
+    """Turn answering from rollups on or off for this process."""
+    global enabled
+    enabled = on
+
+
+def _file_name(group):
+    """File name (without .json) of a rollup: `all` for the whole table, `by_<column>` per group column."""
+    return "all" if group is None else f"by_{group}"
+
+
+def _group_of(file_name):
+    """Inverse of _file_name; raises KeyError for files that are not rollups."""
+    if file_name == "all":
+        return None
+    if file_name.startswith("by_"):
+        return file_name[len("by_"):]
+    raise KeyError(file_name)
+
+
+def _rollup_path(database, table, group):
+    return os.path.join(ROLLUP_DIR, database, table, f"{_file_name(group)}.json")
+
+
+def _key(value):
+    """
+    Group key for a column value; values that JSON cannot hold are keyed by their text.
+    DECIMALs are keyed as floats, so 3, 3.0 and Decimal('3.00') fall into one group.
+    """
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, bytes):
+        return value.decode("utf-8", "replace")
+    return str(value)
+
+
+def _number(value):
+    """Numeric value of a field for SUM, or None for NULL / non-numeric input."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        return float(value) if isinstance(value, (str, Decimal)) else None
+    except ValueError:
+        return None
+
+
+def _typed(value, column_type):
+    """
+    Convert a value typed by the user (always text) to what the database stores
+    in a column of `column_type`, so '3' and 3 fall into the same group and sum alike.
+    """
+    if not isinstance(value, str) or not any(marker in column_type.lower() for marker in NUMERICAL_TYPE_MARKERS):
+        return value
+    try:
+        return int(value) if "int" in column_type.lower() else float(value)
+    except ValueError:
+        try:
+            return float(value)
+        except ValueError:
+            return value
+
+
+def _typed_rows(entry, rows):
+    return [{column: _typed(value, entry["types"].get(column, "")) for column, value in row.items()} for row in rows]
+
+
+def _sum(value, column_type):
+    """A SUM from the database as stored: int for integer columns (MySQL returns DECIMAL), float otherwise."""
+    if value is None:
+        return 0
+    return int(value) if "int" in column_type.lower() else float(value)
+
+
+def _new_stats(columns, numerical):
+    return {"rows": 0, "counts": dict.fromkeys(columns, 0), "sums": dict.fromkeys(numerical, 0)}
+
+
+def _save(database, table, group, groups):
+    path = _rollup_path(database, table, group)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f"{_file_name(group)}.", suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump({
+            "overflow": groups is None,
+            "groups": [] if groups is None else [[key, stats] for key, stats in groups.items()]
+        }, f)
+    os.replace(tmp_path, path)
+
+
+def build_rollup(cursor, database, table, group=None):
+    """
+    Precompute COUNT(*), COUNT(col) and SUM(numerical col) per value of `group`
+    (or for the whole table when `group` is None) and persist them.
+
+    Only `MAX_ROLLUP_GROUPS + 1` groups are ever fetched; a group column with
+    more values is marked as overflowed and its queries go to the database.
+
+    Args:
+        cursor: MySQL cursor object, already using `database`.
+        database (str): The database name.
+        table (str): The table name.
+        group (str, optional): The GROUP BY column.
+
+    Returns:
+        dict: Group key -> stats, or None if the column has too many groups.
+    """
+    entry = catalog.get_table(cursor, table, database)
+    columns, numerical = entry["columns"], entry["numerical"]
+    expressions = ["COUNT(*)"] + [f"COUNT(`{c}`)" for c in columns] + [f"SUM(`{c}`)" for c in numerical]
+    if group:
+        cursor.execute(f"SELECT `{group}`, {', '.join(expressions)} FROM `{table}` GROUP BY `{group}` "
+                       f"LIMIT {MAX_ROLLUP_GROUPS + 1}")
+    else:
+        cursor.execute(f"SELECT NULL, {', '.join(expressions)} FROM `{table}`")
+    rows = cursor.fetchall()
+
+    groups = None
+    if len(rows) <= MAX_ROLLUP_GROUPS:
+        groups = {}
+        for row in rows:
+            stats = _new_stats(columns, numerical)
+            stats["rows"] = row[1]
+            stats["counts"] = dict(zip(columns, row[2:2 + len(columns)]))
+            stats["sums"] = {c: _sum(v, entry["types"].get(c, "")) for c, v in zip(numerical, row[2 + len(columns):])}
+            groups[_key(row[0])] = stats
+
+    _save(database, table, group, groups)
+    with _lock:
+        _rollups[(database, table, group)] = groups
+    return groups
+
+
+def load_rollup(cursor, database, table, group=None):
+    """Return a rollup from memory or disk, building it on first use."""
+    key = (database, table, group)
+    with _lock:
+        if key in _rollups:
+            return _rollups[key]
+
+    path = _rollup_path(database, table, group)
+    if os.path.exists(path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            groups = None if data["overflow"] else {group_key: stats for group_key, stats in data["groups"]}
+            with _lock:
+                _rollups[key] = groups
+            return groups
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error reading rollup for {table}.{group}, rebuilding: {e}")
+
+    return build_rollup(cursor, database, table, group)
+
+
+def parse_aggregate(cursor, sql, database):
+    """
+    Recognize a single-aggregate query and resolve its names against the catalog.
+
+    Returns:
+        dict: 'function' (sum/avg/count/min/max), 'column' (a column name or '*'),
+        'table', 'group' (column or None), 'having' (int or None) and the table's
+        catalog 'entry'; None if the query has another shape or names unknown columns.
+    """
+    match = _AGGREGATE_QUERY.match(sql)
+    if not match or not database:
+        return None
+    group, select_group = match.group("group"), match.group("select_group")
+    if (group or "").lower() != (select_group or "").lower():
+        return None
+
+    table = match.group("table")
+    entry = catalog.get_table(cursor, table, database)
+    if not entry:
+        return None
+    columns = {c.lower(): c for c in entry["columns"]}
+    function = match.group("function").lower()
+    column = match.group("column").strip("`")
+    if column != "*":
+        column = columns.get(column.lower())
+        if column is None or (function in ("sum", "avg") and column not in entry["numerical"]):
+            return None
+    elif function != "count":
+        return None
+    if group:
+        group = columns.get(group.lower())
+        if group is None:
+            return None
+
+    return {
+        "function": function,
+        "column": column,
+        "table": table,
+        "group": group,
+        "having": int(match.group("having")) if match.group("having") else None,
+        "entry": entry
+    }
+
+
+def answer(cursor, sql, database):
+    """
+    Answer a generated aggregate query from the rollup store.
+
+    Supports SUM, AVG and COUNT over one column (or COUNT(*)), optionally
+    grouped by one column and filtered with `HAVING COUNT(*) > n`.
+
+    Returns:
+        list: Result rows, or None if the query does not match a rollup and must run on the database.
+    """
+    query = parse_aggregate(cursor, sql, database)
+    if query is None or query["function"] not in ("sum", "avg", "count"):
+        return None
+    function, column, table, group = query["function"], query["column"], query["table"], query["group"]
+
+    groups = load_rollup(cursor, database, table, group)
+    if groups is None:
+        return None
+
+    having = query["having"]
+    rows = []
+    for group_key, stats in groups.items():
+        if having is not None and stats["rows"] <= having:
+            continue
+        if function == "count":
+            value = stats["rows"] if column == "*" else stats["counts"][column]
+        elif stats["counts"][column] == 0:
+            value = None
+        elif function == "sum":
+            value = stats["sums"][column]
+        else:
+            value = stats["sums"][column] / stats["counts"][column]
+        rows.append((group_key, value) if group else (value,))
+    if not group and not rows:
+        rows.append((0,) if function == "count" else (None,))
+    return rows
+
+
+def has_rollups(database, table):
+    """Return True if any rollup of the table is loaded or stored on disk."""
+    with _lock:
+        if any(key[0] == database and key[1] == table for key in _rollups):
+            return True
+    path = os.path.join(ROLLUP_DIR, database, table)
+    return os.path.isdir(path) and any(name.endswith(".json") for name in os.listdir(path))
+
+
+def select_rows(cursor, table, condition, params=None):
+    """Fetch the rows a WHERE condition matches, as column -> value dicts (captured before an UPDATE/DELETE)."""
+    cursor.execute(f"SELECT * FROM {table} WHERE {condition}", params)
+    columns = [desc[0] for desc in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def apply_changes(cursor, database, table, removed=(), added=()):
+    """
+    Update every rollup of a table for rows removed from and added to it.
+
+    An UPDATE is a removal of the old rows plus an addition of the new ones.
+    Rows are column -> value dicts; missing columns count as NULL. Values typed
+    by the user are converted to their column's type first.
+    """
+    if not has_rollups(database, table):
+        return
+    entry = catalog.get_table(cursor, table, database)
+    columns, numerical = entry["columns"], entry["numerical"]
+    removed, added = _typed_rows(entry, removed), _typed_rows(entry, added)
+
+    path = os.path.join(ROLLUP_DIR, database, table)
+    groups_on_disk = [name[:-len(".json")] for name in os.listdir(path) if name.endswith(".json")] \
+        if os.path.isdir(path) else []
+    for name in groups_on_disk:
+        try:
+            group = _group_of(name)
+        except KeyError:
+            continue
+        groups = load_rollup(cursor, database, table, group)
+        if groups is None:
+            continue
+        with _lock:
+            for sign, rows in ((-1, removed), (1, added)):
+                for row in rows:
+                    group_key = _key(row.get(group)) if group else None
+                    stats = groups.setdefault(group_key, _new_stats(columns, numerical))
+                    stats["rows"] += sign
+                    for column in columns:
+                        # COUNT(column) skips NULL only; an empty string is a value
+                        if row.get(column) is not None:
+                            stats["counts"][column] += sign
+                    for column in numerical:
+                        value = _number(row.get(column))
+                        if value is not None:
+                            stats["sums"][column] += sign * value
+                    if stats["rows"] <= 0:
+                        del groups[group_key]
+            overflow = len(groups) > MAX_ROLLUP_GROUPS
+            if overflow:
+                _rollups[(database, table, group)] = None
+        _save(database, table, group, None if overflow else groups)
+
+
+def invalidate_rollups(database, table=None):
+    """Drop the rollups of a table (or a whole database) so they are rebuilt on next use."""
+    with _lock:
+        for key in list(_rollups):
+            if key[0] == database and (table is None or key[1] == table):
+                del _rollups[key]
+
+    path = os.path.join(ROLLUP_DIR, database) if table is None else os.path.join(ROLLUP_DIR, database, table)
+    if not os.path.isdir(path):
+        return
+    for root, _, files in os.walk(path):
+        for name in files:
+            if name.endswith(".json"):
+                os.remove(os.path.join(root, name))
+
+
+# Schema changes (CREATE/DROP through db_operation) make stored rollups meaningless
+catalog.add_listener(invalidate_rollups)
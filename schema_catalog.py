@@ -0,0 +1,251 @@
+import hashlib
+import os
+import threading
+import time
+
+from backends import INTERNAL_TABLE_PREFIX, as_text
+from db_connection import current_database, get_backend_for
+
+# Seconds a loaded database schema stays valid before it is reloaded
+SCHEMA_TTL = float(os.environ.get("CHATDB_SCHEMA_TTL", "300"))
+# Seconds the table directory is served from memory before the server is asked what changed
+DIRECTORY_TTL = float(os.environ.get("CHATDB_DIRECTORY_TTL", "30"))
+
+# Substrings of a column type that mark it as numerical ("real" and "numeric" come from SQLite)
+NUMERICAL_TYPE_MARKERS = ("int", "float", "double", "decimal", "real", "numeric")
+
+
+def _new_table_entry():
+    return {
+        "columns": [],
+        "types": {},
+        "keys": {},
+        "primary_key": [],
+        "describe": [],
+        "categorical": [],
+        "numerical": []
+    }
+
+
+def _add_column(entry, column, column_type, nullable, key, default, extra):
+    """Append a column to a table entry, classifying it as categorical or numerical."""
+    entry["columns"].append(column)
+    entry["types"][column] = column_type
+    entry["keys"][column] = key
+    if key == "PRI":
+        entry["primary_key"].append(column)
+    # Same shape as a DESCRIBE row: Field, Type, Null, Key, Default, Extra
+    entry["describe"].append((column, column_type, nullable, key, default, extra))
+    if any(marker in column_type.lower() for marker in NUMERICAL_TYPE_MARKERS):
+        entry["numerical"].append(column)
+    else:
+        entry["categorical"].append(column)
+
+
+class SchemaCatalog:
+    """
+    In-process cache of table schemas, loaded one database at a time from
+    the backend (`information_schema.COLUMNS` on MySQL) and reloaded after `ttl` seconds or on invalidation.
+    Safe to share between threads (batch mode resolves questions concurrently).
+    """
+
+    def __init__(self, ttl=SCHEMA_TTL):
+        self.ttl = ttl
+        self._databases = {}
+        self._listeners = []
+        # Reentrant: get_tables and version call get_table while holding it
+        self._lock = threading.RLock()
+
+    def _fetch(self, cursor, database, table=None):
+        """Read column metadata for a whole database (or a single table) in one round trip."""
+        tables = {}
+        for row in get_backend_for(cursor).fetch_columns(cursor, database, table):
+            table_name, column, column_type, nullable, key, default, extra = [as_text(v) for v in row]
+            entry = tables.setdefault(table_name, _new_table_entry())
+            _add_column(entry, column, column_type, nullable, key, default, extra)
+        return tables
+
+    def load_database(self, cursor, database):
+        """Load (or reload) every table schema of a database."""
+        with self._lock:
+            self._databases[database] = {
+                "loaded_at": time.monotonic(),
+                "tables": self._fetch(cursor, database),
+                "stale": set(),
+                "version": None
+            }
+            return self._databases[database]
+
+    def _database(self, cursor, database):
+        with self._lock:
+            cached = self._databases.get(database)
+            if cached is None or time.monotonic() - cached["loaded_at"] > self.ttl:
+                cached = self.load_database(cursor, database)
+            return cached
+
+    def get_tables(self, cursor, database):
+        """Return the names of the tables in a database."""
+        with self._lock:
+            cached = self._database(cursor, database)
+            for table in list(cached["stale"]):
+                self.get_table(cursor, table, database)
+            return list(cached["tables"])
+
+    def get_table(self, cursor, table, database=None):
+        """
+        Return the cached schema entry of a table.
+
+        Args:
+            cursor: MySQL cursor object.
+            table (str): The table name.
+            database (str, optional): The database name. Defaults to the cursor's current database.
+
+        Returns:
+            dict: Keys 'columns', 'types', 'keys', 'primary_key', 'describe', 'categorical'
+            and 'numerical', or None if the table does not exist.
+        """
+        if database is None:
+            database = current_database(cursor)
+        with self._lock:
+            cached = self._database(cursor, database)
+
+            if table in cached["stale"]:
+                cached["stale"].discard(table)
+                cached["tables"].pop(table, None)
+                cached["tables"].update(self._fetch(cursor, database, table))
+                cached["version"] = None
+
+            return cached["tables"].get(table)
+
+    def version(self, cursor, database):
+        """
+        Return a fingerprint of a database's schema.
+
+        The fingerprint only changes when a table or column definition changes,
+        so it can be used in cache keys that must not outlive the schema.
+        """
+        with self._lock:
+            self.get_tables(cursor, database)
+            cached = self._databases[database]
+            if cached["version"] is None:
+                digest = hashlib.sha1()
+                for table in sorted(cached["tables"]):
+                    digest.update(table.encode("utf-8"))
+                    digest.update(repr(cached["tables"][table]["describe"]).encode("utf-8"))
+                cached["version"] = digest.hexdigest()[:16]
+            return cached["version"]
+
+    def add_listener(self, callback):
+        """Register `callback(database, table)` to be called whenever an entry is invalidated."""
+        self._listeners.append(callback)
+
+    def invalidate(self, database, table=None):
+        """
+        Drop cached schema information so it is reloaded on next use.
+
+        Args:
+            database (str): The database name.
+            table (str, optional): The table name. If omitted, the whole database is dropped.
+        """
+        with self._lock:
+            if table is None:
+                self._databases.pop(database, None)
+            elif database in self._databases:
+                self._databases[database]["stale"].add(table)
+        for callback in self._listeners:
+            callback(database, table)
+
+
+# Shared catalog used by nlp_usage, db_operation and main
+catalog = SchemaCatalog()
+
+
+class TableDirectory:
+    """
+    In-process list of every database on the server with its tables, row-count
+    estimates and sizes, loaded in one query (`information_schema.TABLES` on MySQL).
+
+    Menus are served from memory. After `ttl` seconds one summary query
+    (table count and latest CREATE_TIME/UPDATE_TIME per database) finds the
+    databases that changed, and only those are reloaded. Changes made through
+    ChatDB reach it as invalidations and are reloaded on next use. A lock makes
+    it safe to share between threads (e.g. batch mode's sessions).
+    """
+
+    def __init__(self, ttl=DIRECTORY_TTL):
+        self.ttl = ttl
+        self._databases = None
+        self._fingerprints = {}
+        self._checked_at = 0.0
+        self._dirty = set()
+        self._lock = threading.RLock()
+
+    def _fetch(self, cursor, databases=None):
+        """Read database -> {table: info} for the whole server (or `databases`) in one round trip."""
+        loaded = {}
+        for database, table, rows, size, created, updated in get_backend_for(cursor).fetch_table_directory(cursor, databases):
+            tables = loaded.setdefault(database, {})
+            if table is not None and not table.startswith(INTERNAL_TABLE_PREFIX):
+                tables[table] = {
+                    "rows": int(rows) if rows is not None else None,
+                    "size": int(size) if size is not None else None,
+                    "created": created,
+                    "updated": updated
+                }
+        return loaded
+
+    def _refresh(self, cursor):
+        """Bring the directory up to date (called with the lock held)."""
+        now = time.monotonic()
+        if self._databases is not None and not self._dirty and now - self._checked_at <= self.ttl:
+            return
+        backend = get_backend_for(cursor)
+        fingerprints = backend.directory_fingerprints(cursor)
+        if self._databases is None:
+            self._databases = self._fetch(cursor)
+        else:
+            changed = [database for database, fingerprint in fingerprints.items()
+                       if self._fingerprints.get(database) != fingerprint or database in self._dirty]
+            for database in set(self._databases) - set(fingerprints):
+                del self._databases[database]
+            if changed:
+                self._databases.update(self._fetch(cursor, changed))
+        self._fingerprints = fingerprints
+        self._dirty.clear()
+        self._checked_at = now
+
+    def databases(self, cursor):
+        """Return the names of the user databases, sorted."""
+        with self._lock:
+            self._refresh(cursor)
+            return sorted(self._databases)
+
+    def tables(self, cursor, database):
+        """Return the names of the tables of a database, sorted (empty for an unknown database)."""
+        with self._lock:
+            self._refresh(cursor)
+            return sorted(self._databases.get(database, {}))
+
+    def table_info(self, cursor, database, table):
+        """
+        Return what the directory knows about a table.
+
+        Returns:
+            dict: 'rows' (an estimate: InnoDB's on MySQL, the last ANALYZE's on SQLite),
+            'size' (data and index bytes), 'created' and 'updated'; values the engine
+            does not track or has not measured are None.
+            None if the table does not exist.
+        """
+        with self._lock:
+            self._refresh(cursor)
+            return self._databases.get(database, {}).get(table)
+
+    def invalidate(self, database, table=None):
+        """Reload a database's tables on next use (also picks up a newly created database or changed row counts)."""
+        with self._lock:
+            self._dirty.add(database)
+
+
+# Shared directory used by the menus; schema changes made through ChatDB mark their database for reload
+directory = TableDirectory()
+catalog.add_listener(directory.invalidate)
@@ -0,0 +1,48 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def sqlite_session(tmp_path, monkeypatch):
+    """
+    A session on an empty SQLite database named `test`, with every ChatDB
+    store (rollups, samples, value indexes, statistics, join graphs, upload and bulk change checkpoints, query workload) kept under tmp_path.
+    """
+    import approximate
+    import bulk_mutation
+    import column_stats
+    import index_advisor
+    import ingest
+    import join_graph
+    import rollups
+    import value_index
+    from backends import SQLiteBackend
+    from db_connection import ConnectionPool, Session
+    from schema_catalog import catalog
+
+    monkeypatch.setattr(rollups, "ROLLUP_DIR", str(tmp_path / "rollups"))
+    monkeypatch.setattr(approximate, "SAMPLE_DIR", str(tmp_path / "samples"))
+    monkeypatch.setattr(value_index, "INDEX_DIR", str(tmp_path / "index"))
+    monkeypatch.setattr(column_stats, "STATS_DIR", str(tmp_path / "stats"))
+    monkeypatch.setattr(join_graph, "JOIN_GRAPH_DIR", str(tmp_path / "joins"))
+    monkeypatch.setattr(ingest, "INGEST_DIR", str(tmp_path / "ingest"))
+    monkeypatch.setattr(bulk_mutation, "BULK_DIR", str(tmp_path / "bulk"))
+    monkeypatch.setattr(index_advisor, "WORKLOAD_PATH", str(tmp_path / "workload.json"))
+    monkeypatch.setattr(index_advisor, "_workload", {})
+    monkeypatch.setattr(index_advisor, "_by_count", {})
+    monkeypatch.setattr(index_advisor, "_loaded", False)
+    (tmp_path / "db").mkdir()
+    sqlite3.connect(tmp_path / "db" / "test.sqlite").close()
+
+    session = Session(ConnectionPool(backend=SQLiteBackend(str(tmp_path / "db"))), "test")
+    yield session
+    # In-memory caches outlive the test's directories
+    catalog.invalidate("test")
+    value_index.invalidate_value_index("test")
+    rollups.invalidate_rollups("test")
+    session.close()
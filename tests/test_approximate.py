@@ -0,0 +1,63 @@
+import math
+
+import pytest
+
+import approximate
+
+
+def test_count_and_sum_are_horvitz_thompson_estimates():
+    count = approximate._estimate("count", 0.1, 50, 0.0, 0.0, None)
+    assert count == pytest.approx(500)
+    assert count.margin == pytest.approx(approximate.Z * math.sqrt(0.9 / 0.01 * 50))
+
+    total = approximate._estimate("sum", 0.1, 50, 200.0, 1000.0, None)
+    assert total == pytest.approx(2000)
+    assert total.margin == pytest.approx(approximate.Z * math.sqrt(0.9 / 0.01 * 1000))
+
+
+def test_average_margin_uses_the_sample_variance_with_finite_population_correction():
+    # Sample 1, 2, 3, 4: mean 2.5, sample variance 5/3
+    average = approximate._estimate("avg", 0.5, 4, 10.0, 30.0, None)
+    assert average == pytest.approx(2.5)
+    assert average.margin == pytest.approx(approximate.Z * math.sqrt(5 / 3 / 4 * 0.5))
+    assert approximate._estimate("avg", 0.5, 1, 3.0, 9.0, None).margin is None
+    assert approximate._estimate("sum", 0.5, 0, 0.0, 0.0, None) is None
+
+
+def test_full_sample_is_exact_and_extremes_have_no_interval():
+    assert approximate._estimate("count", 1.0, 7, 0.0, 0.0, None).margin == 0
+    maximum = approximate._estimate("max", 0.2, 5, 0.0, 0.0, 9.0)
+    assert maximum == 9.0 and maximum.margin is None
+
+
+def _large_table(session, monkeypatch, rows=2000):
+    monkeypatch.setattr(approximate, "SAMPLE_ROWS", rows // 4)
+    cursor = session.cursor()
+    cursor.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, `order` INTEGER)")
+    cursor.executemany("INSERT INTO t VALUES (%s, %s)", [(i, i % 10) for i in range(1, rows + 1)])
+    session.commit()
+    return cursor
+
+
+def test_count_is_scaled_from_the_sample(sqlite_session, monkeypatch):
+    cursor = _large_table(sqlite_session, monkeypatch)
+    info = approximate.build_sample(cursor, "test", "t")
+    assert info["fraction"] == 0.25
+
+    [(estimate,)] = approximate.answer(cursor, "SELECT COUNT(*) FROM t", "test")
+    assert estimate == pytest.approx(info["sample_rows"] / 0.25)
+    assert estimate.margin > 0
+
+
+def test_sample_follows_updates_and_deletes(sqlite_session, monkeypatch):
+    cursor = _large_table(sqlite_session, monkeypatch)
+    approximate.build_sample(cursor, "test", "t")
+    sample = approximate.sample_table_name("t")
+
+    approximate.sample_apply(cursor, "test", "t", "id <= %s", (1000,))
+    approximate.sample_apply(cursor, "test", "t", "id > %s", (1500,), "order", 42)
+    cursor.execute(f"SELECT MIN(id), COUNT(*) FROM `{sample}` WHERE `order` = 42")
+    first, updated = cursor.fetchone()
+    cursor.execute(f"SELECT COUNT(*) FROM `{sample}` WHERE id <= 1000 OR (id > 1500 AND `order` <> 42)")
+    assert cursor.fetchone()[0] == 0
+    assert updated == 0 or first > 1500
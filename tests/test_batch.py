@@ -0,0 +1,24 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import batch
+
+
+def test_questions_are_streamed_a_few_chunks_ahead(monkeypatch):
+    monkeypatch.setattr(batch, "analyze_questions", lambda questions: [(q.split(), None) for q in questions])
+    read = []
+
+    def questions():
+        for number in range(1, 101):
+            read.append(number)
+            yield {"id": number, "question": f"question {number}", "database": "test"}
+
+    with ThreadPoolExecutor(2) as workers:
+        analyzed = batch._analyzed_chunks(workers, batch._chunks(questions(), 10), 2)
+        chunk, analyses = next(analyzed)
+        assert [item["id"] for item in chunk] == list(range(1, 11))
+        assert analyses[0] == (["question", "1"], None)
+        # The first chunk plus the two kept ahead, not the whole file
+        assert len(read) <= 30
+
+        rest = list(analyzed)
+    assert [item["id"] for chunk, _ in rest for item in chunk] == list(range(11, 101))
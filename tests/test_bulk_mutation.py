@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+import bulk_mutation
+from bulk_mutation import bulk_mutate, key_ranges
+
+
+def _orders(session, rows=10):
+    cursor = session.cursor()
+    cursor.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, store INTEGER, status TEXT)")
+    cursor.executemany("INSERT INTO orders VALUES (%s, %s, %s)", [(i, i % 2, "new") for i in range(1, rows + 1)])
+    session.commit()
+    return cursor
+
+
+def test_key_ranges_cut_matching_keys_into_batches(sqlite_session):
+    cursor = _orders(sqlite_session)
+    assert key_ranges(cursor, "orders", ["id"], "`store` = %s", (1,), batch_size=2) == [
+        [[1], [3], 2], [[5], [7], 2], [[9], [9], 1]]
+    assert key_ranges(cursor, "orders", ["id"], "`id` > %s", (10,), batch_size=2) == []
+
+
+def test_key_ranges_with_a_composite_key(sqlite_session):
+    cursor = sqlite_session.cursor()
+    cursor.execute("CREATE TABLE items (a INTEGER, b INTEGER, PRIMARY KEY (a, b))")
+    cursor.executemany("INSERT INTO items VALUES (%s, %s)", [(a, b) for a in (2, 1) for b in (2, 1)])
+    assert key_ranges(cursor, "items", ["a", "b"], "1 = 1", batch_size=3) == [[[1, 1], [2, 1], 3], [[2, 2], [2, 2], 1]]
+
+
+class _FailingCommits:
+    """A session whose commits fail from the `fail_at`-th on, as if the process were interrupted."""
+
+    def __init__(self, session, fail_at):
+        self.session, self.fail_at, self.commits = session, fail_at, 0
+
+    def commit(self):
+        self.commits += 1
+        if self.commits >= self.fail_at:
+            raise KeyboardInterrupt
+        self.session.commit()
+
+    def rollback(self):
+        self.session.rollback()
+
+
+def test_interrupted_update_resumes_with_the_next_batch(sqlite_session):
+    cursor = _orders(sqlite_session)
+    change = ("`store` = %s", (0,), "status", "shipped")
+    with pytest.raises(KeyboardInterrupt):
+        bulk_mutate(cursor, _FailingCommits(sqlite_session, 3), "test", "orders", *change, batch_size=2, throttle=0)
+    assert bulk_mutation.has_bulk_checkpoint("test", "orders", *change)
+    cursor.execute("SELECT id FROM orders WHERE status = 'shipped' ORDER BY id")
+    assert cursor.fetchall() == [(2,), (4,), (6,), (8,)]
+
+    stats = bulk_mutate(cursor, sqlite_session, "test", "orders", *change, batch_size=2, throttle=0)
+    assert (stats["rows"], stats["batches"], stats["resumed"], stats["changed"]) == (5, 3, 2, 5)
+    cursor.execute("SELECT id FROM orders WHERE status = 'shipped' ORDER BY id")
+    assert cursor.fetchall() == [(2,), (4,), (6,), (8,), (10,)]
+    assert os.listdir(bulk_mutation.BULK_DIR) == []
@@ -0,0 +1,49 @@
+import builtins
+
+import column_stats
+from db_operation import insert_record
+
+
+def test_estimate_distinct_scales_up_samples():
+    assert column_stats._estimate_distinct(10, 0, 100, 1000) == 10
+    assert column_stats._estimate_distinct(100, 100, 100, 1000) == 1000
+    assert column_stats._estimate_distinct(5, 2, 0, 1000) == 0
+
+
+def test_inserted_value_is_probed(sqlite_session, monkeypatch):
+    cursor = sqlite_session.cursor()
+    cursor.execute("CREATE TABLE customers (id INTEGER PRIMARY KEY, city TEXT)")
+    cursor.executemany("INSERT INTO customers VALUES (%s, %s)", [(i, f"city{i % 5}") for i in range(1, 51)])
+    sqlite_session.commit()
+    assert column_stats.value_columns(cursor, "test", "customers", "zurich") == []
+
+    answers = iter(["51", "zurich"])
+    monkeypatch.setattr(builtins, "input", lambda *args: next(answers))
+    insert_record(cursor, sqlite_session, "customers", "test")
+
+    assert column_stats.value_columns(cursor, "test", "customers", "zurich") == ["city"]
+
+
+def _collections(monkeypatch):
+    calls = []
+    build = column_stats.build_table_stats
+    monkeypatch.setattr(column_stats, "build_table_stats", lambda *args: calls.append(args[2]) or build(*args))
+    return calls
+
+
+def test_small_changes_widen_the_range_without_recollecting(sqlite_session, monkeypatch):
+    cursor = sqlite_session.cursor()
+    cursor.execute("CREATE TABLE payments (id INTEGER PRIMARY KEY, amount REAL)")
+    cursor.executemany("INSERT INTO payments VALUES (%s, %s)", [(i, i * 1.5) for i in range(1, 101)])
+    sqlite_session.commit()
+    calls = _collections(monkeypatch)
+    assert column_stats.get_table_stats(cursor, "test", "payments")["columns"]["amount"]["max"] == 150.0
+
+    column_stats.note_changes("test", "payments", 5, [{"id": 101, "amount": "999.5"}])
+    stats = column_stats.get_table_stats(cursor, "test", "payments")
+    assert (stats["changed"], stats["columns"]["amount"]["max"]) == (5, 999.5)
+    assert calls == ["payments"]
+
+    column_stats.note_changes("test", "payments", 6)
+    assert column_stats.get_table_stats(cursor, "test", "payments")["changed"] == 0
+    assert calls == ["payments", "payments"]
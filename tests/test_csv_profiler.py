@@ -0,0 +1,50 @@
+from csv_profiler import ColumnProfile, profile_csv
+
+
+def _profile(values):
+    profile = ColumnProfile("column")
+    for value in values:
+        profile.add(value)
+    return profile
+
+
+def test_long_text_is_text_with_or_without_headroom():
+    profile = _profile(["x" * 300])
+    assert profile.sql_type(exact=True) == "TEXT"
+    assert profile.sql_type(exact=False) == "TEXT"
+
+
+def test_sampled_varchar_gets_headroom_up_to_text():
+    profile = _profile(["a" * 100, "b" * 90])
+    assert profile.sql_type(exact=True) == "VARCHAR(100)"
+    assert profile.sql_type(exact=False) == "VARCHAR(200)"
+    assert _profile(["a" * 200, "b"]).sql_type(exact=False) == "TEXT"
+
+
+def test_fixed_width_is_char_only_when_exact():
+    profile = _profile(["ab12", "cd34"])
+    assert profile.sql_type(exact=True) == "CHAR(4)"
+    assert profile.sql_type(exact=False) == "VARCHAR(8)"
+
+
+def test_exponent_then_plain_decimal_is_double():
+    assert _profile(["1e5", "1.5"]).sql_type() == "DOUBLE"
+    assert _profile(["1.5", "2.5e-3", ".5"]).sql_type() == "DOUBLE"
+    assert _profile(["1.5", "2.25"]).sql_type() == "DECIMAL(3,2)"
+
+
+def test_leading_zeros_stay_text():
+    assert _profile(["01234", "98765"]).sql_type() == "CHAR(5)"
+
+
+def test_profile_csv_sampled(tmp_path):
+    path = tmp_path / "data.csv"
+    path.write_text("id,name\n" + "".join(f"{i},n{i % 7}\n" for i in range(1, 51)), encoding="utf-8")
+    exact = profile_csv(str(path))
+    assert exact["exact"] and exact["rows"] == 50
+    assert exact["columns"] == [("id", "INT"), ("name", "CHAR(2)")]
+    assert exact["primary_key_candidates"] == ["id"]
+
+    sampled = profile_csv(str(path), sample_rows=10, chunk_size=4)
+    assert not sampled["exact"] and sampled["rows"] == 10
+    assert sampled["columns"] == [("id", "INT"), ("name", "VARCHAR(4)")]
@@ -0,0 +1,36 @@
+import db_connection
+from query_executor import fetch_preview
+
+
+def _numbers(session):
+    cursor = session.cursor()
+    cursor.execute("CREATE TABLE numbers (n INTEGER)")
+    cursor.executemany("INSERT INTO numbers VALUES (%s)", [(n,) for n in range(10)])
+    session.commit()
+    return cursor
+
+
+def test_repeated_statement_reuses_its_prepared_cursor(sqlite_session):
+    _numbers(sqlite_session)
+    first = sqlite_session.execute_prepared("SELECT n FROM numbers WHERE n < %s", (3,))
+    assert first.fetchall() == [(0,), (1,), (2,)]
+    again = sqlite_session.execute_prepared("SELECT n FROM numbers WHERE n < %s", (2,))
+    assert again is first
+    assert again.fetchall() == [(0,), (1,)]
+
+
+def test_least_recently_used_statements_are_evicted(sqlite_session, monkeypatch):
+    monkeypatch.setattr(db_connection, "PREPARED_CACHE_SIZE", 2)
+    _numbers(sqlite_session)
+    statements = [f"SELECT n FROM numbers WHERE n = %s AND {i} = {i}" for i in range(3)]
+    cursors = [sqlite_session.execute_prepared(statement, (i,)) for i, statement in enumerate(statements)]
+
+    assert list(sqlite_session._prepared) == statements[1:]
+    assert sqlite_session.execute_prepared(statements[0], (0,)) is not cursors[0]
+    assert sqlite_session.execute_prepared(statements[2], (2,)).fetchall() == [(2,)]
+
+
+def test_parameterized_preview_goes_through_the_cache(sqlite_session):
+    cursor = _numbers(sqlite_session)
+    assert fetch_preview(cursor, "SELECT n FROM numbers WHERE n >= %s", 2, params=[5]) == [(5,), (6,)]
+    assert list(sqlite_session._prepared) == ["SELECT n FROM numbers WHERE n >= %s LIMIT 2"]
@@ -0,0 +1,48 @@
+import builtins
+from decimal import Decimal
+
+import pytest
+
+from db_operation import delete_record, parameterize_condition
+
+COLUMNS = ["id", "city", "price"]
+
+
+def test_comparisons_become_placeholders():
+    assert parameterize_condition("id=1", COLUMNS) == ("`id` = %s", (1,))
+    assert parameterize_condition("ID >= -2 and City = 'sao ''paulo''' AND `price` < 9.50", COLUMNS) == (
+        "`id` >= %s AND `city` = %s AND `price` < %s", (-2, "sao 'paulo'", Decimal("9.50")))
+    assert parameterize_condition('city <> "a ""b"""', COLUMNS) == ("`city` <> %s", ('a "b"',))
+
+
+@pytest.mark.parametrize("condition", [
+    "",
+    "id = 1 OR 1 = 1",
+    "id IN (1, 2)",
+    "city LIKE 'cur%'",
+    "id = 1; DROP TABLE orders",
+    "id = (SELECT MAX(id) FROM orders)",
+    "id = 1 AND",
+])
+def test_conditions_that_would_be_spliced_are_refused(condition):
+    with pytest.raises(ValueError):
+        parameterize_condition(condition, COLUMNS)
+
+
+def test_unknown_column_is_refused():
+    with pytest.raises(ValueError, match="unknown column 'name'"):
+        parameterize_condition("name = 'x'", COLUMNS)
+
+
+def test_refused_condition_changes_nothing(sqlite_session, monkeypatch, capsys):
+    cursor = sqlite_session.cursor()
+    cursor.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, city TEXT)")
+    cursor.executemany("INSERT INTO orders VALUES (%s, %s)", [(1, "a"), (2, "b")])
+    sqlite_session.commit()
+    answers = iter(["id = 1 OR 1 = 1", "single"])
+    monkeypatch.setattr(builtins, "input", lambda *args: next(answers))
+
+    delete_record(cursor, sqlite_session, "orders")
+    assert "Cannot use this condition" in capsys.readouterr().out
+    cursor.execute("SELECT COUNT(*) FROM orders")
+    assert cursor.fetchone()[0] == 2
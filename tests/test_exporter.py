@@ -0,0 +1,61 @@
+import csv
+import datetime
+from decimal import Decimal
+
+import pytest
+
+from exporter import _ParquetWriter, export_format, export_query
+
+
+def _sparse_table(session, rows=30):
+    cursor = session.cursor()
+    cursor.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, delivered TEXT, amount REAL)")
+    # Nothing delivered in the first chunk of an export with chunk_rows=10
+    cursor.executemany("INSERT INTO orders VALUES (%s, %s, %s)",
+                       [(i, f"2018-01-{i - 9:02d}" if i > 10 else None, i * 1.5) for i in range(1, rows + 1)])
+    session.commit()
+    return cursor
+
+
+def test_export_format_from_name():
+    assert export_format("out.csv.gz") == ("csv", "gzip")
+    assert export_format("out.ndjson") == ("jsonl", None)
+    assert export_format("out.parquet") == ("parquet", None)
+    with pytest.raises(ValueError):
+        export_format("out.txt")
+
+
+def test_csv_export(sqlite_session, tmp_path):
+    cursor = _sparse_table(sqlite_session)
+    path = str(tmp_path / "orders.csv")
+    stats = export_query(cursor, "SELECT * FROM orders ORDER BY id", path, chunk_rows=10)
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    assert stats["rows"] == 30 and len(rows) == 31
+    assert rows[1] == ["1", "", "1.5"]
+
+
+def test_parquet_column_null_in_first_chunk(sqlite_session, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    cursor = _sparse_table(sqlite_session)
+    path = str(tmp_path / "orders.parquet")
+    export_query(cursor, "SELECT * FROM orders ORDER BY id", path, chunk_rows=10)
+    table = pq.read_table(path)
+    assert table.num_rows == 30
+    assert table.column("delivered").to_pylist()[9:12] == [None, "2018-01-02", "2018-01-03"]
+
+
+def test_parquet_keeps_decimals_exact(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = str(tmp_path / "payments.parquet")
+    writer = _ParquetWriter(path, None)
+    writer.open(["amount", "paid_at"], [246, 12])
+    writer.write([(Decimal("10.05"), None), (None, None)])
+    writer.write([(Decimal("0.10"), datetime.datetime(2018, 1, 2, 3, 4, 5))])
+    writer.close()
+
+    table = pq.read_table(path)
+    assert table.schema.field("amount").type == pa.decimal128(38, 2)
+    assert table.schema.field("paid_at").type == pa.timestamp("us")
+    assert table.column("amount").to_pylist() == [Decimal("10.05"), None, Decimal("0.10")]
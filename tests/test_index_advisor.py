@@ -0,0 +1,59 @@
+import os
+
+import index_advisor
+from index_advisor import index_columns
+
+COLUMNS = ["id", "city", "state", "price"]
+
+
+def test_index_columns_put_equalities_before_one_range_or_order_column():
+    assert index_columns("SELECT * FROM t WHERE city = %s AND price > %s", COLUMNS) == ("city", "price")
+    assert index_columns("SELECT * FROM t WHERE `State` IN ('a') ORDER BY price", COLUMNS) == ("state", "price")
+    assert index_columns("SELECT city, COUNT(*) FROM t GROUP BY city", COLUMNS) == ("city",)
+    assert index_columns("SELECT * FROM t WHERE price < 3 AND id > 2", COLUMNS) == ("price",)
+    assert index_columns("SELECT * FROM t WHERE nope = 1", COLUMNS) == ()
+    assert index_columns("SELECT * FROM t JOIN u ON t.id = u.id WHERE city = 'x'", COLUMNS) == ()
+    assert index_columns("SELECT * FROM t", COLUMNS) == ()
+
+
+def _orders(session):
+    cursor = session.cursor()
+    cursor.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, city TEXT, price INTEGER)")
+    cursor.executemany("INSERT INTO orders VALUES (%s, %s, %s)", [(i, f"c{i % 5}", i) for i in range(1, 101)])
+    session.commit()
+    return cursor
+
+
+def test_recommend_skips_covered_shapes_and_ranks_by_use(sqlite_session):
+    cursor = _orders(sqlite_session)
+    for _ in range(3):
+        index_advisor.record(cursor, "SELECT * FROM orders WHERE city = %s", ("c1",), "test")
+    index_advisor.record(cursor, "SELECT * FROM orders ORDER BY price", None, "test")
+    index_advisor.record(cursor, "SELECT * FROM orders WHERE id = 3", None, "test")
+
+    recommendations = index_advisor.recommend(cursor, "test")
+    assert [(r["columns"], r["count"]) for r in recommendations] == [(("city",), 3), (("price",), 1)]
+    assert "full table scan" in recommendations[0]["reasons"]
+    assert "sort outside an index" in recommendations[1]["reasons"]
+
+    index_advisor.create_recommended_index(cursor, "test", recommendations[0])
+    assert [r["columns"] for r in index_advisor.recommend(cursor, "test")] == [("price",)]
+
+
+def test_least_used_shape_is_evicted_and_the_log_survives_a_restart(sqlite_session, monkeypatch):
+    cursor = _orders(sqlite_session)
+    monkeypatch.setattr(index_advisor, "MAX_WORKLOAD_SHAPES", 2)
+    for sql in ("SELECT * FROM orders WHERE city = 'a'", "SELECT * FROM orders WHERE city = 'b'",
+                "SELECT * FROM orders WHERE price > 1", "SELECT * FROM orders ORDER BY id"):
+        index_advisor.record(cursor, sql, None, "test")
+    # city has two uses; price and then id came in with one each, so price (the older) went first
+    assert sorted(key[2] for key in index_advisor._workload) == [("city",), ("id",)]
+
+    index_advisor.save()
+    assert not [name for name in os.listdir(os.path.dirname(index_advisor.WORKLOAD_PATH)) if name.endswith(".tmp")]
+    monkeypatch.setattr(index_advisor, "_workload", {})
+    monkeypatch.setattr(index_advisor, "_by_count", {})
+    monkeypatch.setattr(index_advisor, "_loaded", False)
+    index_advisor.record(cursor, "SELECT * FROM orders WHERE state_missing = 1 ORDER BY price", None, "test")
+    assert sorted((key[2], shape["count"]) for key, shape in index_advisor._workload.items()) == [
+        (("city",), 2), (("price",), 1)]
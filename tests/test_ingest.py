@@ -0,0 +1,96 @@
+import builtins
+import threading
+
+import ingest
+from db_connection import ConnectionPool
+from db_operation import upload_dataset
+
+
+def _write_csv(path, rows):
+    path.write_text("id,name\n" + "".join(f"{i},{name}\n" for i, name in rows), encoding="utf-8")
+    return str(path)
+
+
+def _people(session):
+    cursor = session.cursor()
+    cursor.execute("CREATE TABLE people (id INTEGER PRIMARY KEY, name TEXT)")
+    session.commit()
+    return cursor
+
+
+def test_failed_quarantine_does_not_stall_the_upload(sqlite_session, tmp_path, monkeypatch):
+    _people(sqlite_session)
+    # Every chunk fails (ids are not integers) and no quarantine file can be written
+    path = _write_csv(tmp_path / "people.csv", [(f"x{i}", "a") for i in range(40)])
+
+    def unwritable(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(ingest.csv, "writer", unwritable)
+    pool = ConnectionPool(backend=sqlite_session.pool.backend, size=3)
+
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(
+        ingest.ingest_csv(pool, "test", "people", path, chunk_size=2, workers=2, use_load_data=False)), daemon=True)
+    thread.start()
+    thread.join(30)
+    pool.close()
+    assert not thread.is_alive()
+    assert result["rows"] == 0
+
+
+def test_restart_empties_the_table_instead_of_duplicating(sqlite_session, tmp_path, monkeypatch):
+    cursor = _people(sqlite_session)
+    path = _write_csv(tmp_path / "people.csv", [(i, f"n{i}") for i in range(1, 11)])
+    # An interrupted upload that committed its first chunk
+    cursor.executemany("INSERT INTO people VALUES (%s, %s)", [(i, f"n{i}") for i in range(1, 6)])
+    sqlite_session.commit()
+    ingest._save_checkpoint(ingest._checkpoint_path("test", "people", path),
+                            {"chunk_size": 5, "completed": [0], "quarantined": {}})
+
+    answers = iter([path, "restart", "yes"])
+    monkeypatch.setattr(builtins, "input", lambda *args: next(answers))
+    upload_dataset(cursor, sqlite_session, "people")
+
+    cursor.execute("SELECT COUNT(*), COUNT(DISTINCT id) FROM people")
+    assert cursor.fetchone() == (10, 10)
+    assert not ingest.has_checkpoint("test", "people", path)
+
+
+def test_resume_skips_loaded_chunks(sqlite_session, tmp_path, monkeypatch):
+    cursor = _people(sqlite_session)
+    path = _write_csv(tmp_path / "people.csv", [(i, f"n{i}") for i in range(1, 11)])
+    cursor.executemany("INSERT INTO people VALUES (%s, %s)", [(i, f"n{i}") for i in range(1, 6)])
+    sqlite_session.commit()
+    ingest._save_checkpoint(ingest._checkpoint_path("test", "people", path),
+                            {"chunk_size": 5, "completed": [0], "quarantined": {}})
+
+    answers = iter([path, ""])
+    monkeypatch.setattr(builtins, "input", lambda *args: next(answers))
+    upload_dataset(cursor, sqlite_session, "people")
+
+    cursor.execute("SELECT COUNT(*), COUNT(DISTINCT id) FROM people")
+    assert cursor.fetchone() == (10, 10)
+
+
+def test_resume_after_a_crash_between_commit_and_checkpoint(sqlite_session, tmp_path):
+    cursor = _people(sqlite_session)
+    path = _write_csv(tmp_path / "people.csv", [(i, f"n{i}") for i in range(1, 11)])
+    # The first chunk was committed with its progress row, then the process died before the checkpoint file was updated
+    checkpoint_path = ingest._checkpoint_path("test", "people", path)
+    ingest._save_checkpoint(checkpoint_path, {"chunk_size": 5, "completed": [], "quarantined": {}})
+    ingest._committed_chunks(cursor, sqlite_session, ingest._upload_key(checkpoint_path), resuming=False)
+    cursor.executemany("INSERT INTO people VALUES (%s, %s)", [(i, f"n{i}") for i in range(1, 6)])
+    cursor.execute(f"INSERT INTO {ingest.PROGRESS_TABLE} VALUES (%s, %s)", (ingest._upload_key(checkpoint_path), 0))
+    sqlite_session.commit()
+
+    pool = ConnectionPool(backend=sqlite_session.pool.backend, size=3)
+    stats = ingest.ingest_csv(pool, "test", "people", path, chunk_size=5, workers=2, use_load_data=False)
+    pool.close()
+
+    assert stats["rows"] == 5 and stats["quarantined"] == []
+    cursor.execute("SELECT COUNT(*), COUNT(DISTINCT id) FROM people")
+    assert cursor.fetchone() == (10, 10)
+    cursor.execute(f"SELECT COUNT(*) FROM {ingest.PROGRESS_TABLE}")
+    assert cursor.fetchone() == (0,)
+    assert not ingest.has_checkpoint("test", "people", path)
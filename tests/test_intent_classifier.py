@@ -0,0 +1,31 @@
+from intent_classifier import PATTERN_EXAMPLES, classify, classify_batch, get_classifier
+
+JOIN_PATTERN = "inner join <A> and <B>"
+
+
+def test_schema_nouns_do_not_pick_a_pattern():
+    assert classify(["show", "order"]) != JOIN_PATTERN
+    assert classify(["customer", "city", "curitiba"]) is None
+    assert all(score == 0 for _, score in get_classifier().rank(["customer", "order", "payment", "value"]))
+
+
+def test_intent_words_pick_the_pattern():
+    questions = {
+        ("find", "order", "status", "delivered"): "find all <A> where <B> = <value>",
+        ("total", "payment", "value"): "show total <A> in <B>",
+        ("average", "payment", "installment"): "show average <A> by <B>",
+        ("list", "customer", "ordered", "city"): "list all <A> ordered by <B>",
+        ("many", "order", "status"): "show number of <A> by <B>",
+        ("highest", "payment", "value"): "find max <A>",
+        ("join", "customer", "order"): JOIN_PATTERN,
+    }
+    assert classify_batch([list(tokens) for tokens in questions]) == list(questions.values())
+
+
+def test_examples_share_no_words_across_patterns_except_generic_ones():
+    words = {}
+    for pattern, examples in PATTERN_EXAMPLES.items():
+        for example in examples:
+            for word in example.split():
+                words.setdefault(word, set()).add(pattern)
+    assert {word for word, patterns in words.items() if len(patterns) > 1} <= {"record"}
@@ -0,0 +1,83 @@
+import join_graph
+import nlp_usage
+from nl_cache import TranslationCache
+
+
+def _create(session, statements, rows=()):
+    cursor = session.cursor()
+    for statement in statements:
+        cursor.execute(statement)
+    for table, values in rows:
+        cursor.executemany(f"INSERT INTO {table} VALUES ({', '.join(['%s'] * len(values[0]))})", values)
+    session.commit()
+    return cursor
+
+
+def _shop(session):
+    return _create(session, [
+        "CREATE TABLE customers (customer_id INTEGER PRIMARY KEY, city TEXT)",
+        "CREATE TABLE orders (order_id INTEGER PRIMARY KEY, customer_id INTEGER REFERENCES customers (customer_id))",
+        "CREATE TABLE payments (payment_id INTEGER PRIMARY KEY, order_id INTEGER, amount REAL)",
+    ], [
+        ("customers", [(i, f"c{i}") for i in range(1, 11)]),
+        ("orders", [(i, i % 10 + 1) for i in range(1, 31)]),
+        ("payments", [(i, i % 30 + 1, 1.5 * i) for i in range(1, 61)]),
+    ])
+
+
+def test_declared_and_verified_keys_become_edges(sqlite_session):
+    cursor = _shop(sqlite_session)
+    edges = {(edge["left"], edge["left_column"], edge["right"], edge["right_column"]): edge["source"]
+             for edge in join_graph.build_graph(cursor, "test")["edges"]}
+    assert edges == {
+        ("orders", "customer_id", "customers", "customer_id"): "foreign key",
+        ("payments", "order_id", "orders", "order_id"): "guessed",
+    }
+    assert [(step["from_table"], step["table"]) for step in join_graph.join_path(cursor, "test", "customers", "payments")] == [
+        ("customers", "orders"), ("orders", "payments")]
+
+
+def test_guessed_key_without_matching_values_is_dropped(sqlite_session):
+    cursor = _shop(sqlite_session)
+    cursor.execute("UPDATE payments SET order_id = order_id + 1000 WHERE payment_id > 20")
+    sqlite_session.commit()
+    edges = join_graph.build_graph(cursor, "test")["edges"]
+    assert [(edge["left"], edge["right"]) for edge in edges] == [("orders", "customers")]
+    assert join_graph.join_path(cursor, "test", "customers", "payments") is None
+
+
+def _chain(session, tables, extra=()):
+    statements = ["CREATE TABLE t0 (id INTEGER PRIMARY KEY)"]
+    statements += [f"CREATE TABLE t{i} (id INTEGER PRIMARY KEY, t{i - 1}_id INTEGER REFERENCES t{i - 1} (id))"
+                   for i in range(1, tables)]
+    return _create(session, statements + list(extra))
+
+
+def test_paths_add_at_most_max_join_hops_tables(sqlite_session):
+    cursor = _chain(sqlite_session, 6)
+    assert len(join_graph.join_path(cursor, "test", "t0", "t4")) == join_graph.MAX_JOIN_HOPS + 1
+    assert join_graph.join_path(cursor, "test", "t0", "t5") is None
+    assert join_graph.join_path(cursor, "test", "t2", "t2") == []
+
+
+def test_costlier_shortcut_is_used_when_the_cheap_route_is_too_long(sqlite_session):
+    # t0 .. t5 chained by declared keys, plus a guessed, unindexed many-to-many key between t0 and t3.
+    # t3 is cheapest to reach through t1 and t2, but only the shortcut leaves hops for t4 and t5.
+    cursor = _chain(sqlite_session, 6, ["ALTER TABLE t0 ADD COLUMN link_code INTEGER",
+                                        "ALTER TABLE t3 ADD COLUMN link_code INTEGER"])
+    path = join_graph.join_path(cursor, "test", "t0", "t5")
+    assert [(step["from_column"], step["table"]) for step in path] == [("link_code", "t3"), ("id", "t4"), ("id", "t5")]
+
+
+def test_join_question_resolves_its_path_once(sqlite_session, monkeypatch, tmp_path):
+    cursor = _shop(sqlite_session)
+    monkeypatch.setattr(nlp_usage, "translation_cache", TranslationCache(path=str(tmp_path / "nl.json")))
+    calls = []
+    monkeypatch.setattr(nlp_usage, "join_path", lambda *args: calls.append(args[2:]) or join_graph.join_path(*args))
+
+    entry, error = nlp_usage.translate_tokens(cursor, ["join", "customers", "payments"], "test",
+                                              pattern=nlp_usage.JOIN_PATTERN, interactive=False, save_cache=False)
+    assert error is None
+    assert calls == [("customers", "payments")]
+    assert entry["sql"] == ("SELECT * FROM customers INNER JOIN orders ON customers.customer_id = orders.customer_id "
+                            "INNER JOIN payments ON orders.order_id = payments.order_id")
@@ -0,0 +1,60 @@
+import json
+import os
+import threading
+
+from nl_cache import TranslationCache
+
+
+def _entry(sql):
+    return {"sql": sql, "params": [], "pattern": "find <A> where <B> is <C>"}
+
+
+def _persisted(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["translations"]
+
+
+def test_invalidation_is_persisted_on_flush_not_at_once(tmp_path):
+    path = str(tmp_path / "cache.json")
+    cache = TranslationCache(path=path)
+    cache.put(("find", "customer"), "olist", "v1", _entry("SELECT 1"))
+    cache.put(("find", "order"), "other", "v1", _entry("SELECT 2"))
+
+    cache.invalidate("olist")
+    assert cache.get(("find", "customer"), "olist", "v1") is None
+    assert len(_persisted(path)) == 2
+
+    cache.flush()
+    assert [json.loads(key)[0] for key, _ in _persisted(path)] == ["other"]
+    assert TranslationCache(path=path).get(("find", "order"), "other", "v1") == _entry("SELECT 2")
+
+
+def test_lru_eviction():
+    cache = TranslationCache(max_size=2, path="")
+    for i in range(3):
+        cache.put((str(i),), "db", "v1", _entry(f"SELECT {i}"))
+    assert cache.get(("0",), "db", "v1") is None
+    assert cache.get(("2",), "db", "v1") == _entry("SELECT 2")
+
+
+def test_concurrent_savers_share_a_file(tmp_path, capsys):
+    path = str(tmp_path / "cache.json")
+    caches = [TranslationCache(path=path) for _ in range(8)]
+    errors = []
+
+    def save(cache, number):
+        try:
+            for round_ in range(20):
+                cache.put((str(number), str(round_)), "db", "v1", _entry("SELECT 1"))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=save, args=(cache, i)) for i, cache in enumerate(caches)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert "Error saving NL cache" not in capsys.readouterr().out
+    assert len(_persisted(path)) >= 20
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
@@ -0,0 +1,46 @@
+import sqlite3
+import time
+
+import pytest
+
+from backends import SQLiteBackend
+from db_connection import ConnectionPool
+from query_executor import run_queries
+
+
+class LateCancelBackend(SQLiteBackend):
+    """SQLite with a `pause(seconds)` function, whose cancels arrive only after the query has finished."""
+
+    def __init__(self, directory):
+        super().__init__(directory)
+        self.paused_on = []
+        self.cancelled = []
+
+    def _open(self, path):
+        conn = super()._open(path)
+
+        def pause(seconds):
+            self.paused_on.append(conn)
+            time.sleep(seconds)
+
+        conn.create_function("pause", 1, pause)
+        return conn
+
+    def cancel(self, session, connection):
+        time.sleep(0.3)
+        self.cancelled.append(connection)
+        return True
+
+
+def test_late_cancel_targets_the_overrunning_connection_and_it_is_not_reused(sqlite_session):
+    backend = LateCancelBackend(sqlite_session.pool.backend.directory)
+    pool = ConnectionPool(backend=backend, size=4)
+    with pool.session("test") as caller:
+        results = list(run_queries(caller.cursor(), [{"sql": "SELECT pause(0.2)"}], 10, timeout=0.05))
+
+    assert [(position, rows, error) for position, rows, error, _ in results] == [(0, [(None,)], None)]
+    assert backend.cancelled == backend.paused_on
+    # The cancel could still abort whatever runs next on that connection, so it was closed
+    with pytest.raises(sqlite3.ProgrammingError):
+        backend.paused_on[0].execute("SELECT 1")
+    pool.close()
@@ -0,0 +1,41 @@
+from decimal import Decimal
+
+from db_operation import show_table_attributes
+from result_set import ColumnarResult, _ColumnBuilder
+
+
+def test_decimal_columns_stay_exact():
+    rows = [(1, Decimal("0.10")), (2, None), (3, Decimal("12345678901234567.89"))]
+    result = ColumnarResult.from_rows(rows, ["id", "amount"])
+    assert list(result) == rows
+    assert result.to_pandas()["amount"].tolist() == [Decimal("0.10"), None, Decimal("12345678901234567.89")]
+
+
+def test_whole_numbers_in_a_decimal_column_become_decimals():
+    # One batch mixing ints and Decimals, then an all-int batch after a Decimal one
+    result = ColumnarResult.from_rows([(2,), (None,), (Decimal("0.5"),)], ["amount"])
+    assert list(result) == [(Decimal(2),), (None,), (Decimal("0.5"),)]
+    assert all(type(value) is Decimal for value, in list(result) if value is not None)
+
+
+def test_int_batches_after_decimal_batches_become_decimals():
+    builder = _ColumnBuilder()
+    builder.add([Decimal("1.5")])
+    builder.add([3, None])
+    array, mask = builder.finish()
+    assert array.tolist()[:2] == [Decimal("1.5"), Decimal(3)] and type(array[1]) is Decimal
+    assert mask.tolist() == [False, False, True]
+
+
+def test_decimals_mixed_with_floats_are_kept_as_objects():
+    result = ColumnarResult.from_rows([(Decimal("0.1"),), (0.25,)], ["value"])
+    assert list(result) == [(Decimal("0.1"),), (0.25,)]
+
+
+def test_table_attributes_are_a_plain_frame(sqlite_session):
+    cursor = sqlite_session.cursor()
+    cursor.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, amount DECIMAL(10, 2))")
+    sqlite_session.commit()
+    frame = show_table_attributes(cursor, "orders", "test")
+    assert list(frame.columns) == ["Field", "Type", "Null", "Key", "Default", "Extra"]
+    assert frame["Field"].tolist() == ["id", "amount"]
@@ -0,0 +1,73 @@
+import builtins
+
+import rollups
+from db_operation import insert_record
+
+GROUPED_SUM = "SELECT store, SUM(amount) FROM orders GROUP BY store"
+
+
+def _orders(session):
+    cursor = session.cursor()
+    cursor.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, store INTEGER, amount INTEGER)")
+    cursor.executemany("INSERT INTO orders VALUES (%s, %s, %s)", [(1, 3, 10), (2, 3, 20), (3, 4, 5)])
+    session.commit()
+    return cursor
+
+
+def _database_answer(cursor):
+    cursor.execute(GROUPED_SUM)
+    return sorted(cursor.fetchall())
+
+
+def test_integer_sums_stay_integers(sqlite_session):
+    cursor = _orders(sqlite_session)
+    assert sorted(rollups.answer(cursor, GROUPED_SUM, "test")) == [(3, 30), (4, 5)]
+    assert all(isinstance(value, int) for _, value in rollups.answer(cursor, GROUPED_SUM, "test"))
+
+
+def test_inserted_values_join_their_group(sqlite_session, monkeypatch):
+    cursor = _orders(sqlite_session)
+    rollups.build_rollup(cursor, "test", "orders", "store")
+    answers = iter(["4", "3", "7"])
+    monkeypatch.setattr(builtins, "input", lambda *args: next(answers))
+    insert_record(cursor, sqlite_session, "orders", "test")
+
+    assert sorted(rollups.answer(cursor, GROUPED_SUM, "test")) == _database_answer(cursor) == [(3, 37), (4, 5)]
+
+
+def test_typed_values():
+    assert rollups._typed("3", "int(11)") == 3
+    assert rollups._typed("2.50", "decimal(10,2)") == 2.5
+    assert rollups._typed("3.0", "INTEGER") == 3.0
+    assert rollups._typed("abc", "int") == "abc"
+    assert rollups._typed("3", "varchar(10)") == "3"
+
+
+def test_empty_string_is_counted_like_the_database_does(sqlite_session):
+    cursor = sqlite_session.cursor()
+    cursor.execute("CREATE TABLE notes (id INTEGER PRIMARY KEY, note TEXT)")
+    cursor.executemany("INSERT INTO notes VALUES (%s, %s)", [(1, "a"), (2, None)])
+    sqlite_session.commit()
+    rollups.build_rollup(cursor, "test", "notes")
+
+    old_rows = rollups.select_rows(cursor, "notes", "id = %s", (2,))
+    cursor.execute("UPDATE notes SET note = %s WHERE id = %s", ("", 2))
+    sqlite_session.commit()
+    rollups.apply_changes(cursor, "test", "notes", removed=old_rows, added=[dict(old_rows[0], note="")])
+
+    cursor.execute("SELECT COUNT(note) FROM notes")
+    assert rollups.load_rollup(cursor, "test", "notes")[None]["counts"]["note"] == cursor.fetchone()[0] == 2
+
+
+def test_group_column_named_like_the_whole_table_rollup(sqlite_session):
+    cursor = sqlite_session.cursor()
+    cursor.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, `_all` INTEGER, `all` INTEGER)")
+    cursor.executemany("INSERT INTO t VALUES (%s, %s, %s)", [(1, 7, 8), (2, 7, 9)])
+    sqlite_session.commit()
+    for group in (None, "_all", "all"):
+        rollups.build_rollup(cursor, "test", "t", group)
+    rollups._rollups.clear()
+
+    assert list(rollups.load_rollup(cursor, "test", "t")) == [None]
+    assert list(rollups.load_rollup(cursor, "test", "t", "_all")) == [7]
+    assert sorted(rollups.load_rollup(cursor, "test", "t", "all")) == [8, 9]
@@ -0,0 +1,57 @@
+import builtins
+import threading
+
+from db_connection import ConnectionPool
+from db_operation import insert_record
+from schema_catalog import TableDirectory, directory
+
+
+def test_sqlite_row_counts_come_from_analyze_not_a_scan(sqlite_session):
+    cursor = sqlite_session.cursor()
+    cursor.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, city TEXT)")
+    cursor.executemany("INSERT INTO orders VALUES (%s, %s)", [(i, "a") for i in range(1, 51)])
+    sqlite_session.commit()
+    directory = TableDirectory()
+    assert directory.table_info(cursor, "test", "orders")["rows"] is None
+
+    cursor.execute("ANALYZE")
+    sqlite_session.commit()
+    directory.invalidate("test")
+    assert directory.table_info(cursor, "test", "orders")["rows"] == 50
+
+
+def test_concurrent_readers_share_one_directory(sqlite_session):
+    cursor = sqlite_session.cursor()
+    cursor.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY)")
+    sqlite_session.commit()
+    directory = TableDirectory(ttl=0)
+    pool = ConnectionPool(backend=sqlite_session.pool.backend, size=8)
+    results, errors = [], []
+
+    def read():
+        try:
+            with pool.session("test") as session:
+                for _ in range(20):
+                    directory.invalidate("test")
+                    results.append((directory.databases(session.cursor()), directory.tables(session.cursor(), "test")))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=read) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    pool.close()
+    assert errors == []
+    assert set(map(repr, results)) == {repr((["test"], ["orders"]))}
+
+
+def test_row_changes_mark_the_database_for_reload(sqlite_session, monkeypatch):
+    cursor = sqlite_session.cursor()
+    cursor.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY)")
+    sqlite_session.commit()
+    directory.tables(cursor, "test")
+    monkeypatch.setattr(builtins, "input", lambda *args: "1")
+    insert_record(cursor, sqlite_session, "orders", "test")
+    assert "test" in directory._dirty
@@ -0,0 +1,66 @@
+import sqlite3
+import threading
+
+import value_index
+from db_connection import ConnectionPool
+
+
+def test_concurrent_lookups_on_a_cold_column(sqlite_session):
+    cursor = sqlite_session.cursor()
+    cursor.execute("CREATE TABLE customers (id INTEGER PRIMARY KEY, city TEXT)")
+    cursor.executemany("INSERT INTO customers VALUES (%s, %s)", [(i, f"city{i % 50}") for i in range(500)])
+    sqlite_session.commit()
+
+    # One connection per thread, besides the fixture's
+    pool = ConnectionPool(backend=sqlite_session.pool.backend, size=9)
+    errors = []
+    results = []
+
+    def lookup(barrier):
+        try:
+            with pool.session("test") as session:
+                barrier.wait()
+                results.append(value_index.value_exists(session.cursor(), "test", "customers", "city", "CITY7"))
+        except Exception as e:
+            errors.append(e)
+
+    for _ in range(20):
+        value_index.invalidate_value_index("test", "customers")
+        barrier = threading.Barrier(8)
+        threads = [threading.Thread(target=lookup, args=(barrier,)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    pool.close()
+    assert errors == []
+    assert results == [True] * 160
+
+
+def _cities(session):
+    cursor = session.cursor()
+    cursor.execute("CREATE TABLE customers (id INTEGER PRIMARY KEY, city TEXT)")
+    cursor.executemany("INSERT INTO customers VALUES (%s, %s)", [(1, "curitiba"), (2, None)])
+    session.commit()
+    return cursor
+
+
+def test_null_is_not_a_value(sqlite_session):
+    cursor = _cities(sqlite_session)
+    assert value_index.load_value_index(cursor, "test", "customers", "city") == frozenset({"curitiba"})
+    assert not value_index.value_exists(cursor, "test", "customers", "city", "None")
+
+
+def test_index_from_an_earlier_run_is_rebuilt_after_outside_changes(sqlite_session, tmp_path):
+    cursor = _cities(sqlite_session)
+    assert not value_index.value_exists(cursor, "test", "customers", "city", "recife")
+
+    # Another program changes the table, then a new run loads the index from disk
+    outside = sqlite3.connect(tmp_path / "db" / "test.sqlite")
+    outside.execute("INSERT INTO customers VALUES (3, 'recife')")
+    outside.commit()
+    outside.close()
+    value_index._loaded_indexes.clear()
+
+    assert value_index.value_exists(cursor, "test", "customers", "city", "recife")
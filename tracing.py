@@ -0,0 +1,175 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# Set by enable(); instrumented code checks this flag before doing any tracing work
+enabled = False
+# Chrome trace JSON file written after every profiled question, or None
+trace_file = None
+
+# Finished spans kept for the breakdown and trace export (oldest are dropped first)
+MAX_SPANS = int(os.environ.get("CHATDB_TRACE_MAX_SPANS", "100000"))
+
+# Finished spans, in completion order
+_spans = deque(maxlen=MAX_SPANS)
+_lock = threading.Lock()
+_local = threading.local()
+
+
+class Span:
+    """
+    One timed operation. Spans opened while another span is open on the same
+    thread become its children. Attributes such as `sql`, `rows` and `bytes`
+    are free-form and end up in the breakdown and the exported trace.
+    """
+
+    __slots__ = ("name", "attrs", "start", "end", "depth", "thread")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.start = None
+        self.end = None
+        self.depth = 0
+        self.thread = threading.get_ident()
+
+    @property
+    def duration(self):
+        return (self.end or time.perf_counter()) - self.start
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        self.depth = len(stack)
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end = time.perf_counter()
+        if exc_type is not None:
+            self.attrs["error"] = repr(exc)
+        _local.stack.pop()
+        with _lock:
+            _spans.append(self)
+
+
+class _NullSpan:
+    """Stand-in returned while tracing is disabled; every operation is a no-op."""
+
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+def span(name, **attrs):
+    """
+    Return a context manager timing `name`.
+
+    While tracing is disabled this returns a shared no-op object, so
+    instrumented code pays for one function call and nothing else.
+    """
+    if not enabled:
+        return NULL_SPAN
+    return Span(name, attrs)
+
+
+def current_span():
+    """Return the innermost open span on this thread, or NULL_SPAN."""
+    stack = getattr(_local, "stack", None)
+    return stack[-1] if stack else NULL_SPAN
+
+
+def payload_bytes(rows):
+    """Approximate the size of fetched rows as the text length of their values."""
+    return sum(len(str(value)) for row in rows if row is not None for value in row)
+
+
+def enable(path=None):
+    """Turn tracing on, optionally exporting a Chrome trace to `path` after every profiled question."""
+    global enabled, trace_file
+    enabled = True
+    trace_file = path
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def spans_since(root):
+    """Return the finished spans recorded during `root`, in start order."""
+    with _lock:
+        spans = [s for s in _spans if s.start >= root.start and s.end <= root.end and s.thread == root.thread]
+    return sorted(spans, key=lambda s: (s.start, s.depth))
+
+
+def format_breakdown(root):
+    """Return a per-stage table of a finished root span and everything it contains."""
+    lines = [f"{'stage':<36}{'ms':>10}{'rows':>8}{'bytes':>10}  detail"]
+    for s in spans_since(root):
+        indent = "  " * (s.depth - root.depth)
+        rows = s.attrs.get("rows", "")
+        size = s.attrs.get("bytes", "")
+        if "sql" in s.attrs:
+            detail = " ".join(str(s.attrs["sql"]).split())
+        else:
+            detail = ", ".join(f"{key}={value}" for key, value in s.attrs.items() if key not in ("rows", "bytes"))
+        if len(detail) > 60:
+            detail = detail[:57] + "..."
+        lines.append(f"{indent + s.name:<36}{s.duration * 1000:>10.2f}{rows:>8}{size:>10}  {detail}")
+    return "\n".join(lines)
+
+
+def export_chrome_trace(path, spans=None):
+    """
+    Write spans (default: all recorded) as Chrome trace JSON, viewable in
+    chrome://tracing or Perfetto.
+    """
+    if spans is None:
+        with _lock:
+            spans = list(_spans)
+    pid = os.getpid()
+    events = [{
+        "name": s.name,
+        "cat": "chatdb",
+        "ph": "X",
+        "ts": s.start * 1e6,
+        "dur": s.duration * 1e6,
+        "pid": pid,
+        "tid": s.thread,
+        "args": {key: value if isinstance(value, (int, float)) else str(value) for key, value in s.attrs.items()}
+    } for s in spans]
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    os.replace(tmp_path, path)
+
+
+def report(root):
+    """Print the breakdown of a finished root span and refresh the trace file if one is configured."""
+    if not enabled or root is NULL_SPAN:
+        return
+    print(f"\nProfile ({root.duration * 1000:.2f} ms):")
+    print(format_breakdown(root))
+    if trace_file:
+        try:
+            export_chrome_trace(trace_file)
+        except OSError as e:
+            print(f"Error writing trace file: {e}")
@@ -0,0 +1,158 @@
+import json
+import os
+import tempfile
+import threading
+
+from db_connection import get_backend_for
+
+# Directory holding one index file per (database, table, column)
+INDEX_DIR = os.environ.get(
+    "CHATDB_INDEX_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".chatdb_index")
+)
+# Columns with more distinct values than this are not indexed; lookups fall back to a probe query
+MAX_INDEXED_VALUES = int(os.environ.get("CHATDB_INDEX_MAX_VALUES", "100000"))
+
+# In-process cache: (database, table, column) -> frozenset of lowercased values, or None when over the cap
+_loaded_indexes = {}
+# Called as callback(database, table) whenever indexes are invalidated
+_listeners = []
+# Guards _loaded_indexes; _build_locks holds one lock per column so concurrent lookups build an index once
+_lock = threading.Lock()
+_build_locks = {}
+
+
+def _index_path(database, table, column):
+    """Return the on-disk location of the index for a column."""
+    return os.path.join(INDEX_DIR, database, table, f"{column}.json")
+
+
+def build_value_index(cursor, database, table, column, max_values=MAX_INDEXED_VALUES):
+    """
+    Build the value index for a column and persist it to disk.
+
+    Only `max_values + 1` distinct values are ever fetched, so a column that is
+    too large to index costs a bounded amount of transfer and is marked as
+    overflowed instead. NULL is not a value and is not indexed. The table's
+    fingerprint is stored with the index, so an index written before the
+    table changed outside ChatDB is rebuilt when it is next loaded.
+
+    Args:
+        cursor: MySQL cursor object, already using `database`.
+        database (str): The database name.
+        table (str): The table name.
+        column (str): The column name.
+        max_values (int): Maximum number of distinct values to keep.
+
+    Returns:
+        frozenset: The lowercased distinct values, or None if the column exceeds `max_values`.
+    """
+    fingerprint = get_backend_for(cursor).table_fingerprint(cursor, database, table)
+    cursor.execute(f"SELECT DISTINCT {column} FROM {table} WHERE {column} IS NOT NULL LIMIT {max_values + 1}")
+    rows = cursor.fetchall()
+
+    overflow = len(rows) > max_values
+    values = [] if overflow else sorted({str(row[0]).lower() for row in rows})
+
+    path = _index_path(database, table, column)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # A temporary file of its own, so writers in other threads never replace each other's
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f"{column}.", suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump({"overflow": overflow, "values": values, "fingerprint": fingerprint}, f)
+    os.replace(tmp_path, path)
+
+    index = None if overflow else frozenset(values)
+    with _lock:
+        _loaded_indexes[(database, table, column)] = index
+    return index
+
+
+def load_value_index(cursor, database, table, column):
+    """
+    Return the value index for a column, loading it from disk or building it on first use.
+
+    Returns:
+        frozenset: The lowercased distinct values, or None if the column is over the size cap.
+    """
+    key = (database, table, column)
+    with _lock:
+        if key in _loaded_indexes:
+            return _loaded_indexes[key]
+        build_lock = _build_locks.setdefault(key, threading.Lock())
+
+    with build_lock:
+        with _lock:
+            if key in _loaded_indexes:
+                return _loaded_indexes[key]
+
+        path = _index_path(database, table, column)
+        if os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    data = json.load(f)
+                # Written by an earlier run: only trusted while the table is unchanged
+                if data.get("fingerprint") == get_backend_for(cursor).table_fingerprint(cursor, database, table):
+                    index = None if data["overflow"] else frozenset(data["values"])
+                    with _lock:
+                        _loaded_indexes[key] = index
+                    return index
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Error reading value index for {table}.{column}, rebuilding: {e}")
+
+        return build_value_index(cursor, database, table, column)
+
+
+def value_exists(cursor, database, table, column, token):
+    """
+    Check whether `token` is one of the values stored in a column.
+
+    Indexed columns are answered from memory. Columns over the size cap are
+    checked with a single `WHERE column = %s LIMIT 1` probe.
+
+    Args:
+        cursor: MySQL cursor object, already using `database`.
+        database (str): The database name.
+        table (str): The table name.
+        column (str): The column name.
+        token (str): The candidate value.
+
+    Returns:
+        bool: True if the value is present in the column.
+    """
+    index = load_value_index(cursor, database, table, column)
+    if index is not None:
+        return token.lower() in index
+
+    cursor.execute(f"SELECT 1 FROM {table} WHERE {column} = %s LIMIT 1", (token,))
+    return bool(cursor.fetchall())
+
+
+def add_invalidation_listener(callback):
+    """Register `callback(database, table)` to be called whenever a table's data changes."""
+    _listeners.append(callback)
+
+
+def invalidate_value_index(database, table=None):
+    """
+    Drop cached indexes for a table (or a whole database) so they are rebuilt on next use.
+
+    Args:
+        database (str): The database name.
+        table (str, optional): The table name. If omitted, every table in the database is dropped.
+    """
+    for callback in _listeners:
+        callback(database, table)
+
+    with _lock:
+        for key in list(_loaded_indexes):
+            if key[0] == database and (table is None or key[1] == table):
+                del _loaded_indexes[key]
+
+    path = os.path.join(INDEX_DIR, database) if table is None else os.path.join(INDEX_DIR, database, table)
+    if not os.path.isdir(path):
+        return
+    for root, _, files in os.walk(path):
+        for name in files:
+            if name.endswith(".json"):
+                os.remove(os.path.join(root, name))